@@ -3,15 +3,19 @@
 只提供 AI 内容生成功能，浏览器自动化在用户本地运行
 """
 
-from flask import Flask, request, jsonify
+import json
+
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from utils.content_generator import ContentGenerator
+from utils.content_generator import generator, BATCH_CONCURRENCY
+from utils.events import format_sse
 
 app = Flask(__name__)
 CORS(app)  # 允许跨域访问
 
-# 初始化内容生成器
-generator = ContentGenerator()
+# 批量生成限制
+MAX_BATCH_SIZE = 200
+MAX_BATCH_CONCURRENCY = 8
 
 @app.route('/api/generate', methods=['POST'])
 def generate_content():
@@ -23,7 +27,18 @@ def generate_content():
         if not topic:
             return jsonify({'error': '请输入文章主题'}), 400
         
-        title, content = generator.generate(topic)
+        # noCache: 跳过缓存重新生成
+        use_cache = not data.get('noCache')
+        
+        # 流式：边生成边推送（SSE），标题完整后立即下发
+        if data.get('stream'):
+            return Response(
+                stream_with_context(stream_generation(topic, use_cache)),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+        
+        title, content = generator.generate(topic, use_cache=use_cache)
         
         return jsonify({
             'success': True,
@@ -36,6 +51,52 @@ def generate_content():
             'error': str(e)
         }), 500
 
+def stream_generation(topic, use_cache=True):
+    """把流式生成的事件格式化为 SSE"""
+    try:
+        for event_id, event in enumerate(generator.generate_stream(topic, use_cache), 1):
+            yield format_sse((event_id, event['type'], event))
+    except Exception as e:
+        yield format_sse((0, 'error', {'error': str(e)}))
+
+@app.route('/api/generate/batch', methods=['POST'])
+def generate_batch():
+    """批量生成，每完成一个主题就以 NDJSON 返回一行"""
+    data = request.get_json() or {}
+    topics = [t.strip() for t in data.get('topics', []) if isinstance(t, str) and t.strip()]
+    
+    if not topics:
+        return jsonify({'error': '请提供主题列表 topics'}), 400
+    if len(topics) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'一次最多 {MAX_BATCH_SIZE} 个主题'}), 400
+    
+    try:
+        concurrency = int(data.get('concurrency') or BATCH_CONCURRENCY)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency 必须是整数'}), 400
+    concurrency = max(1, min(concurrency, MAX_BATCH_CONCURRENCY))
+    use_cache = not data.get('noCache')
+    
+    def stream():
+        succeeded = 0
+        for item in generator.generate_many(topics, concurrency, use_cache):
+            if item['success']:
+                succeeded += 1
+            item['type'] = 'result'
+            yield json.dumps(item, ensure_ascii=False) + '\n'
+        yield json.dumps({
+            'type': 'summary',
+            'total': len(topics),
+            'succeeded': succeeded,
+            'failed': len(topics) - succeeded
+        }, ensure_ascii=False) + '\n'
+    
+    return Response(
+        stream_with_context(stream()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查"""
@@ -67,6 +128,25 @@ Content-Type: application/json
     "content": "正文内容..."
 }
         </pre>
+        <p>请求中加上 <code>"stream": true</code> 时以 Server-Sent Events 返回：
+        <code>title</code>（标题完整后立即推送）、<code>delta</code>（正文增量）、
+        <code>done</code>（最终标题和正文，与非流式结果一致）、<code>error</code>。</p>
+        <p>相同主题的结果会被缓存，请求中加上 <code>"noCache": true</code> 可跳过缓存重新生成。</p>
+        
+        <h3>POST /api/generate/batch</h3>
+        <p>批量生成（最多 200 个主题），按完成顺序逐行返回（NDJSON），单个主题失败不影响其他主题</p>
+        <pre style="background: #f5f5f5; padding: 15px; border-radius: 5px;">
+请求:
+{
+    "topics": ["主题一", "主题二"],
+    "concurrency": 4
+}
+
+响应（每行一个 JSON）:
+{"type": "result", "index": 1, "topic": "主题二", "success": true, "title": "...", "content": "...", "error": "", "elapsed": 21.3}
+{"type": "result", "index": 0, "topic": "主题一", "success": false, "title": "", "content": "", "error": "...", "elapsed": 60.0}
+{"type": "summary", "total": 2, "succeeded": 1, "failed": 1}
+        </pre>
         
         <h3>使用方式</h3>
         <ol>
@@ -84,6 +164,7 @@ if __name__ == '__main__':
     print("=" * 50)
     print("本地访问: http://localhost:8080")
     print("API 端点: POST /api/generate")
+    print("          POST /api/generate/batch")
     print("=" * 50)
     app.run(host='0.0.0.0', port=8080, debug=False)
 
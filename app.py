@@ -1,9 +1,10 @@
 import os
 import sys
 import threading
+import time
 import webbrowser
-from flask import Flask, render_template, request, jsonify
-from playwright.sync_api import sync_playwright
+from datetime import datetime
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, send_file
 
 # flask-cors 是可选的
 try:
@@ -12,9 +13,23 @@ try:
 except ImportError:
     HAS_CORS = False
 
-from utils.content_generator import generate_article
-from utils.auth_manager import AuthManager
+from utils.content_generator import generate_article, generate_article_stream
+from utils.auth_manager import AuthManager, ACCOUNT_NAME, USABLE_SESSIONS, target_label
+from utils.account_locks import account_locks
+from utils.article import Article
 from utils.browser_helper import get_browser_config, ensure_browser
+from utils.publish_runner import publish_concurrently, skipped_result, MAX_PARALLEL_PLATFORMS, HEADLESS_MODE
+from utils.browser_pool import BrowserPool
+from utils.job_queue import JobStore, JobQueue, JOB_QUEUED, JOB_RUNNING
+from utils.job_db import PUB_DONE
+from utils.events import EventBroker, capture_output, format_sse
+from utils.artifacts import cleanup_artifacts, job_dir
+from utils.strategy_stats import strategy_stats
+from utils.resource_blocker import merge_reports
+from utils.tracing import tracer, summarize, to_chrome_trace
+from utils.trace_capture import TRACE_FILE
+from utils.image_prep import preprocessor as image_preprocessor
+from utils.scheduler import Scheduler, CATCHUP_POLICIES
 from platforms.wechat import WeChatPublisher
 from platforms.toutiao import ToutiaoPublisher
 from platforms.xiaohongshu import XiaohongshuPublisher
@@ -23,13 +38,27 @@ app = Flask(__name__)
 if HAS_CORS:
     CORS(app)
 
-# 全局状态
-publish_status = {
-    "running": False,
-    "current_platform": "",
-    "message": "",
-    "completed": []
-}
+# 同时执行的发布任务数
+PUBLISH_WORKERS = int(os.environ.get("PUBLISH_WORKERS", "2"))
+
+# 常驻浏览器池（进程内只启动一次，按需创建），默认能容纳所有工作线程同时发布
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", str(MAX_PARALLEL_PLATFORMS * PUBLISH_WORKERS)))
+browser_pool = None
+_browser_pool_lock = threading.Lock()
+
+def get_browser_pool():
+    """获取全局浏览器池，首次调用时启动浏览器"""
+    global browser_pool
+    with _browser_pool_lock:
+        if browser_pool is None:
+            # 获取浏览器配置（智能检测本地 Chrome）
+            browser_config = get_browser_config()
+            # 默认预热无头浏览器；需要扫码时再按需启动可见浏览器
+            launch_options = {"headless": True}
+            if browser_config.get("executable_path"):
+                launch_options["executable_path"] = browser_config["executable_path"]
+            browser_pool = BrowserPool(BROWSER_POOL_SIZE, launch_options)
+        return browser_pool
 
 @app.route('/')
 def index():
@@ -44,8 +73,19 @@ def generate_content():
     if not topic:
         return jsonify({"error": "请输入文章主题"}), 400
     
+    # noCache: 跳过缓存重新生成
+    use_cache = not data.get('noCache')
+    
+    # 流式：边生成边推送（SSE），标题完整后立即下发
+    if data.get('stream'):
+        return Response(
+            stream_with_context(stream_generation(topic, use_cache)),
+            mimetype='text/event-stream',
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
     try:
-        title, content = generate_article(topic)
+        title, content = generate_article(topic, use_cache=use_cache)
         
         return jsonify({
             "success": True,
@@ -55,57 +95,105 @@ def generate_content():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/publish', methods=['POST'])
-def publish_article():
-    """发布文章到指定平台"""
-    global publish_status
-    
-    if publish_status["running"]:
-        return jsonify({"error": "正在发布中，请稍候"}), 400
-    
-    data = request.json
+def stream_generation(topic, use_cache=True):
+    """把流式生成的事件格式化为 SSE"""
+    try:
+        for event_id, event in enumerate(generate_article_stream(topic, use_cache), 1):
+            yield format_sse((event_id, event["type"], event))
+    except Exception as e:
+        yield format_sse((0, "error", {"error": str(e)}))
+
+def build_payload(data):
+    """
+    校验发布请求，返回 (任务 payload, None)；请求无效时返回 (None, 错误信息)
+    /api/publish 和 /api/schedules 共用
+    """
     platforms = data.get('platforms', [])
     title = data.get('title', '')
     content = data.get('content', '')
     image_path = data.get('imagePath', '')
+    # 每个平台发布到哪些账号 {"wechat": ["a", "b"]}；没有列出的平台用默认账号
+    accounts = data.get('accounts') or {}
+    # true / false / "auto"，或按平台指定 {"wechat": "auto", "xiaohongshu": false}
+    headless = data.get('headless', HEADLESS_MODE)
+    # 幂等键：同一个键在同一个平台账号上只会发布成功一次；不传时按文章内容生成
+    idempotency_key = data.get('idempotencyKey') or None
     
     if not platforms:
-        return jsonify({"error": "请选择至少一个发布平台"}), 400
+        return None, "请选择至少一个发布平台"
     if not title or not content:
-        return jsonify({"error": "标题和正文不能为空"}), 400
+        return None, "标题和正文不能为空"
+    if idempotency_key is not None and not isinstance(idempotency_key, str):
+        return None, "idempotencyKey 应为字符串"
+    if not isinstance(accounts, dict):
+        return None, "accounts 应为 {平台: [账号, ...]}"
+    for platform_name, names in accounts.items():
+        if not isinstance(names, list) or not all(isinstance(n, str) and ACCOUNT_NAME.match(n) for n in names):
+            return None, f"{platform_name} 的账号名无效（字母、数字、中文和 _ - . @，不能以 . 开头）"
+    
+    # 发布目标：每个平台的每个账号
+    targets = [
+        [platform_name, account]
+        for platform_name in platforms
+        for account in (accounts.get(platform_name) or [None])
+    ]
+    # 不同账号可以同时发布，默认全部并行（实际并发受浏览器池大小限制）
+    max_parallel = data.get('maxParallel') or max(MAX_PARALLEL_PLATFORMS, len(targets))
+    try:
+        max_parallel = None if isinstance(max_parallel, bool) else int(max_parallel)
+    except (TypeError, ValueError):
+        max_parallel = None
+    if max_parallel is None or max_parallel < 1:
+        return None, "maxParallel 应为正整数"
     
     # 小红书必须上传图片
     if 'xiaohongshu' in platforms and not image_path:
-        return jsonify({"error": "小红书发布必须提供图片路径"}), 400
+        return None, "小红书发布必须提供图片路径"
     
-    # 在后台线程中执行发布
-    thread = threading.Thread(
-        target=do_publish,
-        args=(platforms, title, content, image_path)
-    )
-    thread.start()
+    return {
+        "platforms": platforms,
+        "targets": targets,
+        "title": title,
+        "content": content,
+        "image_path": image_path,
+        "max_parallel": max_parallel,
+        "headless": headless,
+        "idempotency_key": idempotency_key
+    }, None
+
+def submit_job(payload, **fields):
+    """把发布 payload 放入任务队列，返回任务 ID"""
+    if not payload.get('idempotency_key'):
+        payload['idempotency_key'] = Article(payload['title'], payload['content'],
+                                             [payload['image_path']]).content_hash
+    job_id = job_queue.submit(payload, platforms=payload['platforms'], title=payload['title'],
+                              idempotency_key=payload['idempotency_key'],
+                              targets=[target_label(*target) for target in payload['targets']], **fields)
+    # 排队期间先把图片处理好
+    if payload['image_path']:
+        image_preprocessor.prefetch([payload['image_path']], payload['platforms'])
+    return job_id
+
+@app.route('/api/publish', methods=['POST'])
+def publish_article():
+    """提交发布任务，返回任务 ID"""
+    payload, error = build_payload(request.json)
+    if error:
+        return jsonify({"error": error}), 400
+    
+    # 放入任务队列，由工作线程执行
+    job_id = submit_job(payload)
     
     return jsonify({
         "success": True,
-        "message": "开始发布，请在浏览器窗口中完成操作"
+        "job_id": job_id,
+        "queued": job_queue.pending(),
+        "message": "已加入发布队列，请在浏览器窗口中完成操作"
     })
 
-def do_publish(platforms, title, content, image_path=''):
-    """执行发布（在后台线程中运行）"""
-    global publish_status
-    
-    publish_status = {
-        "running": True,
-        "current_platform": "",
-        "message": "正在启动浏览器...",
-        "completed": []
-    }
-    
-    article = {
-        'title': title,
-        'content': content,
-        'images': [image_path] if image_path else []
-    }
+def do_publish(job_id, payload):
+    """执行发布任务（在工作线程中运行）"""
+    article = Article(payload['title'], payload['content'], [payload['image_path']])
     
     platform_map = {
         'wechat': WeChatPublisher,
@@ -115,57 +203,269 @@ def do_publish(platforms, title, content, image_path=''):
     
     auth_manager = AuthManager()
     
+    def on_start(platform_name):
+        job_store.update(job_id, current_platform=platform_name, message=f"正在处理 {platform_name}...")
+    
+    # 旧任务没有 targets / idempotency_key 字段：每个平台的默认账号，按文章内容生成幂等键
+    targets = payload.get('targets') or [[name, None] for name in payload['platforms']]
+    key = payload.get('idempotency_key') or article.content_hash
+    # 重启后继续的任务：已经有结果的平台账号不再处理
+    job = job_store.get(job_id) or {}
+    finished = set(job.get('results', {}))
+    
+    # 占用 (幂等键, 平台账号)，已经发布过或正在由其他任务发布的跳过
+    platform_classes = []
+    claimed = set()
+    for name, account in targets:
+        label = target_label(name, account)
+        if name not in platform_map or label in finished:
+            continue
+        owner = job_store.claim(key, label, job_id)
+        if owner is None:
+            claimed.add(label)
+            platform_classes.append((platform_map[name], account))
+        elif owner['status'] == PUB_DONE:
+            print(f"[{label}] 同一篇文章已由任务 {owner['job_id']} 发布，跳过")
+            job_store.add_result(job_id, skipped_result(name, account, f"已由任务 {owner['job_id']} 发布过"))
+        else:
+            job_store.add_result(job_id, skipped_result(
+                name, account, f"同一篇文章正在由任务 {owner['job_id']} 发布", success=False))
+    
+    def on_result(result):
+        # 先记已发布，再记结果：两步之间退出的话，重启后按已发布跳过
+        job_store.settle(key, result['label'], job_id, result['success'])
+        claimed.discard(result['label'])
+        job_store.add_result(job_id, result)
+    
     try:
-        # 获取浏览器配置（智能检测本地 Chrome）
-        browser_config = get_browser_config()
-        
-        with sync_playwright() as p:
-            launch_options = {"headless": False}
-            if browser_config.get("executable_path"):
-                launch_options["executable_path"] = browser_config["executable_path"]
-            
-            browser = p.chromium.launch(**launch_options)
-            
-            for platform_name in platforms:
-                if platform_name not in platform_map:
-                    continue
-                    
-                publish_status["current_platform"] = platform_name
-                publish_status["message"] = f"正在处理 {platform_name}..."
-                
-                PlatformClass = platform_map[platform_name]
-                
-                # 加载登录状态
-                state_path = auth_manager.load_state(PlatformClass.PLATFORM_NAME)
-                if state_path:
-                    context = browser.new_context(storage_state=state_path)
-                else:
-                    context = browser.new_context()
-                
-                publisher = PlatformClass(context)
-                
-                try:
-                    publisher.login()
-                    auth_manager.save_state(context, PlatformClass.PLATFORM_NAME)
-                    publisher.publish(article)
-                    publish_status["completed"].append(platform_name)
-                except Exception as e:
-                    publish_status["message"] = f"{platform_name} 发布失败: {str(e)}"
-                finally:
-                    context.close()
-            
-            browser.close()
-            
-    except Exception as e:
-        publish_status["message"] = f"发布出错: {str(e)}"
+        # 从常驻浏览器池借用浏览器，每个平台账号独立的 context，不同账号同时发布
+        results = publish_concurrently(
+            platform_classes, article, auth_manager,
+            max_parallel=payload['max_parallel'],
+            on_start=on_start,
+            on_result=on_result,
+            pool=get_browser_pool(),
+            worker_context=lambda: capture_output(event_broker, job_id),
+            headless=payload.get('headless', HEADLESS_MODE),
+            job_id=job_id
+        )
     finally:
-        publish_status["running"] = False
-        publish_status["message"] = "发布完成"
+        # 出错时没有结果的平台账号释放占用，可以重新提交
+        for label in claimed:
+            job_store.settle(key, label, job_id, False)
+    # 整个任务拦截了多少请求、约节省多少流量
+    job_store.update(job_id, blocked=merge_reports(r.get("blocked") for r in results.values()))
+
+# 任务事件广播（状态变化 + 日志行）
+event_broker = EventBroker()
+
+def on_job_change(job):
+    """任务状态变化时推送给监听者"""
+    event_broker.publish(job["id"], "status", job)
+    if job["status"] not in (JOB_QUEUED, JOB_RUNNING):
+        event_broker.close(job["id"])
+
+# 发布任务队列，在 init_jobs 中创建：图片预处理的子进程用 spawn 启动，会重新导入本模块，
+# 导入时不能打开数据库、启动工作线程
+job_store = None
+job_queue = None
+
+def init_jobs():
+    """创建任务存储和任务队列（只创建一次）"""
+    global job_store, job_queue
+    if job_store is None:
+        job_store = JobStore(on_change=on_job_change)
+        job_queue = JobQueue(job_store, do_publish, workers=PUBLISH_WORKERS)
+
+def prewarm_schedule(schedule, payload):
+    """定时任务到点前：启动好浏览器、预处理图片、离线检查各账号的登录状态"""
+    get_browser_pool().warm()
+    if payload['image_path']:
+        image_preprocessor.prefetch([payload['image_path']], payload['platforms'])
+    auth_manager = AuthManager()
+    sessions = {
+        target_label(name, account): auth_manager.check_state(name, account)["status"]
+        for name, account in payload['targets']
+    }
+    needs_login = [label for label, status in sessions.items() if status not in USABLE_SESSIONS]
+    if needs_login:
+        print(f"[scheduler] 定时任务 {schedule['id']} 的账号需要重新登录: {', '.join(needs_login)}")
+    return {"sessions": sessions, "needs_login": needs_login}
+
+def fire_schedule(schedule, payload):
+    """定时任务到点：提交发布任务"""
+    return submit_job(payload, schedule_id=schedule['id'])
+
+# 定时发布（startup_check 中启动）
+scheduler = Scheduler(on_fire=fire_schedule, on_prewarm=prewarm_schedule)
+
+def parse_publish_at(value):
+    """发布时间：时间戳，或 "2026-10-19 08:00" / ISO 格式（不带时区时按本地时间）"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).strip()).timestamp()
+
+@app.route('/api/jobs')
+def list_jobs():
+    """最近的发布任务"""
+    return jsonify({"jobs": job_store.list(), "queued": job_queue.pending()})
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """获取单个任务状态"""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/trace')
+def job_trace(job_id):
+    """
+    任务各步骤的耗时 span
+    ?format=json（默认）返回 span 列表和按步骤的汇总；?format=chrome 返回 Chrome trace 文件
+    """
+    spans = tracer.spans(job_id)
+    if spans is None:
+        return jsonify({"error": "没有该任务的追踪记录"}), 404
+    if request.args.get('format') == 'chrome':
+        response = jsonify(to_chrome_trace(spans))
+        response.headers['Content-Disposition'] = f'attachment; filename=trace-{job_id}.json'
+        return response
+    return jsonify({"job_id": job_id, "spans": spans, "summary": summarize(spans)})
+
+@app.route('/api/jobs/<job_id>/playwright-trace/<platform>')
+def job_playwright_trace(job_id, platform):
+    """
+    下载任务中某个平台保留的 Playwright trace（失败或超出耗时预算时才有），用 playwright show-trace 打开
+    非默认账号加 ?account=<账号>
+    """
+    account = request.args.get('account')
+    if job_store.get(job_id) is None or platform not in ('wechat', 'toutiao', 'xiaohongshu'):
+        return jsonify({"error": "任务不存在"}), 404
+    if account and not ACCOUNT_NAME.match(account):
+        return jsonify({"error": "账号名无效"}), 400
+    path = job_dir(job_id, platform, *([account] if account else []), TRACE_FILE)
+    if not os.path.isfile(path):
+        return jsonify({"error": "该平台没有保留 trace"}), 404
+    return send_file(os.path.abspath(path), mimetype='application/zip', as_attachment=True,
+                     download_name=f'trace-{job_id}-{platform}.zip')
+
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    """以 Server-Sent Events 推送任务的状态变化和日志"""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在"}), 404
+    finished = job["status"] not in (JOB_QUEUED, JOB_RUNNING)
+    if not event_broker.acquire():
+        # 每个连接占用一个服务线程，连接数已满时让客户端改为轮询 /api/jobs/<ID>
+        return jsonify({"error": "实时推送连接数已满，请轮询任务状态", "poll": f"/api/jobs/{job_id}"}), \
+            503, {"Retry-After": "5"}
+    if not finished and not event_broker.known(job_id):
+        # 进行中但事件已被清掉：从当前状态重新开始记录
+        event_broker.publish(job_id, "status", job)
+    
+    # 断线重连时浏览器会带上 Last-Event-ID，从断点继续
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId') or 0
+    try:
+        last_event_id = int(last_event_id)
+    except ValueError:
+        last_event_id = 0
+    
+    def stream():
+        if finished and not event_broker.known(job_id):
+            # 重启前结束的任务、事件已被清掉的任务：只发一次最终状态
+            yield format_sse((0, "status", job))
+        else:
+            for event in event_broker.subscribe(job_id, last_event_id):
+                yield format_sse(event)
+        yield "event: end\ndata: {}\n\n"
+    
+    response = Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # 连接结束（包括生成器还没开始客户端就断开）时归还名额
+    response.call_on_close(event_broker.release)
+    return response
 
 @app.route('/api/status')
 def get_status():
-    """获取发布状态"""
-    return jsonify(publish_status)
+    """获取最近一个任务的状态（兼容旧接口）"""
+    job = job_store.latest()
+    if job is None:
+        return jsonify({"running": False, "current_platform": "", "message": "", "completed": []})
+    job["running"] = job["status"] in (JOB_QUEUED, JOB_RUNNING)
+    return jsonify(job)
+
+@app.route('/api/sessions')
+def get_sessions():
+    """离线检查各平台保存的登录状态（不打开浏览器）"""
+    auth_manager = AuthManager()
+    return jsonify({
+        name: auth_manager.check_state(name)
+        for name in ('wechat', 'toutiao', 'xiaohongshu')
+    })
+
+@app.route('/api/accounts')
+def get_accounts():
+    """各平台保存过登录状态的账号及离线检查结果，以及正在发布的账号"""
+    auth_manager = AuthManager()
+    return jsonify({
+        "accounts": {
+            name: [
+                dict(auth_manager.check_state(name, account), account=account)
+                for account in auth_manager.list_accounts(name)
+            ]
+            for name in ('wechat', 'toutiao', 'xiaohongshu')
+        },
+        "busy": account_locks.busy(),
+    })
+
+@app.route('/api/pool')
+def get_pool_status():
+    """获取浏览器池状态"""
+    if browser_pool is None:
+        return jsonify({"started": False, "slots": []})
+    return jsonify({"started": True, "slots": browser_pool.stats()})
+
+@app.route('/api/schedules', methods=['POST'])
+def create_schedule():
+    """新增定时发布：与 /api/publish 相同的参数，加 publishAt（发布时间）和可选的 catchUp（错过时的补发策略）"""
+    data = request.json
+    payload, error = build_payload(data)
+    if error:
+        return jsonify({"error": error}), 400
+    try:
+        due_at = parse_publish_at(data.get('publishAt'))
+    except (TypeError, ValueError):
+        return jsonify({"error": "publishAt 格式应为 2026-10-19 08:00 或时间戳"}), 400
+    if due_at <= time.time():
+        return jsonify({"error": "发布时间必须晚于当前时间"}), 400
+    catch_up = data.get('catchUp')
+    if catch_up is not None and catch_up not in CATCHUP_POLICIES:
+        return jsonify({"error": f"catchUp 只能是 {' / '.join(CATCHUP_POLICIES)}"}), 400
+    schedule = scheduler.add(due_at, payload, catch_up=catch_up, title=payload['title'],
+                             targets=[target_label(*target) for target in payload['targets']])
+    return jsonify({"success": True, "schedule": schedule})
+
+@app.route('/api/schedules')
+def list_schedules():
+    """定时任务列表，?status=pending 只看待发布的"""
+    return jsonify({"schedules": scheduler.list(status=request.args.get('status'))})
+
+@app.route('/api/schedules/<schedule_id>', methods=['DELETE'])
+def cancel_schedule(schedule_id):
+    """取消待发布的定时任务"""
+    if not scheduler.cancel(schedule_id):
+        return jsonify({"error": "定时任务不存在或已执行"}), 404
+    return jsonify({"success": True})
+
+@app.route('/api/strategies')
+def get_strategy_stats():
+    """各平台备选策略的成功记录"""
+    return jsonify(strategy_stats.snapshot())
 
 def startup_check():
     """启动时检查环境"""
@@ -181,6 +481,18 @@ def startup_check():
         print("浏览器检测失败，程序退出")
         sys.exit(1)
     
+    # 清理过期的截图等任务产物
+    cleanup_artifacts(force=True)
+    
+    # 预热浏览器池，第一次发布不用等浏览器冷启动
+    get_browser_pool()
+    
+    # 打开任务数据库，继续上次退出时未完成的发布任务，再恢复定时任务（补发的定时任务与继续的任务重复时按幂等键跳过）
+    init_jobs()
+    job_queue.recover()
+    job_store.db.prune(statuses=(JOB_QUEUED, JOB_RUNNING))
+    scheduler.start()
+    
     print("\n[2/2] 启动 Web 服务...")
     print("\n" + "=" * 50)
     print("✅ 启动成功！")
@@ -0,0 +1 @@
+"""离线基准测试用的本地模拟站点"""
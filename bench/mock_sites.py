@@ -0,0 +1,141 @@
+"""
+本地模拟的创作者后台
+只还原发布流程依赖的页面结构：公众号的编辑器和发表弹窗、头条号的图文编辑页（单图/三图/无封面）、
+小红书的上传图文选项卡。每个平台挂在自己的路径前缀下，发布器通过 <PLATFORM>_BASE_URL 指过来。
+上传接口和页面响应可以加固定延迟，模拟真实网络。
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+SITES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sites")
+
+# 模拟登录后首页带的 token
+MOCK_TOKEN = "1234567890"
+
+# 1x1 透明 GIF，作为上传后的封面预览
+_PIXEL_GIF = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00"
+    b",\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+)
+
+# 页面路由：{(平台, 路径): 页面文件}
+PAGES = {
+    ("wechat", "/cgi-bin/home"): "wechat_home.html",
+    ("wechat", "/cgi-bin/appmsg"): "wechat_editor.html",
+    ("toutiao", "/profile_v4/index"): "toutiao_index.html",
+    ("toutiao", "/profile_v4/graphic/publish"): "toutiao_editor.html",
+    ("toutiao", "/profile_v4/manage/content/articles"): "toutiao_articles.html",
+    ("xiaohongshu", "/publish/publish"): "xiaohongshu_publish.html",
+    ("xiaohongshu", "/publish/success"): "xiaohongshu_success.html",
+}
+
+# 上传接口：{(平台, 路径): 返回的 JSON}
+UPLOADS = {
+    ("wechat", "/cgi-bin/filetransfer"): {"base_resp": {"ret": 0}, "cdn_url": "/wechat/mmbiz/cover.gif"},
+    ("xiaohongshu", "/api/media/v1/upload"): {"success": True, "data": {"fileIds": "mock"}},
+}
+
+# 登录后首页的跳转
+REDIRECTS = {
+    ("wechat", "/"): f"/wechat/cgi-bin/home?t=home/index&token={MOCK_TOKEN}&lang=zh_CN",
+    ("toutiao", "/"): "/toutiao/profile_v4/index",
+    ("xiaohongshu", "/"): "/xiaohongshu/publish/publish",
+}
+
+
+class MockSiteHandler(BaseHTTPRequestHandler):
+    server_version = "MockCreatorSite/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _route(self):
+        """把请求路径拆成 (平台, 平台内路径)"""
+        path = urlsplit(self.path).path
+        platform, _, rest = path.lstrip("/").partition("/")
+        return platform, "/" + rest
+
+    def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        key = self._route()
+        self.server.count(key)
+        if key in REDIRECTS:
+            self._send(302, headers={"Location": REDIRECTS[key]})
+            return
+        if key[1].startswith("/mmbiz/"):
+            self._send(200, _PIXEL_GIF, "image/gif")
+            return
+        page = PAGES.get(key)
+        if page is None:
+            self._send(404, b"not found", "text/plain")
+            return
+        time.sleep(self.server.page_latency)
+        with open(os.path.join(SITES_DIR, page), "rb") as f:
+            self._send(200, f.read())
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        key = self._route()
+        self.server.count(key)
+        length = int(self.headers.get("Content-Length") or 0)
+        received = self.rfile.read(length) if length else b""
+        body = UPLOADS.get(key)
+        if body is None:
+            self._send(404, b"not found", "text/plain")
+            return
+        self.server.uploaded_bytes += len(received)
+        time.sleep(self.server.upload_latency)
+        self._send(200, json.dumps(body).encode("utf-8"), "application/json")
+
+
+class MockSiteServer(ThreadingHTTPServer):
+    """在后台线程中运行的模拟站点，page_latency / upload_latency 为秒"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, page_latency=0.0, upload_latency=0.0):
+        super().__init__((host, port), MockSiteHandler)
+        self.page_latency = page_latency
+        self.upload_latency = upload_latency
+        self.uploaded_bytes = 0
+        self.hits = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def count(self, key):
+        with self._lock:
+            name = "".join(key)
+            self.hits[name] = self.hits.get(name, 0) + 1
+
+    @property
+    def root(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def base_url(self, platform):
+        return f"{self.root}/{platform}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-sites", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,283 @@
+"""
+离线基准测试
+在本地模拟站点（bench/mock_sites.py）上跑三个平台的完整发布流程，不需要真实账号，也不会真的发出文章。
+统计每个步骤（见 utils/tracing.py 的 span）和端到端的耗时，保存为 JSON；
+与之前某次提交保存的结果比较，耗时明显变长的步骤标记为回退。
+
+用法：
+    python benchmark.py                                  # 每个平台跑 3 次，打印各步骤耗时
+    python benchmark.py -n 5 --save bench_results/base.json
+    python benchmark.py --baseline bench_results/base.json  # 有回退时退出码为 1
+"""
+
+import io
+import json
+import math
+import os
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+# 基准测试的统计、截图、图片缓存都放到临时目录，不影响正式使用的数据（必须在导入发布模块前设置）
+WORK_DIR = tempfile.mkdtemp(prefix="publish-bench-")
+os.environ.setdefault("STRATEGY_STATS_FILE", os.path.join(WORK_DIR, "strategy_stats.json"))
+os.environ.setdefault("ARTIFACTS_DIR", os.path.join(WORK_DIR, "artifacts"))
+os.environ.setdefault("IMAGE_CACHE_DIR", os.path.join(WORK_DIR, "image_cache"))
+
+from bench.mock_sites import MockSiteServer
+from platforms.wechat import WeChatPublisher
+from platforms.toutiao import ToutiaoPublisher
+from platforms.xiaohongshu import XiaohongshuPublisher
+from utils.article import Article
+from utils.auth_manager import AuthManager, SESSION_COOKIES
+from utils.publish_runner import publish_one, publish_concurrently
+from utils.tracing import tracer
+
+PLATFORMS = {
+    "wechat": WeChatPublisher,
+    "toutiao": ToutiaoPublisher,
+    "xiaohongshu": XiaohongshuPublisher,
+}
+
+# 比较时，中位数变慢超过 REGRESSION_THRESHOLD（比例）且超过 REGRESSION_MIN_DELTA（秒）才算回退
+REGRESSION_THRESHOLD = 0.2
+REGRESSION_MIN_DELTA = 0.1
+
+# 端到端耗时在报告里的名字
+E2E = "end_to_end"
+
+
+def write_png(path, width=800, height=600):
+    """写一张纯色 PNG 作为测试图片（不依赖 Pillow）"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    row = b"\x00" + b"\xe0\x60\x40" * width
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(row * height)))
+        f.write(chunk(b"IEND", b""))
+    return path
+
+
+def make_article(paragraphs, images):
+    """生成测试文章：paragraphs 段正文、images 张图片"""
+    paths = [write_png(os.path.join(WORK_DIR, f"image_{i}.png")) for i in range(images)]
+    content = "\n".join(
+        f"第 {i + 1} 段。离线基准测试使用的正文内容，用来衡量写入长文章的耗时。" * 3
+        for i in range(paragraphs)
+    )
+    return Article("离线基准测试文章", content, paths)
+
+
+def make_auth_manager(platforms):
+    """为模拟站点写入一份有效期 30 天的登录态，发布时离线检查即可通过"""
+    auth_manager = AuthManager(os.path.join(WORK_DIR, "auth_states"))
+    expires = time.time() + 30 * 24 * 3600
+    for platform in platforms:
+        state = {
+            "cookies": [{
+                "name": SESSION_COOKIES[platform][0], "value": "mock", "domain": "127.0.0.1", "path": "/",
+                "expires": expires, "httpOnly": False, "secure": False, "sameSite": "Lax",
+            }],
+            "origins": [],
+        }
+        with open(auth_manager.get_state_path(platform), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+    return auth_manager
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_once(platforms, article, auth_manager, job_id, parallel):
+    """跑一轮，返回 {platform: 结果字典}"""
+    classes = [PLATFORMS[name] for name in platforms]
+    if parallel:
+        return publish_concurrently(classes, article, auth_manager, headless=True, job_id=job_id)
+    return {
+        PlatformClass.PLATFORM_NAME: publish_one(PlatformClass, article, auth_manager, headless=True, job_id=job_id)
+        for PlatformClass in classes
+    }
+
+
+def collect(job_id, results):
+    """把一轮的 span 和结果整理成 {platform: {"steps": {步骤: (秒, 调用次数)}, "success": bool}}"""
+    runs = {}
+    for platform, result in results.items():
+        runs[platform] = {"steps": {}, "success": result["success"]}
+        runs[platform]["steps"][E2E] = (result["duration"], result.get("timing", {}).get("rpc_calls"))
+    for span in tracer.spans(job_id) or []:
+        run = runs.get(span["platform"])
+        if run is None:
+            continue
+        seconds, calls = run["steps"].get(span["name"], (0.0, 0))
+        run["steps"][span["name"]] = (seconds + span["duration"], (calls or 0) + (span["rpc_calls"] or 0))
+    return runs
+
+
+def percentile(values, fraction):
+    """最近秩百分位数"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def aggregate(all_runs):
+    """多轮结果汇总为每个平台、每个步骤的中位数 / p90 / 最小值（秒）和调用次数中位数"""
+    platforms = {}
+    for runs in all_runs:
+        for platform, run in runs.items():
+            item = platforms.setdefault(platform, {"runs": 0, "success": 0, "samples": {}})
+            item["runs"] += 1
+            item["success"] += int(run["success"])
+            for name, sample in run["steps"].items():
+                item["samples"].setdefault(name, []).append(sample)
+
+    report = {}
+    for platform, item in platforms.items():
+        steps = {}
+        for name, samples in item["samples"].items():
+            seconds = [s for s, _ in samples]
+            calls = [c for _, c in samples if c is not None]
+            steps[name] = {
+                "median": round(statistics.median(seconds), 3),
+                "p90": round(percentile(seconds, 0.9), 3),
+                "min": round(min(seconds), 3),
+                "rpc_calls": int(statistics.median(calls)) if calls else None,
+            }
+        report[platform] = {"runs": item["runs"], "success": item["success"], "steps": steps}
+    return report
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD, min_delta=REGRESSION_MIN_DELTA):
+    """返回回退列表 [{platform, step, baseline, current, change}]，按变慢的秒数从大到小"""
+    regressions = []
+    for platform, item in current["platforms"].items():
+        base_steps = baseline.get("platforms", {}).get(platform, {}).get("steps", {})
+        for name, stats in item["steps"].items():
+            base = base_steps.get(name)
+            if not base:
+                continue
+            delta = stats["median"] - base["median"]
+            if delta > min_delta and delta > base["median"] * threshold:
+                regressions.append({
+                    "platform": platform, "step": name,
+                    "baseline": base["median"], "current": stats["median"],
+                    "change": round(delta / base["median"], 3) if base["median"] else None,
+                })
+    return sorted(regressions, key=lambda r: r["current"] - r["baseline"], reverse=True)
+
+
+def print_report(report, baseline=None):
+    base_platforms = (baseline or {}).get("platforms", {})
+    for platform, item in report["platforms"].items():
+        print(f"\n[{platform}] 成功 {item['success']}/{item['runs']}")
+        print(f"  {'步骤':<20}{'中位数':>10}{'p90':>10}{'最小':>10}{'调用':>8}{'基线':>10}")
+        base_steps = base_platforms.get(platform, {}).get("steps", {})
+        for name, stats in item["steps"].items():
+            base = base_steps.get(name)
+            base_text = f"{base['median']:.3f}" if base else "-"
+            calls = stats["rpc_calls"] if stats["rpc_calls"] is not None else "-"
+            print(f"  {name:<20}{stats['median']:>10.3f}{stats['p90']:>10.3f}{stats['min']:>10.3f}"
+                  f"{calls:>8}{base_text:>10}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="在本地模拟站点上测量各平台发布流程的耗时")
+    parser.add_argument("-n", "--iterations", type=int, default=3, help="每个平台跑几轮（默认 3）")
+    parser.add_argument("--warmup", type=int, default=1, help="不计入统计的预热轮数（默认 1）")
+    parser.add_argument("--platforms", default=",".join(PLATFORMS), help="逗号分隔的平台，默认全部")
+    parser.add_argument("--parallel", action="store_true", help="三个平台并发发布（默认逐个发布，结果更稳定）")
+    parser.add_argument("--paragraphs", type=int, default=30, help="测试文章的段落数")
+    parser.add_argument("--images", type=int, default=3, help="测试文章的图片数")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="模拟站点页面响应延迟（秒）")
+    parser.add_argument("--upload-latency", type=float, default=0.3, help="模拟上传接口延迟（秒）")
+    parser.add_argument("--save", help="把结果保存为 JSON")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 比较，有回退时退出码为 1")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="回退判定的变慢比例")
+    parser.add_argument("--min-delta", type=float, default=REGRESSION_MIN_DELTA, help="回退判定的最小变慢秒数")
+    args = parser.parse_args()
+
+    platforms = [name.strip() for name in args.platforms.split(",") if name.strip()]
+    unknown = [name for name in platforms if name not in PLATFORMS]
+    if unknown:
+        parser.error(f"未知平台: {', '.join(unknown)}")
+
+    server = MockSiteServer(page_latency=args.page_latency, upload_latency=args.upload_latency).start()
+    for name in platforms:
+        os.environ[f"{name.upper()}_BASE_URL"] = server.base_url(name)
+    print(f"模拟站点: {server.root}，工作目录: {WORK_DIR}")
+
+    article = make_article(args.paragraphs, args.images)
+    auth_manager = make_auth_manager(platforms)
+
+    # 流程走到需要人工操作的兜底分支时 input() 立即失败，而不是一直等待
+    stdin, sys.stdin = sys.stdin, io.StringIO()
+    all_runs = []
+    try:
+        for i in range(args.warmup + args.iterations):
+            measured = i >= args.warmup
+            job_id = f"bench-{i}"
+            print(f"\n===== 第 {i + 1} 轮{'' if measured else '（预热）'} =====")
+            results = run_once(platforms, article, auth_manager, job_id, args.parallel)
+            if measured:
+                all_runs.append(collect(job_id, results))
+    finally:
+        sys.stdin = stdin
+        server.stop()
+
+    report = {
+        "commit": current_commit(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "iterations": args.iterations,
+        "parallel": args.parallel,
+        "article": {"paragraphs": args.paragraphs, "images": args.images},
+        "latency": {"page": args.page_latency, "upload": args.upload_latency},
+        "platforms": aggregate(all_runs),
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.save}")
+
+    failed = [name for name, item in report["platforms"].items() if item["success"] < item["runs"]]
+    if failed:
+        print(f"\n⚠️  有失败的发布: {', '.join(failed)}（见上方日志）")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold, args.min_delta)
+        print(f"\n与基线 {baseline.get('commit', '?')} 比较（当前 {report['commit']}）：", end="")
+        if not regressions:
+            print("没有回退")
+        else:
+            print(f"{len(regressions)} 个步骤变慢")
+            for r in regressions:
+                change = f"+{r['change'] * 100:.0f}%" if r["change"] is not None else ""
+                print(f"  [{r['platform']}] {r['step']}: {r['baseline']:.3f}s → {r['current']:.3f}s {change}")
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
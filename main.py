@@ -1,8 +1,10 @@
 import sys
 import os
-from playwright.sync_api import sync_playwright
 from utils.auth_manager import AuthManager
 from utils.content_generator import generate_article
+from utils.publish_runner import publish_concurrently, MAX_PARALLEL_PLATFORMS, HEADLESS_MODE
+from utils.article import Article
+from utils.browser_helper import get_browser_config
 from platforms.wechat import WeChatPublisher
 from platforms.toutiao import ToutiaoPublisher
 from platforms.xiaohongshu import XiaohongshuPublisher
@@ -60,11 +62,7 @@ def main():
             image_path = input("图片路径: ").strip()
 
     
-    article = {
-        'title': title,
-        'content': content,
-        'images': [image_path] if image_path else []
-    }
+    article = Article(title, content, [image_path])
     
     platforms = []
     if choice == '1':
@@ -83,51 +81,39 @@ def main():
 
     auth_manager = AuthManager()
 
-    with sync_playwright() as p:
-        # Launch browser (Headful so user can see/login)
-        browser = p.chromium.launch(headless=False)
-        
-        for PlatformClass in platforms:
-            platform_name = PlatformClass.PLATFORM_NAME
-            print(f"\n--- Processing {platform_name} ---")
-            
-            # Load existing state if available
-            state_path = auth_manager.load_state(platform_name)
-            
-            if state_path:
-                print(f"Loading session from {state_path}")
-                context = browser.new_context(storage_state=state_path)
-            else:
-                print("No existing session found. Starting fresh context.")
-                context = browser.new_context()
-            
-            publisher = PlatformClass(context)
-            
-            try:
-                # 1. Login (or verify login)
-                publisher.login()
-                
-                # 2. Save state after successful login/check
-                auth_manager.save_state(context, platform_name)
-                
-                # 3. Publish (直接开始，不询问)
-                publisher.publish(article)
-                print(f"Finished processing {platform_name}")
-                    
-            except Exception as e:
-                print(f"Error on {platform_name}: {e}")
-            finally:
-                context.close()
-                
-        print("\nAll tasks completed.")
-        
-        # 询问是否保持浏览器打开（方便下次继续使用）
-        keep_open = input("保持浏览器打开？(y/n) [n]: ").strip().lower()
-        if keep_open == 'y':
-            print("浏览器保持打开。手动关闭浏览器窗口退出。")
-            input("按 Enter 关闭浏览器...")
-        
-        browser.close()
+    # 保存过多个账号的平台，询问发布到哪些账号（留空为默认账号）
+    targets = []
+    for PlatformClass in platforms:
+        named = [a for a in auth_manager.list_accounts(PlatformClass.PLATFORM_NAME) if a]
+        accounts = []
+        if named:
+            answer = input(f"{PlatformClass.PLATFORM_NAME} 账号（{', '.join(named)}，逗号分隔，留空为默认账号）: ")
+            accounts = [a.strip() for a in answer.split(",") if a.strip()]
+        targets.extend((PlatformClass, account) for account in (accounts or [None]))
+
+    # 每个平台账号独立的浏览器，同时发布
+    # 已登录的平台无头运行；需要扫码时自动打开可见浏览器（PUBLISH_HEADLESS=false 可始终显示）
+    # 与 Web 端一致：使用检测到的本地 Chrome（有 executable_path 时）
+    browser_config = get_browser_config()
+    launch_options = {"headless": True}
+    if browser_config.get("executable_path"):
+        launch_options["executable_path"] = browser_config["executable_path"]
+
+    results = publish_concurrently(
+        targets, article, auth_manager,
+        launch_options=launch_options,
+        max_parallel=MAX_PARALLEL_PLATFORMS,
+        headless=HEADLESS_MODE
+    )
+
+    print("\n=== 发布结果 ===")
+    for label, result in results.items():
+        if result.get("success"):
+            print(f"{label}: ✅ 完成 ({result['duration']}s)")
+        else:
+            print(f"{label}: ❌ 失败 {result.get('error', '')}")
+
+    print("\nAll tasks completed.")
 
 if __name__ == "__main__":
     main()
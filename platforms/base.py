@@ -1,27 +1,479 @@
+import os
+import time
+import traceback
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from playwright.sync_api import Page, BrowserContext
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from utils.artifacts import (
+    FrameBuffer, new_job_id, job_dir, cleanup_artifacts, CAPTURE_MODE, JPEG_QUALITY
+)
+from utils.field_resolver import RESOLVE_FIELDS_JS, field_selector
+from utils.rpc_counter import RpcCounter, wrap
+from utils.strategy_stats import strategy_stats
+from utils.tracing import tracer
+from utils.article import Article
+from utils.auth_manager import target_label
+from utils.image_prep import preprocessor
+from utils.step_retry import policy_for, FLOW_RESTARTS
+from utils.text_insert import INSERT_TEXT_JS, INSERT_AT_FOCUS_JS, insert_args
+
+# 等待类操作的默认超时（毫秒）
+DEFAULT_WAIT_TIMEOUT = 10000
+
+
+class LoginRequiredError(Exception):
+    """无头模式下需要扫码登录，调用方应换成可见浏览器重试"""
+    pass
+
+
+class ManualActionRequired(LoginRequiredError):
+    """无头模式下自动操作失败、需要人工在页面上完成，调用方应换成可见浏览器重试"""
+    pass
+
+
+class StepFailed(Exception):
+    """步骤做完了但结果检查没通过（例如标题没写进去），交给 run_steps 按重试策略处理"""
+    pass
+
+
+class _UploadNotStarted(Exception):
+    """track_uploads 的 action 没有触发上传，用来提前结束监听"""
+
 
 class BasePublisher(ABC):
-    def __init__(self, context: BrowserContext):
-        self.context = context
+    PLATFORM_NAME = ""
+    # 平台后台地址，可用环境变量 <PLATFORM>_BASE_URL 覆盖（例如指向本地的模拟站点做基准测试）
+    BASE_URL = ""
+    # 发布流程的步骤名，按顺序执行 step_<步骤名>()（见 run_steps）
+    STEPS = ()
+
+    def __init__(self, context: BrowserContext, headless: bool = False, session: dict = None,
+                 job_id: str = None, account: str = None):
+        # 统计与浏览器的协议往返次数：context 及其创建的 page 都经过计数代理
+        self.rpc = RpcCounter()
+        self.context = wrap(context, self.rpc)
         self.page = None
+        self.headless = headless
+        # AuthManager.check_state 的离线检查结果
+        self.session = session or {}
+        self.job_id = job_id or new_job_id()
+        # 发布到该平台的哪个账号，None 为默认账号；label 用于结果和追踪
+        self.account = account
+        self.label = target_label(self.PLATFORM_NAME, account)
+        self.base_url = os.environ.get(f"{self.PLATFORM_NAME.upper()}_BASE_URL", self.BASE_URL).rstrip("/")
+        # 调试截图先放内存，失败时才落盘
+        self.frames = FrameBuffer()
+        # resolve_fields 的结果
+        self.fields = {}
+        # track_uploads 记录的每个文件的上传情况
+        self.uploads = []
+        # 当前的 phase span（见 phase）
+        self._phase = None
+        # 发布流程的检查点（见 run_steps）：当前步骤、已完成的步骤、各步骤的尝试次数、从头重来的次数
+        self.step = None
+        self.completed_steps = []
+        self.step_attempts = {}
+        self.restarts = 0
+        # 当前步骤是不是重试（前一次在同一个页面上失败过），步骤里可以据此先检查页面状态
+        self.retrying = False
+        self.article = None
+        self.view = None
+        # 耗时统计：等待页面就绪的时间 vs 总时间
+        self.started_at = time.time()
+        self.wait_seconds = 0.0
 
     @abstractmethod
     def login(self):
         """
-        Handle login process. 
+        Handle login process.
         Should check if logged in, if not, wait for user input (QR scan).
         """
         pass
 
-    @abstractmethod
-    def publish(self, article: dict):
+    def publish(self, article: Article):
         """
         Publish the article.
-        article dict should contain:
-        - title
-        - content (html or text)
-        - images (list of paths)
+        article 为 utils.article.Article，各步骤里用 self.view（本平台的版本：限长的标题和正文、摘要、段落 HTML）
         """
-        pass
+        if not self.page:
+            self.login()
+        self.run_steps(article)
+
+    # ========== 步骤与检查点 ==========
+
+    def run_steps(self, article: Article):
+        """
+        按 STEPS 顺序执行各步骤，每完成一步记一个检查点
+        出错时按步骤的重试策略（见 utils.step_retry）处理：
+        - 页面还能用：等待退避时间后在同一个页面上重做出错的这一步，已完成的步骤不重做
+        - 页面不能用、且还没开始会发出文章的步骤：换一个新页面从第一步重来（最多 FLOW_RESTARTS 次）
+        - 否则抛出
+        步骤的结果检查没通过时用 step_failed 抛出，同样按上面的规则重试
+        """
+        self.article = article
+        self.view = article.rendition(self.PLATFORM_NAME)
+        committed = False
+        index = 0
+        while index < len(self.STEPS):
+            name = self.step = self.STEPS[index]
+            policy = policy_for(self.PLATFORM_NAME, name)
+            attempt = self.step_attempts[name] = self.step_attempts.get(name, 0) + 1
+            committed = committed or policy.commit
+            self.phase(name)
+            try:
+                getattr(self, f"step_{name}")()
+            except LoginRequiredError:
+                raise
+            except Exception as e:
+                self.phase(None, error=e)
+                print(f"[{self.PLATFORM_NAME}] Step '{name}' failed (attempt {attempt}/{policy.attempts}): {e}")
+                self.capture(f"{name}_failed")
+                if attempt < policy.attempts and self.page_usable():
+                    restart = False
+                elif attempt < policy.attempts and not committed and self.restarts < FLOW_RESTARTS:
+                    restart = True
+                else:
+                    print(f"[{self.PLATFORM_NAME}] Error: {e}")
+                    self.capture("error")
+                    traceback.print_exc()
+                    raise
+                delay = policy.delay(attempt)
+                if restart:
+                    self.restart_flow()
+                    index = 0
+                    print(f"[{self.PLATFORM_NAME}] Page unusable, restarting from '{self.STEPS[0]}' in a new page")
+                else:
+                    print(f"[{self.PLATFORM_NAME}] Resuming at '{name}' after {delay:.1f}s "
+                          f"(checkpoint: {self.completed_steps[-1] if self.completed_steps else '-'})")
+                # 在页面上等待而不是 time.sleep：等待期间 Playwright 的路由和事件处理照常进行
+                with self._waiting():
+                    self.page.wait_for_timeout(delay * 1000)
+                self.retrying = not restart
+                continue
+            self.retrying = False
+            self.completed_steps.append(name)
+            index += 1
+        self.phase(None)
+
+    def step_failed(self, message, manual=False):
+        """
+        步骤的结果检查没通过：还能重试时抛出 StepFailed，由 run_steps 重做这一步
+        manual 为 True 表示调用方后面有手动兜底（wait_for_operator），最后一次尝试时只打印并返回，交给用户完成
+        """
+        policy = policy_for(self.PLATFORM_NAME, self.step)
+        if not manual or self.step_attempts.get(self.step, 0) < policy.attempts:
+            raise StepFailed(message)
+        print(f"[{self.PLATFORM_NAME}] ⚠️  {message}")
+
+    def page_usable(self):
+        """出错后当前页面还能不能接着用：没有关闭、还在平台后台、没有被跳到登录页"""
+        if self.page is None or self.page.is_closed():
+            return False
+        try:
+            url = self.page.evaluate("location.href")
+        except Exception:
+            return False
+        return url.startswith(self.base_url) and "login" not in url
+
+    def restart_flow(self):
+        """丢掉当前页面和检查点，从第一步重来"""
+        self.restarts += 1
+        self.completed_steps = []
+        self.step_attempts = {}
+        self.fields = {}
+        if self.page is not None and not self.page.is_closed():
+            self.page.close()
+        self.page = self.context.new_page()
+
+    def checkpoint_report(self):
+        """已完成的步骤、最后一个检查点、各步骤的尝试次数和从头重来的次数"""
+        return {
+            "completed": list(self.completed_steps),
+            "checkpoint": self.completed_steps[-1] if self.completed_steps else None,
+            "attempts": dict(self.step_attempts),
+            "retried": [name for name, count in self.step_attempts.items() if count > 1],
+            "restarts": self.restarts,
+        }
+
+    def url(self, path="/"):
+        """平台后台下的完整地址"""
+        return self.base_url + path
+
+    def session_is_valid(self):
+        """离线检查认为登录态明确有效"""
+        return self.session.get("status") in ("valid", "expiring")
+
+    def skip_login_check(self):
+        """登录态明确有效时返回 True，此时 login 可以不打开页面确认"""
+        if self.session_is_valid():
+            print(f"[{self.PLATFORM_NAME}] Session valid offline ({self.session['cookie']}), skipping login check")
+            return True
+        return False
+
+    def require_interactive_login(self):
+        """需要用户扫码时调用：无头模式下无法扫码，直接抛出 LoginRequiredError"""
+        if self.headless:
+            raise LoginRequiredError(f"{self.PLATFORM_NAME} 登录已失效，需要在可见浏览器中扫码登录")
+
+    def wait_for_operator(self, action, prompt="", headful_retry=True):
+        """
+        自动操作失败时请用户在浏览器里手动完成 action，按回车后继续
+        无头模式下没有人能看到页面，不能等输入：headful_retry 时抛出 ManualActionRequired，
+        由调用方换成可见浏览器重试；已经点过发布、不能从头重来的步骤传 headful_retry=False，直接失败
+        """
+        if self.headless:
+            message = f"{self.PLATFORM_NAME} 需要{action}，无头模式下无法完成"
+            if headful_retry:
+                raise ManualActionRequired(message)
+            raise RuntimeError(message)
+        return input(prompt)
+
+    # ========== 调试截图 ==========
+
+    def capture(self, label):
+        """截一张可视区域的 JPEG 放进内存缓冲区（CAPTURE_MODE=off 时不截）"""
+        if CAPTURE_MODE == "off" or self.page is None or self.page.is_closed():
+            return
+        start = time.time()
+        try:
+            data = self.page.screenshot(type="jpeg", quality=JPEG_QUALITY, full_page=False)
+        except Exception as e:
+            print(f"[{self.PLATFORM_NAME}] Capture '{label}' failed: {e}")
+            return
+        self.frames.add(label, data, time.time() - start)
+        if CAPTURE_MODE == "all":
+            self.save_captures()
+
+    def artifact_dir(self):
+        """本任务、本平台账号的产物目录：artifacts/<job_id>/<platform>[/<account>]"""
+        return job_dir(self.job_id, self.PLATFORM_NAME, *([self.account] if self.account else []))
+
+    def save_captures(self):
+        """把缓冲区里的截图写到本任务的产物目录，返回目录路径"""
+        directory = self.artifact_dir()
+        paths = self.frames.flush(directory)
+        if paths:
+            print(f"[{self.PLATFORM_NAME}] Saved {len(paths)} screenshots to {directory}")
+        cleanup_artifacts()
+        return directory
+
+    # ========== 步骤追踪 ==========
+
+    @contextmanager
+    def step(self, name, **attrs):
+        """
+        把一段操作记为一个 span（见 utils.tracing），带平台、任务 ID 和 Playwright 调用次数
+        结束时一并结束其中用 phase 开始的阶段
+        """
+        with tracer.span(name, self.label, self.job_id, rpc=self.rpc, **attrs):
+            try:
+                yield
+            except BaseException as e:
+                self.phase(None, error=e)
+                raise
+            self.phase(None)
+
+    def phase(self, name, error=None):
+        """
+        顺序步骤的简写：结束上一个阶段并开始名为 name 的新阶段，name 为 None 时只结束
+        用于 publish 里"打开编辑器 → 填写 → 上传 → 发布"这样一段接一段的流程
+        """
+        if self._phase is not None:
+            tracer.finish(self._phase, error)
+            self._phase = None
+        if name:
+            self._phase = tracer.start(name, self.label, self.job_id, rpc=self.rpc)
+
+    # ========== 字段解析 ==========
+
+    def resolve_fields(self, spec):
+        """
+        一次往返找出 spec 里所有字段（见 utils.field_resolver），返回 {字段: 信息或 None}
+        找到的字段之后用 self.field(name) 操作
+        """
+        info = self.page.evaluate(RESOLVE_FIELDS_JS, spec)
+        self.fields.update(info)
+        found = [name for name, item in info.items() if item]
+        missing = [name for name, item in info.items() if not item]
+        print(f"[{self.PLATFORM_NAME}] Resolved fields: {found or '-'}; missing: {missing or '-'}")
+        return info
+
+    def has_field(self, name):
+        return bool(self.fields.get(name))
+
+    def field(self, name):
+        """已解析字段的 Locator（本地构造，不产生往返）"""
+        return self.page.locator(field_selector(name)).first
+
+    # ========== 文字写入 ==========
+
+    def insert_text(self, target, text, html=None):
+        """
+        一次写入标题或正文（见 utils.text_insert），保留段落并触发编辑器自己的变更处理
+        target 为 resolve_fields 的字段名或 Locator；html 为已经算好的段落 HTML（可选）
+        返回 {method, length, text}
+        """
+        locator = self.field(target) if isinstance(target, str) else target
+        info = locator.evaluate(INSERT_TEXT_JS, insert_args(text, html))
+        print(f"[{self.PLATFORM_NAME}] Inserted {info['length']} chars via {info['method']}")
+        return info
+
+    def insert_at_focus(self, text):
+        """写入当前获得焦点的元素（手动模式下用户先点击目标区域），没有焦点元素返回 None"""
+        info = self.page.evaluate(INSERT_AT_FOCUS_JS, insert_args(text))
+        if info:
+            print(f"[{self.PLATFORM_NAME}] Inserted {info['length']} chars via {info['method']}")
+        return info
+
+    # ========== 图片 ==========
+
+    def prepare_images(self, paths):
+        """按本平台限制缩放、压缩图片（见 utils.image_prep），返回上传用的路径"""
+        prepared = preprocessor.prepare(paths, self.PLATFORM_NAME)
+        for src, dest in zip(paths, prepared):
+            if src != dest:
+                print(f"[{self.PLATFORM_NAME}] Image {src}: {os.path.getsize(src) // 1024} KB -> "
+                      f"{os.path.getsize(dest) // 1024} KB")
+        return prepared
+
+    # ========== 备选策略 ==========
+
+    def try_strategies(self, step, strategies):
+        """
+        依次尝试 [(策略名, 函数), ...]，函数返回真值表示成功
+        顺序按以往记录调整（见 utils.strategy_stats），上次成功的先试
+        返回成功的策略名，全部失败返回 None
+        """
+        funcs = dict(strategies)
+        for name in strategy_stats.order(self.PLATFORM_NAME, step, list(funcs)):
+            start = time.time()
+            try:
+                ok = bool(funcs[name]())
+            except LoginRequiredError:
+                raise
+            except Exception as e:
+                print(f"[{self.PLATFORM_NAME}] {step} '{name}' failed: {e}")
+                ok = False
+            strategy_stats.record(self.PLATFORM_NAME, step, name, ok, time.time() - start)
+            if ok:
+                return name
+        return None
+
+    # ========== 就绪等待 ==========
+
+    @contextmanager
+    def _waiting(self):
+        """统计等待耗时"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.wait_seconds += time.time() - start
+
+    def wait_for_element(self, selector, timeout=DEFAULT_WAIT_TIMEOUT, state="visible"):
+        """等待元素出现（或达到指定 state），超时返回 False"""
+        with self._waiting():
+            try:
+                self.page.locator(selector).first.wait_for(state=state, timeout=timeout)
+                return True
+            except PlaywrightTimeoutError:
+                return False
+
+    def wait_for_url(self, url, timeout=DEFAULT_WAIT_TIMEOUT):
+        """等待页面 URL 匹配（glob / 正则 / 函数），超时返回 False"""
+        with self._waiting():
+            try:
+                self.page.wait_for_url(url, timeout=timeout, wait_until="commit")
+                return True
+            except PlaywrightTimeoutError:
+                return False
+
+    def wait_for_response(self, url_or_predicate, action=None, timeout=DEFAULT_WAIT_TIMEOUT):
+        """
+        等待匹配的网络响应，返回 Response，超时返回 None
+        action 会在开始监听后执行（例如触发上传的点击），避免错过响应
+        """
+        with self._waiting():
+            try:
+                with self.page.expect_response(url_or_predicate, timeout=timeout) as response_info:
+                    if action:
+                        action()
+                return response_info.value
+            except PlaywrightTimeoutError:
+                return None
+
+    def track_uploads(self, paths, action, is_upload, done_expression=None, timeout=60000):
+        """
+        执行 action 触发上传，按网络响应和页面状态判断上传完成，不用固定等待
+        is_upload(response) 判断一个响应是否是上传接口的返回，收到与文件数相同的响应即认为网络上传完成；
+        done_expression 为页面内 JS 条件（参数为文件数），网络完成后再确认页面已处理完
+        action 返回 False 表示没有触发上传，此时直接返回 None
+        返回每个文件的 {file, bytes, seconds, kbps}，超时返回 None
+        """
+        start = time.time()
+        finished = []
+
+        def on_response(response):
+            if is_upload(response):
+                finished.append(time.time())
+            return len(finished) >= len(paths)
+
+        network_done = True
+        with self._waiting():
+            try:
+                with self.page.expect_event("response", predicate=on_response, timeout=timeout):
+                    if action() is False:
+                        raise _UploadNotStarted()
+            except _UploadNotStarted:
+                return None
+            except PlaywrightTimeoutError:
+                network_done = False
+
+        page_done = True
+        if done_expression:
+            remaining = max(1000, timeout - (time.time() - start) * 1000)
+            page_done = self.wait_for_condition(done_expression, arg=len(paths), timeout=remaining)
+        if not network_done and not page_done:
+            print(f"[{self.PLATFORM_NAME}] Upload not confirmed after {timeout / 1000:.0f}s "
+                  f"({len(finished)}/{len(paths)} responses)")
+            return None
+
+        # 响应按完成顺序对应到文件，没等到响应的文件按整体耗时计
+        total = time.time() - start
+        report = []
+        for index, path in enumerate(paths):
+            seconds = (finished[index] - start) if index < len(finished) else total
+            size = os.path.getsize(path) if os.path.isfile(path) else 0
+            report.append({
+                "file": os.path.basename(path),
+                "bytes": size,
+                "seconds": round(seconds, 2),
+                "kbps": round(size / 1024 / seconds, 1) if seconds > 0 else None,
+            })
+            print(f"[{self.PLATFORM_NAME}] Uploaded {report[-1]['file']}: {size // 1024} KB "
+                  f"in {report[-1]['seconds']}s ({report[-1]['kbps']} KB/s)")
+        self.uploads.extend(report)
+        return report
+
+    def wait_for_condition(self, expression, arg=None, timeout=DEFAULT_WAIT_TIMEOUT):
+        """等待页面内 JS 条件为真，超时返回 False"""
+        with self._waiting():
+            try:
+                self.page.wait_for_function(expression, arg=arg, timeout=timeout)
+                return True
+            except PlaywrightTimeoutError:
+                return False
 
+    def timing_report(self):
+        """本次运行的耗时：总时间、等待时间、操作时间（秒）"""
+        total = time.time() - self.started_at
+        return {
+            "total": round(total, 2),
+            "waiting": round(self.wait_seconds, 2),
+            "acting": round(max(total - self.wait_seconds, 0.0), 2),
+            "capturing": round(self.frames.encode_seconds, 2),
+            "rpc_calls": self.rpc.calls,
+            "uploads": self.uploads,
+        }
@@ -1,9 +1,45 @@
-import time
 from .base import BasePublisher
+from utils.article import PLATFORM_LIMITS
+
+# 图文上传选项卡可用的标志
+IMAGE_TAB_READY = "() => document.body && document.body.innerText.includes('上传图片') && document.body.innerText.includes('拖拽图片')"
+
+# 图片上传处理完成：出现标题输入框且没有上传中的提示
+UPLOAD_DONE = "() => !!document.querySelector(\"input[placeholder*='标题']\") && !/上传中/.test(document.body.innerText)"
+
+
+def is_upload_response(response):
+    return response.request.method in ("POST", "PUT") and "upload" in response.url
+
+
+# 上传图片后的编辑区字段（见 utils.field_resolver），按顺序取第一个命中的候选
+EDITOR_FIELDS = {
+    "title": [
+        {"css": "input", "placeholder": "标题"},
+        {"css": '[contenteditable="true"]', "placeholder": "标题"},
+        {"css": '[contenteditable="true"]', "text": "填写标题"},
+    ],
+    "content": [
+        # 较大的编辑区才是正文
+        {"css": ".ql-editor", "min_height": 100},
+        {"css": "[contenteditable='true']", "min_height": 100},
+    ],
+    "publish": [
+        {"texts": ["发布"], "pick": "innermost"},
+        {"texts": ["发布笔记"], "pick": "innermost"},
+        {"texts": ["立即发布"], "pick": "innermost"},
+        {"css": 'button, [class*="btn"], [class*="publish"]', "text": "发布"},
+    ],
+}
 
 class XiaohongshuPublisher(BasePublisher):
     PLATFORM_NAME = "xiaohongshu"
-    LOGIN_URL = "https://creator.xiaohongshu.com/"
+    BASE_URL = "https://creator.xiaohongshu.com"
+    # 发布流程的步骤（见 BasePublisher.run_steps），出错时从最后一个完成的步骤接着做：
+    # 图片上传完成后再出错，重试不会重新上传
+    STEPS = ("open_publish_page", "close_popup", "switch_tab", "upload_images", "fill_title", "fill_content", "submit")
+    # 图片已上传（upload_images 重试时不再上传）
+    images_uploaded = False
 
     def login(self):
         self.page = self.context.new_page()
@@ -11,22 +47,26 @@ class XiaohongshuPublisher(BasePublisher):
         # 设置更长的超时时间
         self.page.set_default_timeout(60000)  # 60秒
         
+        # 登录态有效时不单独检查，publish 会直接打开发布页
+        if self.skip_login_check():
+            return
+        
         # 直接访问发布页面，如果未登录会自动跳转到登录页
         print(f"[{self.PLATFORM_NAME}] Navigating to publish page...")
         try:
-            self.page.goto("https://creator.xiaohongshu.com/publish/publish", timeout=60000)
+            self.page.goto(self.url("/publish/publish"), timeout=60000, wait_until="domcontentloaded")
         except Exception as e:
             print(f"[{self.PLATFORM_NAME}] Page load slow, continuing... {e}")
         
         print(f"[{self.PLATFORM_NAME}] Checking login status...")
-        try:
-            self.page.wait_for_load_state("domcontentloaded", timeout=30000)
-        except:
-            pass
-        time.sleep(3)  # 等久一点，让页面完全加载
+        # 等到能判断登录状态为止：跳到登录页、出现登录表单或出现发布选项卡
+        self.wait_for_condition("""
+        () => location.href.includes('login') ||
+            (document.body && /上传图文|短信登录|扫码登录/.test(document.body.innerText))
+        """, timeout=15000)
         
         # 截图看看当前状态
-        self.page.screenshot(path="xhs_login_check.png")
+        self.capture("login_check")
         
         current_url = self.page.url
         print(f"[{self.PLATFORM_NAME}] Current URL: {current_url}")
@@ -58,6 +98,7 @@ class XiaohongshuPublisher(BasePublisher):
             return
         
         if needs_login:
+            self.require_interactive_login()
             print(f"[{self.PLATFORM_NAME}] ========================================")
             print(f"[{self.PLATFORM_NAME}] 需要登录小红书创作者中心")
             print(f"[{self.PLATFORM_NAME}] 请在浏览器中选择登录方式：")
@@ -66,67 +107,38 @@ class XiaohongshuPublisher(BasePublisher):
             print(f"[{self.PLATFORM_NAME}] ========================================")
             print(f"[{self.PLATFORM_NAME}] 等待登录完成（最长3分钟）...")
             
-            # 等待用户登录成功
-            try:
-                last_url = ""
-                for i in range(180):  # 最多等3分钟
-                    time.sleep(1)
-                    current_url = self.page.url
-                    
-                    # 每10秒打印一次状态
-                    if i % 10 == 0:
-                        print(f"[{self.PLATFORM_NAME}] Waiting... URL: {current_url[:60]}...")
-                    
-                    # URL 变化时打印
-                    if current_url != last_url:
-                        print(f"[{self.PLATFORM_NAME}] URL changed to: {current_url}")
-                        last_url = current_url
-                    
-                    # 检查是否已经进入发布页面
-                    if "publish" in current_url and "login" not in current_url:
-                        print(f"[{self.PLATFORM_NAME}] ✅ Login successful! Now on publish page.")
-                        time.sleep(2)
-                        return
-                    
-                    # 检查是否在创作者中心首页
-                    if "creator.xiaohongshu.com" in current_url:
-                        # 检查页面是否还有登录表单
-                        try:
-                            login_form = self.page.locator("text=短信登录").count()
-                            phone_input = self.page.locator("text=手机号").count()
-                            if login_form == 0 and phone_input == 0:
-                                print(f"[{self.PLATFORM_NAME}] ✅ Login successful!")
-                                time.sleep(2)
-                                return
-                        except:
-                            pass
-                    
-                    # 检查是否有用户头像或昵称（登录成功的标志）
-                    try:
-                        avatar = self.page.locator(".user-avatar, .avatar, [class*='avatar']").count()
-                        if avatar > 0:
-                            print(f"[{self.PLATFORM_NAME}] ✅ Login successful! (avatar detected)")
-                            time.sleep(2)
-                            return
-                    except:
-                        pass
-                
-                # 超时后截图
-                self.page.screenshot(path="xhs_login_timeout.png")
-                print(f"[{self.PLATFORM_NAME}] ⚠️  Login timeout. Screenshot saved: xhs_login_timeout.png")
-                print(f"[{self.PLATFORM_NAME}] Current URL: {self.page.url}")
-                print(f"[{self.PLATFORM_NAME}] If you are logged in, press Enter to continue...")
-                input()
-                
-            except Exception as e:
-                print(f"[{self.PLATFORM_NAME}] Login error: {e}")
+            # 等待用户登录成功：进入发布页、登录表单消失或出现用户头像
+            logged_in = self.wait_for_condition("""
+            () => {
+                let url = location.href;
+                if (url.includes('publish') && !url.includes('login')) return true;
+                if (!url.includes('creator.xiaohongshu.com') || !document.body) return false;
+                let text = document.body.innerText;
+                if (!text.includes('短信登录') && !text.includes('手机号')) return true;
+                return !!document.querySelector(".user-avatar, .avatar, [class*='avatar']");
+            }
+            """, timeout=180000)
+            
+            if logged_in:
+                print(f"[{self.PLATFORM_NAME}] ✅ Login successful! URL: {self.page.url}")
+                return
+            
+            # 超时后截图
+            self.capture("login_timeout")
+            self.save_captures()
+            print(f"[{self.PLATFORM_NAME}] ⚠️  Login timeout.")
+            print(f"[{self.PLATFORM_NAME}] Current URL: {self.page.url}")
+            print(f"[{self.PLATFORM_NAME}] If you are logged in, press Enter to continue...")
+            self.wait_for_operator("确认登录")
         else:
             print(f"[{self.PLATFORM_NAME}] ✅ Already logged in!")
 
-    def publish(self, article: dict):
-        if not self.page:
-            self.login()
-            
+    def restart_flow(self):
+        super().restart_flow()
+        self.page.set_default_timeout(60000)
+        self.images_uploaded = False
+
+    def step_open_publish_page(self):
         print(f"[{self.PLATFORM_NAME}] Starting publish process...")
         
         # 检查当前是否已在发布页面
@@ -134,22 +146,28 @@ class XiaohongshuPublisher(BasePublisher):
         if "publish/publish" not in current_url:
             print(f"[{self.PLATFORM_NAME}] Navigating to publish page...")
             try:
-                self.page.goto("https://creator.xiaohongshu.com/publish/publish", timeout=30000)
+                self.page.goto(self.url("/publish/publish"), timeout=30000, wait_until="domcontentloaded")
             except Exception as e:
                 print(f"[{self.PLATFORM_NAME}] Navigation slow: {e}")
         
-        # 等待页面加载（不用 networkidle，容易卡住）
-        try:
-            self.page.wait_for_load_state("domcontentloaded", timeout=10000)
-        except:
-            pass
-        time.sleep(2)
+        # 等待发布页选项卡渲染（不用 networkidle，容易卡住）
+        tab_ready = self.wait_for_element("text=上传图文", timeout=10000)
         
-        # 截图查看页面状态
-        self.page.screenshot(path="xhs_publish_page.png")
-        print(f"[{self.PLATFORM_NAME}] Screenshot saved: xhs_publish_page.png")
+        # 离线检查通过但服务端已失效（被跳到登录页）：走正常的登录流程
+        if not tab_ready and "login" in self.page.url and self.session_is_valid():
+            self.session = {}
+            self.page.close()
+            self.login()
+            if "publish/publish" not in self.page.url:
+                self.page.goto(self.url("/publish/publish"), timeout=30000, wait_until="domcontentloaded")
+            tab_ready = self.wait_for_element("text=上传图文", timeout=10000)
         
-        # ========== 关闭"试试文字配图吧"弹窗 ==========
+        # 截图查看页面状态
+        self.capture("publish_page")
+        if not tab_ready:
+            self.step_failed("Publish page did not load")
+
+    def step_close_popup(self):
         print(f"[{self.PLATFORM_NAME}] Closing popup '试试文字配图吧'...")
         
         try:
@@ -165,19 +183,15 @@ class XiaohongshuPublisher(BasePublisher):
                 click_y = viewport['height'] // 2
                 self.page.mouse.click(click_x, click_y)
                 print(f"[{self.PLATFORM_NAME}] Clicked right side of page ({click_x}, {click_y})")
-                time.sleep(1)
             
             # 方法2: 点击上传区域两次（灰色虚线框内）
             self.page.mouse.click(700, 400)
             print(f"[{self.PLATFORM_NAME}] Clicked center upload area (1st)")
-            time.sleep(0.5)
             self.page.mouse.click(700, 400)
             print(f"[{self.PLATFORM_NAME}] Clicked center upload area (2nd)")
-            time.sleep(0.5)
             
             # 方法3: 按 Escape
             self.page.keyboard.press("Escape")
-            time.sleep(0.5)
             
             # 方法4: JavaScript 隐藏包含"试试文字配图"的元素
             self.page.evaluate("""
@@ -202,311 +216,225 @@ class XiaohongshuPublisher(BasePublisher):
             }
             """)
             print(f"[{self.PLATFORM_NAME}] Attempted to remove popup via JS")
-            time.sleep(1)
             
         except Exception as e:
             print(f"[{self.PLATFORM_NAME}] Popup handling error: {e}")
         
-        self.page.screenshot(path="xhs_after_popup_close.png")
-        
-        # ========== 点击"上传图文"选项卡 ==========
+        self.capture("after_popup_close")
+
+    def step_switch_tab(self):
         print(f"[{self.PLATFORM_NAME}] Clicking '上传图文' tab...")
         
-        tab_clicked = False
+        # 坐标点击 / locator / JavaScript，按以往成功记录决定先试哪个
+        tab_clicked = self.try_strategies("image_tab", [
+            ("coordinate", self._tab_by_coordinate),
+            ("locator", self._tab_by_locator),
+            ("js", self._tab_by_js),
+        ]) is not None
         
-        # 方法1: 直接用坐标点击选项卡（从截图分析位置）
-        # 选项卡在页面中间上方，"上传图文"是第二个，大约 x=390, y=127
-        try:
-            self.page.mouse.click(390, 127)
-            print(f"[{self.PLATFORM_NAME}] Clicked position (390, 127) for '上传图文' tab")
-            time.sleep(1)
-            
-            # 检查是否成功（页面应该显示"上传图片"按钮而不是"上传视频"）
-            page_content = self.page.content()
-            if "上传图片" in page_content and "拖拽图片" in page_content:
-                tab_clicked = True
-                print(f"[{self.PLATFORM_NAME}] Tab switch successful!")
-        except Exception as e:
-            print(f"[{self.PLATFORM_NAME}] Coordinate click failed: {e}")
-        
-        # 方法2: 使用 locator（带滚动）
         if not tab_clicked:
-            try:
-                # 精确查找选项卡区域的"上传图文"
-                tabs = self.page.locator("text=上传图文")
-                for i in range(tabs.count()):
-                    tab = tabs.nth(i)
-                    box = tab.bounding_box()
-                    if box and box['y'] < 200:  # 选项卡在页面上方
-                        # 先滚动到元素可见
-                        tab.scroll_into_view_if_needed()
-                        time.sleep(0.5)
-                        tab.click(force=True)
-                        print(f"[{self.PLATFORM_NAME}] Clicked '上传图文' tab via locator")
-                        tab_clicked = True
-                        time.sleep(2)
-                        break
-            except Exception as e:
-                # 不打印详细错误，因为可能还有其他方法成功
-                print(f"[{self.PLATFORM_NAME}] Locator method: trying next...")
+            self.step_failed("Could not auto-click '上传图文'", manual=True)
+            print(f"[{self.PLATFORM_NAME}] Please click '上传图文' tab manually, then press Enter...")
+            self.wait_for_operator("手动切换到上传图文")
         
-        # 方法3: JavaScript 点击
-        if not tab_clicked:
+        self.capture("image_tab")
+
+    def step_upload_images(self):
+        # 上一次上传没等到确认，但页面可能已经处理完了，不再重复上传
+        if self.retrying and not self.images_uploaded and self.wait_for_condition(UPLOAD_DONE, timeout=1000):
+            self.images_uploaded = True
+        if self.images_uploaded:
+            print(f"[{self.PLATFORM_NAME}] Images already uploaded, waiting for editor...")
+        else:
+            self._upload_images()
+        
+        # 图片处理完成后才会出现标题输入框
+        editor_ready = self.wait_for_element("input[placeholder*='标题']", timeout=30000)
+        self.capture("after_upload")
+        if not editor_ready:
+            self.step_failed("Editor did not appear after upload")
+
+    def step_fill_title(self):
+        # 处理内容（小红书正文限制 1000 字、标题限制 20 字，见 utils.article）
+        limits = PLATFORM_LIMITS[self.PLATFORM_NAME]
+        
+        if self.view.truncated:
+            print(f"[{self.PLATFORM_NAME}] ⚠️  Content too long ({len(self.article.content)} chars), truncating to {limits['content']}...")
+        
+        if self.view.title != self.article.title:
+            print(f"[{self.PLATFORM_NAME}] ⚠️  Title too long ({len(self.article.title)} chars), truncating to {limits['title']}...")
+        
+        # 一次往返定位标题、正文和发布按钮
+        self.resolve_fields(EDITOR_FIELDS)
+        
+        print(f"[{self.PLATFORM_NAME}] Filling title...")
+        
+        if not self.has_field("title"):
+            self.step_failed("Title input not found")
+        self.field("title").fill(self.view.title)
+        print(f"[{self.PLATFORM_NAME}] Title filled via {self.fields['title']['tag'].lower()}")
+
+    def step_fill_content(self):
+        content = self.view.content
+        print(f"[{self.PLATFORM_NAME}] Filling content (length: {len(content)} chars)...")
+        # 重试时编辑器可能重新渲染过，重新定位
+        if self.retrying:
+            self.resolve_fields(EDITOR_FIELDS)
+        
+        if not self.has_field("content"):
+            self.step_failed("Content editor not found")
+        self.insert_text("content", content, html=self.view.html)
+        print(f"[{self.PLATFORM_NAME}] Content filled via editor")
+        
+        self.capture("after_fill")
+
+    def step_submit(self):
+        print(f"[{self.PLATFORM_NAME}] Looking for publish button...")
+        
+        publish_clicked = False
+        if self.has_field("publish"):
             try:
-                result = self.page.evaluate("""
-                () => {
-                    // 找选项卡区域（通常有特定的 class）
-                    let tabs = document.querySelectorAll('[class*="tab"], [role="tab"]');
-                    for (let tab of tabs) {
-                        if (tab.textContent.trim() === '上传图文') {
-                            tab.click();
-                            return 'Clicked via tab class';
-                        }
-                    }
-                    
-                    // 遍历所有元素找精确匹配
-                    let elements = document.querySelectorAll('span, div, a, li');
-                    for (let el of elements) {
-                        let rect = el.getBoundingClientRect();
-                        // 选项卡在页面上方 (y < 200) 且文字精确匹配
-                        if (el.textContent.trim() === '上传图文' && rect.top < 200 && rect.top > 50) {
-                            el.click();
-                            return 'Clicked via position filter: y=' + rect.top;
-                        }
-                    }
-                    return 'Not found';
-                }
-                """)
-                print(f"[{self.PLATFORM_NAME}] JS result: {result}")
-                if 'Clicked' in result:
-                    tab_clicked = True
-                    time.sleep(2)
+                self.field("publish").click()
+                print(f"[{self.PLATFORM_NAME}] Clicked '{self.fields['publish']['text']}'")
+                publish_clicked = True
             except Exception as e:
-                print(f"[{self.PLATFORM_NAME}] JS method failed: {e}")
+                print(f"[{self.PLATFORM_NAME}] Publish click failed: {e}")
         
-        if not tab_clicked:
-            print(f"[{self.PLATFORM_NAME}] ⚠️  Could not auto-click '上传图文'.")
-            print(f"[{self.PLATFORM_NAME}] Please click '上传图文' tab manually, then press Enter...")
-            input()
+        if not publish_clicked:
+            print(f"[{self.PLATFORM_NAME}] ⚠️  Could not find publish button. Please click manually, then press Enter...")
+            self.wait_for_operator("手动点击发布", headful_retry=False)
         
-        time.sleep(1)
-        self.page.screenshot(path="xhs_image_tab.png")
         
-        try:
-            # ========== 1. 上传图片 ==========
-            images = article.get('images', [])
-            if not images or not images[0]:
-                print(f"[{self.PLATFORM_NAME}] ⚠️  小红书必须上传图片！")
-                print(f"[{self.PLATFORM_NAME}] 请手动上传图片后按 Enter 继续...")
-                input()
-            else:
-                print(f"[{self.PLATFORM_NAME}] Uploading images: {images}")
-                
-                upload_success = False
-                
-                # 方法1: 直接设置 input.upload-input（从日志看到这是正确的元素）
-                try:
-                    file_input = self.page.locator("input.upload-input, input[type='file']").first
-                    if file_input.count() > 0:
-                        file_input.set_input_files(images)
-                        print(f"[{self.PLATFORM_NAME}] ✅ Images uploaded via input.upload-input")
-                        upload_success = True
-                        time.sleep(3)
-                except Exception as e:
-                    print(f"[{self.PLATFORM_NAME}] Method 1 (upload-input) failed: {e}")
-                
-                # 方法2: 用 JavaScript 直接设置文件
-                if not upload_success:
-                    try:
-                        # 找到 input[type=file] 并触发
-                        file_inputs = self.page.locator("input[type='file']")
-                        count = file_inputs.count()
-                        print(f"[{self.PLATFORM_NAME}] Found {count} file inputs")
-                        
-                        for i in range(count):
-                            try:
-                                file_inputs.nth(i).set_input_files(images)
-                                print(f"[{self.PLATFORM_NAME}] ✅ Images uploaded via input #{i}")
-                                upload_success = True
-                                time.sleep(3)
-                                break
-                            except Exception as e:
-                                print(f"[{self.PLATFORM_NAME}] Input #{i} failed: {e}")
-                                continue
-                    except Exception as e:
-                        print(f"[{self.PLATFORM_NAME}] Method 2 failed: {e}")
-                
-                if not upload_success:
-                    print(f"[{self.PLATFORM_NAME}] ⚠️  Auto upload failed.")
-                    print(f"[{self.PLATFORM_NAME}] Please upload image manually, then press Enter...")
-                    input()
-            
-            # 等待图片处理
-            time.sleep(2)
-            self.page.screenshot(path="xhs_after_upload.png")
-            
-            # ========== 2. 处理内容（小红书限制1000字）==========
-            title = article['title']
-            content = article['content']
-            
-            # 小红书正文限制 1000 字
-            if len(content) > 1000:
-                print(f"[{self.PLATFORM_NAME}] ⚠️  Content too long ({len(content)} chars), truncating to 1000...")
-                content = content[:950] + "\n\n...(内容已截断)"
-            
-            # 小红书标题限制 20 字
-            if len(title) > 20:
-                print(f"[{self.PLATFORM_NAME}] ⚠️  Title too long ({len(title)} chars), truncating to 20...")
-                title = title[:20]
-            
-            # ========== 3. 填写标题 ==========
-            print(f"[{self.PLATFORM_NAME}] Filling title...")
-            
-            title_filled = False
-            
-            # 方法1: placeholder 包含"标题"
+        # 等待发布结果：成功提示、页面跳转或确认弹窗
+        self.wait_for_condition("""
+        () => !location.href.includes('publish/publish') ||
+            (document.body && /发布成功|确定|确认|知道了/.test(document.body.innerText))
+        """, timeout=10000)
+        
+        # ========== 处理可能的确认弹窗 ==========
+        for confirm_text in ["确定", "确认", "发布", "知道了"]:
             try:
-                title_input = self.page.locator("input[placeholder*='标题']")
-                if title_input.count() > 0:
-                    title_input.first.fill(title)
-                    print(f"[{self.PLATFORM_NAME}] Title filled via placeholder")
-                    title_filled = True
-            except Exception as e:
-                print(f"[{self.PLATFORM_NAME}] Title method 1 failed: {e}")
-            
-            # 方法2: 用 JavaScript 查找
-            if not title_filled:
-                result = self.page.evaluate("""
-                (title) => {
-                    // 找标题输入框
-                    let inputs = document.querySelectorAll('input, [contenteditable="true"]');
-                    for (let input of inputs) {
-                        let placeholder = input.getAttribute('placeholder') || '';
-                        let text = input.innerText || '';
-                        if (placeholder.includes('标题') || text.includes('填写标题')) {
-                            if (input.tagName === 'INPUT') {
-                                input.value = title;
-                            } else {
-                                input.innerText = title;
-                            }
-                            input.dispatchEvent(new Event('input', { bubbles: true }));
-                            return 'Title filled via JS';
-                        }
-                    }
-                    return 'Title input not found';
-                }
-                """, title)
-                print(f"[{self.PLATFORM_NAME}] {result}")
-                if 'filled' in result:
-                    title_filled = True
-            
-            time.sleep(0.5)
+                confirm_btn = self.page.get_by_text(confirm_text, exact=True)
+                if confirm_btn.count() > 0:
+                    confirm_btn.first.click()
+                    print(f"[{self.PLATFORM_NAME}] Clicked confirm: '{confirm_text}'")
+            except:
+                continue
+        
+        self.capture("final")
+        print(f"[{self.PLATFORM_NAME}] ✅ Publish completed!")
+
+    def _upload_images(self):
+        images = self.prepare_images(self.article.images)
+        if not images:
+            print(f"[{self.PLATFORM_NAME}] ⚠️  小红书必须上传图片！")
+            print(f"[{self.PLATFORM_NAME}] 请手动上传图片后按 Enter 继续...")
+            self.wait_for_operator("手动上传图片")
+        else:
+            print(f"[{self.PLATFORM_NAME}] Uploading images: {images}")
             
-            # ========== 4. 填写正文 ==========
-            print(f"[{self.PLATFORM_NAME}] Filling content (length: {len(content)} chars)...")
+            started = []
             
-            content_filled = False
+            def start_upload():
+                started.append(self.try_strategies("upload_images", [
+                    ("upload_input", lambda: self._upload_via_first_input(images)),
+                    ("each_file_input", lambda: self._upload_via_each_input(images)),
+                ]))
+                return started[0] is not None
             
-            # 方法1: 找 Quill 编辑器
-            try:
-                content_editor = self.page.locator(".ql-editor, [contenteditable='true']")
-                if content_editor.count() > 0:
-                    # 找到最合适的编辑器（通常是较大的那个）
-                    for i in range(content_editor.count()):
-                        editor = content_editor.nth(i)
-                        box = editor.bounding_box()
-                        if box and box['height'] > 100:
-                            editor.click()
-                            editor.fill(content)
-                            print(f"[{self.PLATFORM_NAME}] Content filled via editor")
-                            content_filled = True
-                            break
-            except Exception as e:
-                print(f"[{self.PLATFORM_NAME}] Content method 1 failed: {e}")
+            # 按上传接口的返回和页面状态判断完成，而不是固定等待
+            report = self.track_uploads(images, action=start_upload, is_upload=is_upload_response,
+                                        done_expression=UPLOAD_DONE, timeout=60000)
+            upload_started = bool(started and started[0])
             
-            # 方法2: JavaScript
-            if not content_filled:
-                result = self.page.evaluate("""
-                (content) => {
-                    // 找正文编辑器
-                    let editors = document.querySelectorAll('.ql-editor, [contenteditable="true"]');
-                    for (let editor of editors) {
-                        let rect = editor.getBoundingClientRect();
-                        // 找较大的编辑区域
-                        if (rect.height > 100) {
-                            editor.focus();
-                            editor.innerText = content;
-                            editor.dispatchEvent(new Event('input', { bubbles: true }));
-                            return 'Content filled via JS';
-                        }
-                    }
-                    return 'Content editor not found';
+            if upload_started and report is None:
+                self.step_failed("Upload not confirmed")
+            if not upload_started:
+                self.step_failed("Auto upload failed", manual=True)
+                print(f"[{self.PLATFORM_NAME}] Please upload image manually, then press Enter...")
+                self.wait_for_operator("手动上传图片")
+        self.images_uploaded = True
+
+    # ========== "上传图文"选项卡的几种点法 ==========
+
+    def _tab_by_coordinate(self):
+        # 选项卡在页面中间上方，"上传图文"是第二个，大约 x=390, y=127（从截图分析位置）
+        self.page.mouse.click(390, 127)
+        print(f"[{self.PLATFORM_NAME}] Clicked position (390, 127) for '上传图文' tab")
+        # 检查是否成功（页面应该显示"上传图片"按钮而不是"上传视频"）
+        if self.wait_for_condition(IMAGE_TAB_READY, timeout=3000):
+            print(f"[{self.PLATFORM_NAME}] Tab switch successful!")
+            return True
+        return False
+
+    def _tab_by_locator(self):
+        # 精确查找选项卡区域的"上传图文"
+        tabs = self.page.locator("text=上传图文")
+        for i in range(tabs.count()):
+            tab = tabs.nth(i)
+            box = tab.bounding_box()
+            if box and box['y'] < 200:  # 选项卡在页面上方
+                # 先滚动到元素可见
+                tab.scroll_into_view_if_needed()
+                tab.click(force=True)
+                print(f"[{self.PLATFORM_NAME}] Clicked '上传图文' tab via locator")
+                self.wait_for_condition(IMAGE_TAB_READY, timeout=5000)
+                return True
+        return False
+
+    def _tab_by_js(self):
+        result = self.page.evaluate("""
+        () => {
+            // 找选项卡区域（通常有特定的 class）
+            let tabs = document.querySelectorAll('[class*="tab"], [role="tab"]');
+            for (let tab of tabs) {
+                if (tab.textContent.trim() === '上传图文') {
+                    tab.click();
+                    return 'Clicked via tab class';
                 }
-                """, content)
-                print(f"[{self.PLATFORM_NAME}] {result}")
-            
-            time.sleep(1)
-            self.page.screenshot(path="xhs_after_fill.png")
-            
-            # ========== 4. 点击发布按钮 ==========
-            print(f"[{self.PLATFORM_NAME}] Looking for publish button...")
-            
-            publish_clicked = False
-            
-            # 方法1: 找"发布"按钮
-            for btn_text in ["发布", "发布笔记", "立即发布"]:
-                try:
-                    publish_btn = self.page.get_by_text(btn_text, exact=True)
-                    if publish_btn.count() > 0:
-                        publish_btn.first.click()
-                        print(f"[{self.PLATFORM_NAME}] Clicked '{btn_text}'")
-                        publish_clicked = True
-                        break
-                except:
-                    continue
-            
-            # 方法2: JavaScript
-            if not publish_clicked:
-                result = self.page.evaluate("""
-                () => {
-                    let buttons = document.querySelectorAll('button, [class*="btn"], [class*="publish"]');
-                    for (let btn of buttons) {
-                        let text = btn.textContent.trim();
-                        if (text === '发布' || text === '发布笔记' || text.includes('发布')) {
-                            btn.click();
-                            return 'Clicked: ' + text;
-                        }
-                    }
-                    return 'Publish button not found';
+            }
+
+            // 遍历所有元素找精确匹配
+            let elements = document.querySelectorAll('span, div, a, li');
+            for (let el of elements) {
+                let rect = el.getBoundingClientRect();
+                // 选项卡在页面上方 (y < 200) 且文字精确匹配
+                if (el.textContent.trim() === '上传图文' && rect.top < 200 && rect.top > 50) {
+                    el.click();
+                    return 'Clicked via position filter: y=' + rect.top;
                 }
-                """)
-                print(f"[{self.PLATFORM_NAME}] JS result: {result}")
-                if 'Clicked' in result:
-                    publish_clicked = True
-            
-            if not publish_clicked:
-                print(f"[{self.PLATFORM_NAME}] ⚠️  Could not find publish button. Please click manually, then press Enter...")
-                input()
-            
-            time.sleep(3)
-            
-            # ========== 5. 处理可能的确认弹窗 ==========
-            for confirm_text in ["确定", "确认", "发布", "知道了"]:
-                try:
-                    confirm_btn = self.page.get_by_text(confirm_text, exact=True)
-                    if confirm_btn.count() > 0:
-                        confirm_btn.first.click()
-                        print(f"[{self.PLATFORM_NAME}] Clicked confirm: '{confirm_text}'")
-                        time.sleep(1)
-                except:
-                    continue
-            
-            time.sleep(2)
-            self.page.screenshot(path="xhs_final.png")
-            print(f"[{self.PLATFORM_NAME}] ✅ Publish completed!")
-            
-        except Exception as e:
-            print(f"[{self.PLATFORM_NAME}] Error: {e}")
-            self.page.screenshot(path="xhs_error.png")
-            import traceback
-            traceback.print_exc()
+            }
+            return 'Not found';
+        }
+        """)
+        print(f"[{self.PLATFORM_NAME}] JS result: {result}")
+        if 'Clicked' in result:
+            self.wait_for_condition(IMAGE_TAB_READY, timeout=5000)
+            return True
+        return False
+
+    # ========== 图片上传的几种方式 ==========
+
+    def _upload_via_first_input(self, images):
+        # 直接设置 input.upload-input（从日志看到这是正确的元素）
+        file_input = self.page.locator("input.upload-input, input[type='file']").first
+        if file_input.count() == 0:
+            return False
+        file_input.set_input_files(images)
+        print(f"[{self.PLATFORM_NAME}] ✅ Images uploaded via input.upload-input")
+        return True
+
+    def _upload_via_each_input(self, images):
+        # 逐个尝试页面上的 input[type=file]
+        file_inputs = self.page.locator("input[type='file']")
+        count = file_inputs.count()
+        print(f"[{self.PLATFORM_NAME}] Found {count} file inputs")
+        for i in range(count):
+            try:
+                file_inputs.nth(i).set_input_files(images)
+                print(f"[{self.PLATFORM_NAME}] ✅ Images uploaded via input #{i}")
+                return True
+            except Exception as e:
+                print(f"[{self.PLATFORM_NAME}] Input #{i} failed: {e}")
+        return False
+
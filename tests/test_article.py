@@ -0,0 +1,65 @@
+"""文章模型：各平台版本的长度限制、共享原文和内容哈希"""
+
+from utils.article import PLATFORM_LIMITS, TRUNCATED_SUFFIX, Article
+
+XHS = PLATFORM_LIMITS["xiaohongshu"]
+
+
+def test_xiaohongshu_limits():
+    article = Article("标" * (XHS["title"] + 5), "字" * (XHS["content"] + 1))
+    rendition = article.rendition("xiaohongshu")
+    assert rendition.title == "标" * XHS["title"]
+    assert rendition.truncated
+    assert rendition.content == "字" * XHS["content_keep"] + TRUNCATED_SUFFIX
+    # 原始数据不变
+    assert len(article.title) == XHS["title"] + 5
+
+
+def test_content_at_limit_is_not_truncated():
+    article = Article("标题", "字" * XHS["content"])
+    rendition = article.rendition("xiaohongshu")
+    assert not rendition.truncated
+    assert rendition.content == article.content
+
+
+def test_untruncated_renditions_share_strings():
+    article = Article("标题", "第一段\n第二段" * 200)
+    for platform in ("wechat", "toutiao", "unknown"):
+        rendition = article.rendition(platform)
+        assert rendition.title is article.title
+        assert rendition.content is article.content
+        assert not rendition.truncated
+
+
+def test_summary_is_plain_text():
+    article = Article("标题", "第一行\r\n第二行" + "字" * 200)
+    summary = article.rendition("wechat").summary
+    assert len(summary) <= PLATFORM_LIMITS["wechat"]["summary"]
+    assert "\n" not in summary and "\r" not in summary
+    assert summary.startswith("第一行 第二行")
+
+
+def test_rendition_is_computed_once():
+    article = Article("标题", "正文")
+    rendition = article.rendition("toutiao")
+    assert article.rendition("toutiao") is rendition
+    assert rendition.html is rendition.html
+    assert article.rendition("wechat") is not rendition
+
+
+def test_content_hash():
+    article = Article("标题", "正文", ["a.png", "", None])
+    assert article.images == ("a.png",)
+    assert article.content_hash == Article("标题", "正文", ["a.png"]).content_hash
+    assert article == Article("标题", "正文", ["a.png"])
+    assert len({article, Article("标题", "正文", ["a.png"])}) == 1
+    # 字段之间有分隔，拼接结果相同也不会冲突
+    assert Article("ab", "c").content_hash != Article("a", "bc").content_hash
+    assert Article("标题", "正文").content_hash != article.content_hash
+
+
+def test_coerce_round_trip():
+    article = Article("标题", "正文", ["a.png"])
+    assert Article.coerce(article) is article
+    assert Article.coerce(article.to_dict()) == article
+    assert article.cover == "a.png" and Article("t", "c").cover is None
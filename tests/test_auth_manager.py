@@ -0,0 +1,98 @@
+"""离线判断登录状态：check_state 和解析缓存"""
+
+import json
+import os
+import time
+
+import pytest
+
+from utils.auth_manager import (
+    EXPIRING_WITHIN,
+    SESSION_EXPIRED,
+    SESSION_EXPIRING,
+    SESSION_MISSING,
+    SESSION_UNKNOWN,
+    SESSION_VALID,
+    AuthManager,
+)
+
+
+@pytest.fixture
+def auth(tmp_path):
+    return AuthManager(str(tmp_path / "auth_states"))
+
+
+def save(auth, cookies, platform_name="toutiao", account=None):
+    path = auth.get_state_path(platform_name, account)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"cookies": cookies, "origins": []}, f)
+    return path
+
+
+def cookie(name, expires):
+    return {"name": name, "value": "v", "domain": ".example.com", "path": "/", "expires": expires}
+
+
+# ========== check_state ==========
+
+def test_missing(auth):
+    assert auth.check_state("toutiao")["status"] == SESSION_MISSING
+    assert auth.check_state("toutiao", "alt")["status"] == SESSION_MISSING
+
+
+def test_broken_file_is_missing(auth):
+    path = auth.get_state_path("toutiao")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+    assert auth.check_state("toutiao")["status"] == SESSION_MISSING
+
+
+def test_no_session_cookie_is_expired(auth):
+    save(auth, [cookie("tracking", time.time() + 3600)])
+    assert auth.check_state("toutiao") == {"status": SESSION_EXPIRED, "expires_at": None, "cookie": None}
+
+
+def test_expired(auth):
+    expires = time.time() - 10
+    save(auth, [cookie("sessionid", expires)])
+    assert auth.check_state("toutiao") == {"status": SESSION_EXPIRED, "expires_at": expires,
+                                           "cookie": "sessionid"}
+
+
+def test_expiring(auth):
+    save(auth, [cookie("sessionid", time.time() + EXPIRING_WITHIN / 2)])
+    assert auth.check_state("toutiao")["status"] == SESSION_EXPIRING
+
+
+def test_valid_uses_latest_session_cookie(auth):
+    expires = time.time() + 2 * EXPIRING_WITHIN
+    save(auth, [cookie("sessionid", time.time() - 10), cookie("sid_tt", expires)])
+    assert auth.check_state("toutiao") == {"status": SESSION_VALID, "expires_at": expires, "cookie": "sid_tt"}
+
+
+def test_session_only_cookie_is_unknown(auth):
+    save(auth, [cookie("sessionid", -1)])
+    assert auth.check_state("toutiao") == {"status": SESSION_UNKNOWN, "expires_at": None, "cookie": "sessionid"}
+
+
+def test_accounts_are_checked_separately(auth):
+    save(auth, [cookie("web_session", time.time() + 2 * EXPIRING_WITHIN)], "xiaohongshu", "alt")
+    assert auth.check_state("xiaohongshu", "alt")["status"] == SESSION_VALID
+    assert auth.check_state("xiaohongshu")["status"] == SESSION_MISSING
+
+
+# ========== 解析缓存 ==========
+
+def test_state_is_reparsed_only_when_mtime_changes(auth):
+    path = save(auth, [cookie("sessionid", time.time() + 2 * EXPIRING_WITHIN)])
+    stat = os.stat(path)
+    assert auth.check_state("toutiao")["status"] == SESSION_VALID
+
+    # 内容变了但 mtime 不变：仍使用缓存的解析结果
+    save(auth, [cookie("sessionid", time.time() - 10)])
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert auth.check_state("toutiao")["status"] == SESSION_VALID
+
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert auth.check_state("toutiao")["status"] == SESSION_EXPIRED
@@ -0,0 +1,126 @@
+"""浏览器池：启动失败、预热、不可用时快速失败（用假的 Playwright，不启动真实浏览器）"""
+
+import threading
+import time
+
+import pytest
+
+import utils.browser_pool as browser_pool
+from utils.browser_pool import BrowserPool
+
+
+class FakeContext:
+    def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    def new_context(self, **options):
+        return FakeContext()
+
+    def close(self):
+        self.closed = True
+
+
+class FakeChromium:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.launched = []
+
+    def launch(self, **options):
+        if self.fail:
+            raise RuntimeError("Executable doesn't exist")
+        self.launched.append(options)
+        return FakeBrowser()
+
+
+class FakePlaywright:
+    def __init__(self, chromium):
+        self.chromium = chromium
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fast_idle_check(monkeypatch):
+    monkeypatch.setattr(browser_pool, "IDLE_CHECK_INTERVAL", 0.05)
+
+
+def use_playwright(monkeypatch, factory):
+    monkeypatch.setattr(browser_pool, "sync_playwright", factory)
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_runs_task_in_fresh_context(monkeypatch):
+    chromium = FakeChromium()
+    use_playwright(monkeypatch, lambda: FakePlaywright(chromium))
+    pool = BrowserPool(2, {"headless": True})
+    try:
+        assert pool.submit(lambda context: isinstance(context, FakeContext)).result(timeout=5)
+    finally:
+        pool.shutdown()
+
+
+def test_launch_failure_keeps_slots_alive(monkeypatch):
+    chromium = FakeChromium(fail=True)
+    use_playwright(monkeypatch, lambda: FakePlaywright(chromium))
+    pool = BrowserPool(1, {"headless": True})
+    try:
+        # 启动时预热失败不会让 slot 退出，任务得到启动失败的异常
+        with pytest.raises(RuntimeError, match="Executable"):
+            pool.submit(lambda context: None).result(timeout=5)
+        chromium.fail = False
+        assert pool.submit(lambda context: "ok").result(timeout=5) == "ok"
+        assert pool.error is None
+    finally:
+        pool.shutdown()
+
+
+def test_driver_failure_fails_fast(monkeypatch):
+    started = threading.Event()
+
+    def broken():
+        # 等测试先提交一个任务，再让 slot 失败
+        started.wait(5)
+        raise RuntimeError("driver not found")
+
+    use_playwright(monkeypatch, broken)
+    pool = BrowserPool(2, {"headless": True})
+    queued = pool.submit(lambda context: None)
+    started.set()
+    with pytest.raises(RuntimeError, match="浏览器池不可用"):
+        queued.result(timeout=5)
+    assert wait_for(lambda: pool.error is not None)
+    with pytest.raises(RuntimeError, match="driver not found"):
+        pool.submit(lambda context: None)
+
+
+def test_warm_does_not_use_task_queue(monkeypatch):
+    chromium = FakeChromium()
+    use_playwright(monkeypatch, lambda: FakePlaywright(chromium))
+    pool = BrowserPool(2, {"headless": True}, prewarm=False)
+    try:
+        pool.warm()
+        assert pool._tasks.qsize() == 0
+        assert wait_for(lambda: len(chromium.launched) == 2)
+        assert all(stat["browsers"] == ["headless"] for stat in pool.stats())
+    finally:
+        pool.shutdown()
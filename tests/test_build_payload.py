@@ -0,0 +1,30 @@
+"""发布请求校验：build_payload"""
+
+import pytest
+
+app_module = pytest.importorskip("app")
+
+REQUEST = {"platforms": ["wechat", "toutiao"], "title": "标题", "content": "正文"}
+
+
+def test_max_parallel_defaults_to_all_targets():
+    payload, error = app_module.build_payload(dict(REQUEST))
+    assert error is None
+    assert payload["max_parallel"] >= len(payload["targets"])
+
+
+def test_max_parallel_accepts_numeric_string():
+    payload, error = app_module.build_payload(dict(REQUEST, maxParallel="3"))
+    assert error is None and payload["max_parallel"] == 3
+
+
+@pytest.mark.parametrize("value", ["abc", -1, True, [2], {"n": 1}])
+def test_invalid_max_parallel_is_rejected(value):
+    payload, error = app_module.build_payload(dict(REQUEST, maxParallel=value))
+    assert payload is None and "maxParallel" in error
+
+
+def test_invalid_max_parallel_returns_400():
+    response = app_module.app.test_client().post("/api/publish", json=dict(REQUEST, maxParallel="abc"))
+    assert response.status_code == 400
+    assert "maxParallel" in response.get_json()["error"]
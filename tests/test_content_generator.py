@@ -0,0 +1,135 @@
+"""模型输出的解析：与原来的一次性解析一致，流式输出与最终结果一致"""
+
+import random
+
+import pytest
+
+from utils.content_generator import _IncrementalParser, _parse_output
+
+SAMPLES = [
+    "【标题】\n春天来了\n\n【正文】\n第一段。\n\n第二段。\n",
+    "【标题】：AI 会取代程序员吗？\n【正文】：\n  不会。\n理由如下……\n\n\n",
+    "好的，下面是文章：\n【标题】\n标题\n【正文】\n正文内容\n【正文】\n多出来的部分",
+    "【标题】只有标题没有正文标记\n第二行",
+    # 没按格式输出：第一行是标题，其余是正文
+    "一个没有标记的标题\n\n正文第一段\n正文第二段  \n",
+    "前言" * 150 + "\n【标题】\n很晚才出现的标记\n【正文】\n正文",
+    "  \n\n开头有空行的标题\n正文",
+    # 标记出现在 MARKER_WINDOW 字以后
+    "x" * 250 + "【正文】body",
+    "很长的第一行" * 40 + "\n正文开头\n【标题】后来的标题\n【正文】后来的正文",
+    "【正文】正文在前\n【标题】标题在后",
+    "【标题】\n【正文】\n",
+]
+
+
+def baseline_parse(result):
+    """改成流式之前 ContentGenerator._parse_result 的实现"""
+    title = ""
+    content = ""
+
+    if "【标题】" in result:
+        parts = result.split("【标题】")
+        if len(parts) > 1:
+            title_part = parts[1].split("【正文】")[0] if "【正文】" in parts[1] else parts[1]
+            title = title_part.strip().strip("：:").strip()
+
+    if "【正文】" in result:
+        parts = result.split("【正文】")
+        if len(parts) > 1:
+            content = parts[1].strip()
+
+    if not title:
+        lines = result.strip().split("\n")
+        title = lines[0].strip()[:30]
+
+    if not content:
+        lines = result.strip().split("\n")
+        content = "\n".join(lines[1:]).strip()
+
+    return title, content
+
+
+def stream(text, sizes):
+    parser = _IncrementalParser()
+    events = []
+    pos = 0
+    for size in sizes:
+        events.extend(parser.feed(text[pos:pos + size]))
+        pos += size
+    events.extend(parser.feed(text[pos:]))
+    return events, parser
+
+
+def check(text, sizes):
+    events, parser = stream(text, sizes)
+    title, content = parser.result()
+    assert (title, content) == baseline_parse(text)
+    titles = [e["title"] for e in events if e["type"] == "title"]
+    deltas = "".join(e["text"] for e in events if e["type"] == "delta")
+    if parser.diverged:
+        # 按原文输出后又出现了标记：标记之后的内容不再输出
+        assert "【" not in deltas
+    else:
+        assert titles in ([], [title])
+        # 有正文就一定边生成边输出，拼起来与最终正文一致
+        assert deltas in ("", content)
+    return titles, deltas, parser.diverged
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_parse_output_matches_baseline(text):
+    assert _parse_output(text) == baseline_parse(text)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_every_chunk_size_matches_oneshot(text):
+    for size in range(1, 12):
+        check(text, [size] * (len(text) // size))
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_random_chunks_match_oneshot(text):
+    rng = random.Random(text)
+    for _ in range(50):
+        check(text, [rng.randint(1, 8) for _ in range(len(text))])
+
+
+def test_marked_output_streams_title_and_content():
+    titles, deltas, _ = check(SAMPLES[0], [3] * 20)
+    assert titles == ["春天来了"]
+    assert deltas == "第一段。\n\n第二段。"
+
+
+def test_unmarked_output_streams_raw_text():
+    text = "没有标记的标题\n正文第一段\n" + "正文" * 200
+    parser = _IncrementalParser()
+    events = []
+    for i in range(0, len(text), 5):
+        events.extend(parser.feed(text[i:i + 5]))
+    # 还没结束就已经输出了标题和正文
+    assert events[0] == {"type": "title", "title": "没有标记的标题"}
+    assert "".join(e["text"] for e in events[1:]) == parser.result()[1]
+
+
+def test_late_markers_stop_streaming_and_parse_as_before():
+    text = "前言" * 150 + "\n【标题】\n很晚才出现的标记\n【正文】\n正文"
+    for size in (1, 7, len(text)):
+        _, _, diverged = check(text, [size] * (len(text) // size))
+        assert diverged
+    assert _parse_output(text) == ("很晚才出现的标记", "正文")
+    assert _parse_output("x" * 250 + "【正文】body")[1] == "body"
+
+
+def test_events_do_not_depend_on_chunking():
+    for text in SAMPLES:
+        expected, parser = stream(text, [])
+        if parser.diverged:
+            continue
+        rng = random.Random(text)
+        for _ in range(20):
+            events, _ = stream(text, [rng.randint(1, 8) for _ in range(len(text))])
+            merged = [e for e in events if e["type"] == "title"]
+            assert merged == [e for e in expected if e["type"] == "title"]
+            assert "".join(e["text"] for e in events if e["type"] == "delta") == \
+                "".join(e["text"] for e in expected if e["type"] == "delta")
@@ -0,0 +1,72 @@
+"""任务事件广播与 SSE 连接数上限"""
+
+import pytest
+
+from utils.events import EventBroker, format_sse
+
+
+def test_subscribe_unknown_job_ends_immediately():
+    broker = EventBroker()
+    assert list(broker.subscribe("missing")) == []
+    assert not broker.known("missing")
+
+
+def test_subscriber_reads_events_then_stops_on_close():
+    broker = EventBroker()
+    broker.publish("job", "status", {"status": "running"})
+    broker.publish("job", "log", {"line": "hello"})
+    broker.close("job")
+    events = list(broker.subscribe("job"))
+    assert [(event_id, kind) for event_id, kind, _ in events] == [(1, "status"), (2, "log")]
+    # 断线重连：从 Last-Event-ID 之后继续
+    assert [e[0] for e in broker.subscribe("job", last_event_id=1)] == [2]
+
+
+def test_heartbeat_when_idle():
+    broker = EventBroker()
+    broker.publish("job", "status", {})
+    stream = broker.subscribe("job", last_event_id=1, heartbeat=0.01)
+    assert next(stream) is None
+    assert format_sse(None).startswith(":")
+
+
+def test_acquire_is_capped():
+    broker = EventBroker(max_subscribers=2)
+    assert broker.acquire() and broker.acquire()
+    assert not broker.acquire()
+    broker.release()
+    assert broker.acquire()
+
+
+# ========== /api/jobs/<ID>/events ==========
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    app_module = pytest.importorskip("app")
+    from utils.job_queue import JobStore
+
+    monkeypatch.setattr(app_module, "job_store", JobStore(db_path=str(tmp_path / "jobs.db")))
+    monkeypatch.setattr(app_module, "event_broker", EventBroker(max_subscribers=1))
+    return app_module
+
+
+def test_events_over_limit_fall_back_to_polling(client):
+    job_id = client.job_store.create()
+    broker = client.event_broker
+    http = client.app.test_client()
+
+    assert broker.acquire()
+    response = http.get(f"/api/jobs/{job_id}/events")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert response.get_json()["poll"] == f"/api/jobs/{job_id}"
+    broker.release()
+
+    # 已结束的任务：发最终状态和 end 后关闭连接，并归还名额
+    client.job_store.update(job_id, status="done")
+    response = http.get(f"/api/jobs/{job_id}/events")
+    body = response.get_data(as_text=True)
+    response.close()
+    assert response.status_code == 200
+    assert "event: status" in body and "event: end" in body
+    assert broker.subscribers == 0
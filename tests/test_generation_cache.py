@@ -0,0 +1,111 @@
+"""生成结果缓存：LRU 淘汰、过期、磁盘存储和缓存键"""
+
+import json
+import os
+
+import pytest
+
+import utils.content_generator as content_generator
+from utils.content_generator import ContentGenerator, GenerationCache
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(content_generator.time, "time", clock.time)
+    return clock
+
+
+def key(cache, topic):
+    return cache.make_key(topic, "template", "model", 0.7)
+
+
+# ========== 内存 LRU + TTL ==========
+
+def test_lru_evicts_least_recently_used():
+    cache = GenerationCache(max_entries=2, cache_dir=None)
+    a, b, c = (key(cache, topic) for topic in ("a", "b", "c"))
+    cache.put(a, "A", "正文 A")
+    cache.put(b, "B", "正文 B")
+    # 读一次 a，b 变成最久未使用
+    assert cache.get(a) == ("A", "正文 A")
+    cache.put(c, "C", "正文 C")
+    assert cache.get(b) is None
+    assert cache.get(a) == ("A", "正文 A") and cache.get(c) == ("C", "正文 C")
+    assert cache.stats() == {"entries": 2, "hits": 3, "misses": 1}
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = GenerationCache(ttl=60, cache_dir=None)
+    k = key(cache, "topic")
+    cache.put(k, "标题", "正文")
+    clock.now += 59
+    assert cache.get(k) == ("标题", "正文")
+    clock.now += 2
+    assert cache.get(k) is None
+    assert cache.stats()["entries"] == 0
+
+
+# ========== 磁盘存储 ==========
+
+def test_disk_entries_survive_restart(tmp_path):
+    k = key(GenerationCache(cache_dir=None), "topic")
+    GenerationCache(cache_dir=str(tmp_path)).put(k, "标题", "正文")
+    assert os.listdir(tmp_path) == [f"{k}.json"]
+
+    # 新实例（模拟重启）从磁盘读取，并放回内存
+    cache = GenerationCache(cache_dir=str(tmp_path))
+    assert cache.get(k) == ("标题", "正文")
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 0}
+
+
+def test_expired_disk_entry_is_removed(tmp_path, clock):
+    cache = GenerationCache(ttl=60, cache_dir=str(tmp_path))
+    k = key(cache, "topic")
+    cache.put(k, "标题", "正文")
+    clock.now += 61
+    assert GenerationCache(cache_dir=str(tmp_path)).get(k) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_broken_disk_entry_is_a_miss(tmp_path):
+    cache = GenerationCache(cache_dir=str(tmp_path))
+    k = key(cache, "topic")
+    (tmp_path / f"{k}.json").write_text(json.dumps({"title": "缺少过期时间"}), encoding="utf-8")
+    assert cache.get(k) is None
+    (tmp_path / f"{k}.json").write_text("{", encoding="utf-8")
+    assert cache.get(k) is None
+
+
+# ========== 缓存键 ==========
+
+def test_key_normalizes_topic():
+    cache = GenerationCache(cache_dir=None)
+    assert key(cache, "  AI   Tools ") == key(cache, "ai tools")
+    assert key(cache, "ai tools") != key(cache, "ai-tools")
+
+
+def test_key_changes_with_template_model_and_temperature():
+    cache = GenerationCache(cache_dir=None)
+    base = cache.make_key("topic", "template", "model", 0.7)
+    assert cache.make_key("topic", "template v2", "model", 0.7) != base
+    assert cache.make_key("topic", "template", "other", 0.7) != base
+    assert cache.make_key("topic", "template", "model", 0.8) != base
+
+
+def test_prompt_change_invalidates_generator_cache(monkeypatch):
+    cache = GenerationCache(cache_dir=None)
+    generator = ContentGenerator(cache=cache)
+    cache.put(generator._cache_key("topic"), "旧标题", "旧正文")
+    assert cache.get(generator._cache_key("topic")) == ("旧标题", "旧正文")
+
+    monkeypatch.setattr(content_generator, "PROMPT_TEMPLATE", content_generator.PROMPT_TEMPLATE + "5. 多举例子\n")
+    assert cache.get(generator._cache_key("topic")) is None
@@ -0,0 +1,183 @@
+"""幂等占用、发布中途退出与重启恢复"""
+
+import threading
+
+import pytest
+
+from utils.job_db import PUB_DONE, PUB_FAILED, PUB_INTERRUPTED, PUB_PUBLISHING, JobDatabase
+from utils.job_queue import JOB_DONE, JOB_INTERRUPTED, JOB_QUEUED, JOB_RUNNING, JobQueue, JobStore
+
+KEY = "article-hash"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+@pytest.fixture
+def db(db_path):
+    db = JobDatabase(db_path)
+    yield db
+    db.close()
+
+
+def publication(db, label, key=KEY):
+    with db._lock:
+        return db._conn.execute("SELECT job_id, status FROM publications WHERE key = ? AND label = ?",
+                                (key, label)).fetchone()
+
+
+class FakePublisher:
+    """按 app.do_publish 的顺序占用、发布、记已发布、记结果；记录真正发布的平台账号"""
+
+    def __init__(self, store, labels):
+        self.store = store
+        self.labels = labels
+        self.published = []
+        self.done = threading.Event()
+
+    def __call__(self, job_id, payload):
+        finished = set(self.store.get(job_id)["results"])
+        for label in self.labels:
+            if label in finished:
+                continue
+            owner = self.store.claim(KEY, label, job_id)
+            if owner is None:
+                self.published.append(label)
+                self.store.settle(KEY, label, job_id, True)
+                self.store.add_result(job_id, {"platform": label, "label": label, "success": True})
+            else:
+                self.store.add_result(job_id, {"platform": label, "label": label,
+                                               "success": owner["status"] == PUB_DONE,
+                                               "skipped": True, "error": ""})
+        self.done.set()
+
+
+# ========== 占用 ==========
+
+def test_claim_by_other_job_while_publishing(db):
+    assert db.claim(KEY, "wechat", "job-a") is None
+    assert db.claim(KEY, "wechat", "job-b") == {"job_id": "job-a", "status": PUB_PUBLISHING}
+    # 不同平台账号、不同文章互不影响
+    assert db.claim(KEY, "toutiao", "job-b") is None
+    assert db.claim("other-hash", "wechat", "job-b") is None
+
+
+def test_claim_twice_by_same_job(db):
+    assert db.claim(KEY, "wechat", "job-a") is None
+    assert db.claim(KEY, "wechat", "job-a") == {"job_id": "job-a", "status": PUB_PUBLISHING}
+
+
+def test_claim_after_done_and_failed(db):
+    db.claim(KEY, "wechat", "job-a")
+    db.settle(KEY, "wechat", "job-a", True)
+    assert db.claim(KEY, "wechat", "job-a") == {"job_id": "job-a", "status": PUB_DONE}
+    assert db.claim(KEY, "wechat", "job-b") == {"job_id": "job-a", "status": PUB_DONE}
+
+    db.claim(KEY, "toutiao", "job-a")
+    db.settle(KEY, "toutiao", "job-a", False)
+    assert publication(db, "toutiao") == ("job-a", PUB_FAILED)
+    assert db.claim(KEY, "toutiao", "job-b") is None
+    assert publication(db, "toutiao") == ("job-b", PUB_PUBLISHING)
+
+
+def test_settle_ignores_other_owner(db):
+    db.claim(KEY, "wechat", "job-a")
+    db.settle(KEY, "wechat", "job-b", True)
+    assert publication(db, "wechat") == ("job-a", PUB_PUBLISHING)
+
+
+def test_concurrent_claims_have_one_winner(db):
+    results = []
+    barrier = threading.Barrier(8)
+
+    def claim(i):
+        barrier.wait()
+        results.append(db.claim(KEY, "wechat", f"job-{i}"))
+
+    threads = [threading.Thread(target=claim, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(None) == 1
+
+
+def test_interrupted_blocks_same_job_only(db):
+    db.claim(KEY, "wechat", "job-a")
+    assert db.interrupt("job-a") == ["wechat"]
+    assert db.claim(KEY, "wechat", "job-a") == {"job_id": "job-a", "status": PUB_INTERRUPTED}
+    # 用户确认后重新提交的新任务可以发布
+    assert db.claim(KEY, "wechat", "job-b") is None
+
+
+# ========== 重启恢复 ==========
+
+def test_crash_between_settle_and_add_result(db_path):
+    store = JobStore(db_path=db_path)
+    job_id = store.create({"title": "标题"})
+    store.update(job_id, status=JOB_RUNNING)
+    assert store.claim(KEY, "wechat", job_id) is None
+    store.settle(KEY, "wechat", job_id, True)
+    # 还没来得及记结果就退出
+    store.db.close()
+
+    store = JobStore(db_path=db_path)
+    assert store.get(job_id)["results"] == {}
+    publisher = FakePublisher(store, ["wechat", "toutiao"])
+    queue = JobQueue(store, publisher, workers=1)
+    assert queue.recover(policy="resume") == (1, 0)
+    assert publisher.done.wait(5)
+    queue._queue.join()
+
+    job = store.get(job_id)
+    assert job["status"] == JOB_DONE
+    # 已记为发布成功的不再发第二次，只发还没发过的
+    assert publisher.published == ["toutiao"]
+    assert job["results"]["wechat"]["skipped"] and job["results"]["wechat"]["success"]
+    assert publication(store.db, "wechat") == (job_id, PUB_DONE)
+
+
+def test_recover_marks_publishing_targets_interrupted(db_path):
+    store = JobStore(db_path=db_path)
+    running = store.create({"title": "标题"})
+    store.update(running, status=JOB_RUNNING)
+    store.claim(KEY, "wechat", running)
+    store.claim(KEY, "toutiao", running)
+    store.settle(KEY, "toutiao", running, True)
+    store.add_result(running, {"platform": "toutiao", "label": "toutiao", "success": True})
+    queued = store.create({"title": "另一篇"})
+    store.db.close()
+
+    store = JobStore(db_path=db_path)
+    queue = JobQueue(store, lambda job_id, payload: None, workers=1)
+    assert queue.recover(policy="mark") == (0, 2)
+
+    job = store.get(running)
+    assert job["status"] == JOB_INTERRUPTED
+    assert job["results"]["wechat"]["interrupted"] and not job["results"]["wechat"]["success"]
+    assert job["results"]["toutiao"]["success"]
+    assert publication(store.db, "wechat") == (running, PUB_INTERRUPTED)
+    assert store.get(queued)["status"] == JOB_INTERRUPTED
+    assert not store.db.unfinished_jobs((JOB_QUEUED, JOB_RUNNING))
+
+
+def test_resumed_job_does_not_republish_interrupted(db_path):
+    store = JobStore(db_path=db_path)
+    job_id = store.create({"title": "标题"})
+    store.update(job_id, status=JOB_RUNNING)
+    store.claim(KEY, "wechat", job_id)
+    store.db.close()
+
+    store = JobStore(db_path=db_path)
+    publisher = FakePublisher(store, ["wechat"])
+    queue = JobQueue(store, publisher, workers=1)
+    assert queue.recover(policy="resume") == (1, 0)
+    assert publisher.done.wait(5)
+    queue._queue.join()
+
+    job = store.get(job_id)
+    assert publisher.published == []
+    assert job["results"]["wechat"]["interrupted"]
+    assert publication(store.db, "wechat") == (job_id, PUB_INTERRUPTED)
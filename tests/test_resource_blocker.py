@@ -0,0 +1,83 @@
+"""资源拦截的规则、路由注册和统计"""
+
+from utils.resource_blocker import (
+    ESTIMATED_BYTES,
+    RESOURCE_PATTERNS,
+    ResourceBlocker,
+    install_blocker,
+    merge_reports,
+)
+
+
+class FakeContext:
+    def __init__(self):
+        self.routes = []
+
+    def route(self, pattern, handler):
+        self.routes.append((pattern, handler))
+
+
+class FakeRoute:
+    def __init__(self, url):
+        self.request = type("Request", (), {"url": url})()
+        self.action = None
+
+    def continue_(self):
+        self.action = "continue"
+
+    def abort(self, reason):
+        self.action = "abort"
+
+    def fulfill(self, status, body, content_type=None):
+        self.action = f"fulfill {status}"
+
+
+def test_decide():
+    blocker = ResourceBlocker("wechat")
+    assert blocker.decide("https://res.wx.qq.com/a.woff2", "font") == "abort"
+    assert blocker.decide("https://res.wx.qq.com/a.png", "image") == "stub"
+    assert blocker.decide("https://mp.weixin.qq.com/mp/jsmonitor?x=1", "beacon") == "beacon"
+    # 白名单优先：上传接口和公众号图床始终放行
+    assert blocker.decide("https://mp.weixin.qq.com/cgi-bin/filetransfer?a.png", "image") is None
+    assert blocker.decide("https://mmbiz.qpic.cn/cover.jpg", "image") is None
+
+
+def test_install_routes_only_blockable_kinds():
+    context = FakeContext()
+    ResourceBlocker("toutiao").install(context)
+    patterns = [pattern.pattern for pattern, _ in context.routes]
+    assert "**/*" not in patterns
+    assert set(RESOURCE_PATTERNS.values()) <= set(patterns)
+    assert len(patterns) == len(RESOURCE_PATTERNS) + 1
+
+
+def test_headful_and_disabled_install_nothing():
+    context = FakeContext()
+    assert install_blocker(context, "wechat", headless=False) is None
+    assert context.routes == []
+    assert install_blocker(context, "wechat", headless=True) is not None
+
+
+def test_report_is_estimate_from_counts():
+    context = FakeContext()
+    blocker = ResourceBlocker("xiaohongshu").install(context)
+    handlers = {pattern.pattern: handler for pattern, handler in context.routes}
+    image = handlers[RESOURCE_PATTERNS["image"]]
+    font = handlers[RESOURCE_PATTERNS["font"]]
+
+    routes = [FakeRoute("https://cdn.example.com/a.png"), FakeRoute("https://cdn.example.com/b.png"),
+              FakeRoute("https://ros-upload.xiaohongshu.com/c.png")]
+    for route in routes:
+        image(route)
+    font(FakeRoute("https://cdn.example.com/f.ttf"))
+    assert [route.action for route in routes] == ["fulfill 200", "fulfill 200", "continue"]
+
+    report = blocker.report()
+    assert report["requests"] == 4
+    assert report["by_type"] == {"image": 2, "font": 1}
+    assert report["estimated_bytes_saved"] == 2 * ESTIMATED_BYTES["image"] + ESTIMATED_BYTES["font"]
+
+    total = merge_reports([report, None, report])
+    assert total["blocked"] == 6
+    assert total["by_type"] == {"image": 4, "font": 2}
+    assert total["estimated_bytes_saved"] == 2 * report["estimated_bytes_saved"]
@@ -0,0 +1,168 @@
+"""定时任务日志的重放、压缩与停机补发"""
+
+import threading
+import time
+
+import pytest
+
+from utils.scheduler import (
+    SCHEDULE_CANCELLED,
+    SCHEDULE_FIRED,
+    SCHEDULE_MISSED,
+    SCHEDULE_PENDING,
+    ScheduleStore,
+    Scheduler,
+)
+
+
+def make_meta(schedule_id, due_at, **fields):
+    meta = {"id": schedule_id, "due_at": due_at, "created_at": time.time(),
+            "status": SCHEDULE_PENDING, "catch_up": None, "job_id": None, "prewarm": None}
+    meta.update(fields)
+    return meta
+
+
+class Recorder:
+    """记录回调的调用，fire 时通知等待的测试"""
+
+    def __init__(self):
+        self.fired = []
+        self.prewarmed = []
+        self.event = threading.Event()
+
+    def on_fire(self, schedule, payload):
+        self.fired.append((schedule["id"], payload))
+        self.event.set()
+        return f"job-{schedule['id']}"
+
+    def on_prewarm(self, schedule, payload):
+        self.prewarmed.append(schedule["id"])
+        return {"ok": True}
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScheduleStore(str(tmp_path / "schedules.jsonl"))
+
+
+def test_replay_applies_updates(store):
+    store.add(make_meta("a", 100.0), {"title": "甲"})
+    store.add(make_meta("b", 200.0), {"title": "乙"})
+    store.update("a", status=SCHEDULE_FIRED, job_id="j1")
+    store.update("unknown", status=SCHEDULE_FIRED)
+
+    schedules = ScheduleStore(store.path).load()
+    assert set(schedules) == {"a", "b"}
+    assert schedules["a"]["status"] == SCHEDULE_FIRED
+    assert schedules["a"]["job_id"] == "j1"
+    assert schedules["b"]["status"] == SCHEDULE_PENDING
+    assert store.payload(schedules["b"]) == {"title": "乙"}
+
+
+def test_replay_skips_torn_line(store):
+    store.add(make_meta("a", 100.0), {"title": "甲"})
+    with open(store.path, "ab") as f:
+        f.write(b'{"op": "update", "id": "a", "fie')
+
+    reloaded = ScheduleStore(store.path)
+    schedules = reloaded.load()
+    assert schedules["a"]["status"] == SCHEDULE_PENDING
+    assert reloaded.lines == 1
+
+
+def test_compact_keeps_payloads(store):
+    for i in range(5):
+        store.add(make_meta(f"s{i}", 100.0 + i), {"index": i})
+        store.update(f"s{i}", prewarm={})
+    schedules = store.load()
+    assert store.lines == 10
+
+    keep = [schedules["s1"], schedules["s3"]]
+    store.compact(keep)
+    assert store.lines == 2
+    assert [store.payload(m) for m in keep] == [{"index": 1}, {"index": 3}]
+
+    reloaded = ScheduleStore(store.path).load()
+    assert set(reloaded) == {"s1", "s3"}
+    assert reloaded["s3"]["prewarm"] == {}
+    assert store.payload(reloaded["s3"]) == {"index": 3}
+
+
+def test_scheduler_compacts_finished(store, monkeypatch):
+    monkeypatch.setattr("utils.scheduler.COMPACT_SLACK", 2)
+    monkeypatch.setattr("utils.scheduler.KEEP_FINISHED", 1)
+    scheduler = Scheduler(on_fire=Recorder().on_fire, store=store).start()
+    try:
+        due = time.time() + 3600
+        kept = scheduler.add(due, {"title": "保留"})
+        cancelled = [scheduler.add(due, {"index": i})["id"] for i in range(3)]
+        for schedule_id in cancelled:
+            scheduler.cancel(schedule_id)
+    finally:
+        scheduler.stop()
+
+    schedules = ScheduleStore(store.path).load()
+    assert store.lines < 8
+    assert schedules[kept["id"]]["status"] == SCHEDULE_PENDING
+    assert store.payload(schedules[kept["id"]]) == {"title": "保留"}
+    # 部分已取消的任务被压缩掉，留下的仍是取消状态
+    assert len(schedules) < 4
+    assert all(schedules[i]["status"] == SCHEDULE_CANCELLED for i in cancelled if i in schedules)
+
+
+@pytest.mark.parametrize("policy, late, fired", [
+    ("run", 86400, True),
+    ("skip", 1, False),
+    ("window", 60, True),
+    ("window", 7200, False),
+])
+def test_catch_up(store, policy, late, fired):
+    store.add(make_meta("late", time.time() - late), {"title": "错过的"})
+    recorder = Recorder()
+    scheduler = Scheduler(on_fire=recorder.on_fire, store=store,
+                          catchup_policy=policy, catchup_window=3600).start()
+    try:
+        if fired:
+            assert recorder.event.wait(5)
+            assert wait_for(lambda: scheduler.get("late")["status"] == SCHEDULE_FIRED)
+            assert recorder.fired == [("late", {"title": "错过的"})]
+            assert scheduler.get("late")["job_id"] == "job-late"
+        else:
+            assert scheduler.get("late")["status"] == SCHEDULE_MISSED
+            assert not recorder.event.wait(0.2)
+    finally:
+        scheduler.stop()
+
+    assert ScheduleStore(store.path).load()["late"]["status"] == (SCHEDULE_FIRED if fired else SCHEDULE_MISSED)
+
+
+def test_per_schedule_policy_overrides_default(store):
+    store.add(make_meta("late", time.time() - 60, catch_up="skip"), {})
+    recorder = Recorder()
+    scheduler = Scheduler(on_fire=recorder.on_fire, store=store, catchup_policy="run").start()
+    scheduler.stop()
+    assert scheduler.get("late")["status"] == SCHEDULE_MISSED
+    assert recorder.fired == []
+
+
+def test_prewarm_then_fire(store):
+    recorder = Recorder()
+    scheduler = Scheduler(on_fire=recorder.on_fire, on_prewarm=recorder.on_prewarm,
+                          store=store, prewarm_seconds=0.1).start()
+    try:
+        meta = scheduler.add(time.time() + 0.3, {"title": "准时"})
+        assert recorder.event.wait(5)
+        assert recorder.prewarmed == [meta["id"]]
+        assert wait_for(lambda: scheduler.get(meta["id"])["status"] == SCHEDULE_FIRED)
+        assert scheduler.get(meta["id"])["prewarm"] == {"ok": True}
+    finally:
+        scheduler.stop()
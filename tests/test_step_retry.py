@@ -0,0 +1,218 @@
+"""步骤重试策略与 BasePublisher.run_steps 的检查点、重试和从头重来"""
+
+import pytest
+
+from platforms.base import BasePublisher, LoginRequiredError, StepFailed
+from utils.article import Article
+from utils.step_retry import DEFAULT_POLICY, RetryPolicy, parse_overrides, policy_for, _apply_overrides
+
+BASE_URL = "https://mp.example.com"
+
+
+# ========== 重试策略 ==========
+
+def test_delay_backs_off_and_caps():
+    policy = RetryPolicy(attempts=5, backoff=1.0, factor=2.0, max_delay=5.0)
+    assert [policy.delay(n) for n in range(1, 6)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+
+def test_attempts_at_least_one():
+    assert RetryPolicy(attempts=0).attempts == 1
+
+
+def test_policy_for_prefers_platform_entry():
+    assert policy_for("wechat", "confirm").attempts == 3
+    assert policy_for("toutiao", "confirm").attempts == 1
+    assert policy_for("toutiao", "no_such_step") is DEFAULT_POLICY
+
+
+def test_parse_overrides_skips_bad_items():
+    assert parse_overrides("upload_images=4:3, wechat.confirm=2,bad=x,=1,novalue") == {
+        "upload_images": (4, 3.0),
+        "wechat.confirm": (2, None),
+    }
+
+
+def test_overrides_keep_base_policy():
+    policies = {"confirm": RetryPolicy(attempts=1, backoff=0.5, commit=True)}
+    _apply_overrides(policies, {"wechat.confirm": (3, None), "fill_title": (5, 2.0)})
+    assert policies["wechat.confirm"].to_dict() == dict(policies["confirm"].to_dict(), attempts=3)
+    assert policies["fill_title"].attempts == 5 and policies["fill_title"].backoff == 2.0
+    assert not policies["fill_title"].commit
+
+
+# ========== run_steps ==========
+
+class FakePage:
+    def __init__(self):
+        self.url = BASE_URL + "/editor"
+        self.closed = False
+        self.waits = []
+
+    def wait_for_timeout(self, ms):
+        self.waits.append(ms)
+
+    def is_closed(self):
+        return self.closed
+
+    def evaluate(self, expression, *args):
+        return self.url
+
+    def close(self):
+        self.closed = True
+
+    def screenshot(self, **kwargs):
+        return b""
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+
+    def new_page(self):
+        self.pages.append(FakePage())
+        return self.pages[-1]
+
+
+class FakePublisher(BasePublisher):
+    """steps 为 {步骤名: [每次执行的动作]}，动作为 None（成功）、异常、"kick"（页面被跳到登录页并失败）或 "check"（结果检查不通过）"""
+
+    PLATFORM_NAME = "demo"
+    BASE_URL = BASE_URL
+    STEPS = ("open_editor", "fill_title", "fill_content", "submit")
+
+    def __init__(self, **plans):
+        super().__init__(FakeContext())
+        self.page = self.context.new_page()
+        self.plans = plans
+        self.calls = []
+
+    def login(self):
+        pass
+
+    def _run(self, name):
+        self.calls.append((name, self.page))
+        plan = self.plans.get(name) or []
+        action = plan.pop(0) if plan else None
+        if action == "kick":
+            self.page.url = BASE_URL + "/login"
+            raise RuntimeError("redirected to login")
+        if action == "check":
+            self.step_failed(f"{name} check failed")
+        elif action is not None:
+            raise action
+
+    def step_open_editor(self):
+        self._run("open_editor")
+
+    def step_fill_title(self):
+        self._run("fill_title")
+
+    def step_fill_content(self):
+        self._run("fill_content")
+
+    def step_submit(self):
+        self._run("submit")
+
+
+def names(publisher):
+    return [name for name, _ in publisher.calls]
+
+
+@pytest.fixture
+def article():
+    return Article("标题", "正文")
+
+
+def test_all_steps_once(article):
+    publisher = FakePublisher()
+    publisher.run_steps(article)
+    assert names(publisher) == list(FakePublisher.STEPS)
+    assert publisher.checkpoint_report()["checkpoint"] == "submit"
+
+
+def test_same_page_retry_resumes_at_failed_step(article):
+    publisher = FakePublisher(fill_content=[RuntimeError("flaky")])
+    first = publisher.page
+    publisher.run_steps(article)
+    assert names(publisher) == ["open_editor", "fill_title", "fill_content", "fill_content", "submit"]
+    assert all(page is first for _, page in publisher.calls)
+    # 在页面上等待退避时间（fill_content 第一次重试 0.5 秒）
+    assert first.waits == [500.0]
+    report = publisher.checkpoint_report()
+    assert report["retried"] == ["fill_content"] and report["restarts"] == 0
+
+
+def test_failed_check_is_retried(article):
+    publisher = FakePublisher(fill_title=["check", "check"])
+    publisher.run_steps(article)
+    assert names(publisher).count("fill_title") == 3
+    assert publisher.restarts == 0
+
+
+def test_unusable_page_restarts_flow(article):
+    publisher = FakePublisher(fill_content=["kick"])
+    first = publisher.page
+    publisher.run_steps(article)
+    assert names(publisher) == ["open_editor", "fill_title", "fill_content",
+                                "open_editor", "fill_title", "fill_content", "submit"]
+    assert first.closed
+    second = publisher.page
+    assert second is not first
+    assert all(page is second for _, page in publisher.calls[3:])
+    # 新页面上等待，而不是已经关掉的旧页面
+    assert second.waits == [500.0] and first.waits == []
+    assert publisher.restarts == 1
+
+
+def test_first_step_on_live_page_retries_without_restart(article):
+    publisher = FakePublisher(open_editor=[RuntimeError("slow network")])
+    first = publisher.page
+    publisher.run_steps(article)
+    assert names(publisher) == ["open_editor", "open_editor", "fill_title", "fill_content", "submit"]
+    assert not first.closed
+    assert len(publisher.context.pages) == 1
+    assert publisher.restarts == 0
+    assert first.waits == [2000.0]
+
+
+def test_restarts_are_limited(article):
+    publisher = FakePublisher(fill_title=["kick", "kick"])
+    with pytest.raises(RuntimeError):
+        publisher.run_steps(article)
+    assert publisher.restarts == 1
+
+
+def test_commit_step_is_never_retried(article):
+    publisher = FakePublisher(submit=[RuntimeError("click failed")])
+    with pytest.raises(RuntimeError):
+        publisher.run_steps(article)
+    assert names(publisher).count("submit") == 1
+
+
+def test_commit_step_is_not_restarted_on_unusable_page(article):
+    publisher = FakePublisher(submit=["kick"])
+    with pytest.raises(RuntimeError):
+        publisher.run_steps(article)
+    assert names(publisher).count("submit") == 1
+    assert publisher.restarts == 0
+
+
+def test_login_required_is_not_retried(article):
+    publisher = FakePublisher(fill_title=[LoginRequiredError("scan")])
+    with pytest.raises(LoginRequiredError):
+        publisher.run_steps(article)
+    assert names(publisher).count("fill_title") == 1
+
+
+def test_step_failed_falls_back_to_manual_on_last_attempt():
+    publisher = FakePublisher()
+    publisher.step = "fill_title"
+    publisher.step_attempts = {"fill_title": 1}
+    with pytest.raises(StepFailed):
+        publisher.step_failed("not filled", manual=True)
+    publisher.step_attempts = {"fill_title": policy_for("demo", "fill_title").attempts}
+    # 最后一次尝试：交给调用方的手动兜底
+    publisher.step_failed("not filled", manual=True)
+    with pytest.raises(StepFailed):
+        publisher.step_failed("not filled")
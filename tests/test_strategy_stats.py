@@ -0,0 +1,67 @@
+"""备选策略排序：上次成功的优先、连续失败降级、旧记录衰减"""
+
+import pytest
+
+from utils.strategy_stats import DEMOTE_AFTER_FAILURES, MAX_HISTORY, StrategyStats
+
+NAMES = ["selector", "label", "placeholder"]
+
+
+@pytest.fixture
+def stats(tmp_path):
+    return StrategyStats(str(tmp_path / "strategy_stats.json"))
+
+
+def test_no_records_keep_original_order(stats):
+    assert stats.order("toutiao", "fill_title", NAMES) == NAMES
+
+
+def test_winner_goes_first(stats):
+    stats.record("toutiao", "fill_title", "selector", False, 5.0)
+    stats.record("toutiao", "fill_title", "placeholder", True, 0.5)
+    assert stats.order("toutiao", "fill_title", NAMES)[0] == "placeholder"
+    # 按 平台/步骤 分开记录
+    assert stats.order("toutiao", "fill_content", NAMES) == NAMES
+    assert stats.order("wechat", "fill_title", NAMES) == NAMES
+
+
+def test_latest_success_replaces_winner(stats):
+    stats.record("wechat", "cover", "selector", True, 1.0)
+    stats.record("wechat", "cover", "label", True, 2.0)
+    assert stats.order("wechat", "cover", NAMES)[0] == "label"
+
+
+def test_failing_winner_is_demoted(stats):
+    stats.record("wechat", "cover", "selector", True, 1.0)
+    for _ in range(DEMOTE_AFTER_FAILURES - 1):
+        stats.record("wechat", "cover", "selector", False, 5.0)
+    assert stats.order("wechat", "cover", NAMES)[0] == "selector"
+
+    stats.record("wechat", "cover", "selector", False, 5.0)
+    assert stats.snapshot()["wechat/cover"]["winner"] is None
+    # 连续失败的排到没有记录的策略后面
+    assert stats.order("wechat", "cover", NAMES) == ["label", "placeholder", "selector"]
+
+
+def test_rate_then_speed_among_non_winners(stats):
+    stats.record("xiaohongshu", "upload", "label", True, 3.0)
+    stats.record("xiaohongshu", "upload", "placeholder", True, 1.0)
+    stats.record("xiaohongshu", "upload", "selector", True, 2.0)
+    # selector 是 winner；label 和 placeholder 成功率相同，快的在前
+    assert stats.order("xiaohongshu", "upload", NAMES) == ["selector", "placeholder", "label"]
+
+
+def test_old_records_decay(stats):
+    for _ in range(MAX_HISTORY):
+        stats.record("toutiao", "publish", "selector", True, 1.0)
+    stats.record("toutiao", "publish", "selector", True, 1.0)
+    s = stats.snapshot()["toutiao/publish"]["strategies"]["selector"]
+    assert s["ok"] == MAX_HISTORY // 2 + 1
+    assert s["seconds"] == pytest.approx(s["ok"] * 1.0)
+
+
+def test_records_persist(tmp_path, stats):
+    stats.record("toutiao", "fill_title", "label", True, 1.0)
+    reloaded = StrategyStats(stats.path)
+    assert reloaded.order("toutiao", "fill_title", NAMES)[0] == "label"
+    assert reloaded.snapshot() == stats.snapshot()
@@ -0,0 +1,52 @@
+"""
+账号级互斥
+同一个账号同一时间只能有一个发布在跑：两个浏览器同时操作同一个后台会互相顶掉登录、草稿串号。
+不同账号之间互不影响，可以同时发布，吞吐随账号数增加。
+发布一个平台账号前按 (平台, 账号) 占用，结束后释放；所有任务共用模块级的 account_locks。
+"""
+
+import threading
+
+from utils.auth_manager import target_label
+
+
+class AccountLocks:
+    """{(平台, 账号): 占用者}，占用者一般是任务 ID，只用于展示"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._busy = {}
+
+    def try_acquire(self, key, owner=None):
+        """账号空闲时占用并返回 True，否则立即返回 False"""
+        with self._cond:
+            if key in self._busy:
+                return False
+            self._busy[key] = owner
+            return True
+
+    def acquire(self, key, owner=None, timeout=None):
+        """等到账号空闲后占用，超时返回 False"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: key not in self._busy, timeout):
+                return False
+            self._busy[key] = owner
+            return True
+
+    def release(self, key):
+        with self._cond:
+            self._busy.pop(key, None)
+            self._cond.notify_all()
+
+    def wait(self, timeout):
+        """等到有账号被释放（或超时）"""
+        with self._cond:
+            self._cond.wait(timeout)
+
+    def busy(self):
+        """正在发布的账号 {显示名: 占用者}"""
+        with self._cond:
+            return {target_label(*key): owner for key, owner in self._busy.items()}
+
+
+account_locks = AccountLocks()
@@ -0,0 +1,111 @@
+"""
+文章模型
+一篇文章只存标题、正文、图片三样原始数据，各平台需要的版本（限长的标题和正文、摘要、段落 HTML）
+第一次用到时才计算并缓存。大批草稿常驻内存时，每篇只占几个槽位。
+"""
+
+import hashlib
+
+from utils.text_insert import text_to_html
+
+# 各平台的长度限制：title / content 为最大字数，content_keep 为超长时保留的字数，summary 为摘要字数
+PLATFORM_LIMITS = {
+    "wechat": {"summary": 100},
+    "toutiao": {},
+    "xiaohongshu": {"title": 20, "content": 1000, "content_keep": 950},
+}
+
+# 正文被截断时追加的提示
+TRUNCATED_SUFFIX = "\n\n...(内容已截断)"
+
+
+class Rendition:
+    """文章在某个平台上的版本"""
+
+    __slots__ = ("platform", "title", "content", "summary", "truncated", "_html")
+
+    def __init__(self, article, platform):
+        limits = PLATFORM_LIMITS.get(platform, {})
+        self.platform = platform
+
+        title = article.title
+        if limits.get("title") and len(title) > limits["title"]:
+            title = title[:limits["title"]]
+        self.title = title
+
+        content = article.content
+        self.truncated = bool(limits.get("content")) and len(content) > limits["content"]
+        if self.truncated:
+            content = content[:limits.get("content_keep", limits["content"])] + TRUNCATED_SUFFIX
+        self.content = content
+
+        # 摘要只保留纯文本，去掉换行
+        summary = article.content[:limits.get("summary", 100)]
+        self.summary = summary.replace("\n", " ").replace("\r", "")
+        self._html = None
+
+    @property
+    def html(self):
+        """正文的段落 HTML"""
+        if self._html is None:
+            self._html = text_to_html(self.content)
+        return self._html
+
+
+class Article:
+    """
+    一篇待发布的文章
+    title / content / images 是原始数据；rendition(platform) 返回该平台的版本，首次调用时计算
+    """
+
+    __slots__ = ("title", "content", "images", "_hash", "_renditions")
+
+    def __init__(self, title, content, images=()):
+        self.title = title or ""
+        self.content = content or ""
+        self.images = tuple(path for path in images if path)
+        self._hash = None
+        self._renditions = None
+
+    @classmethod
+    def coerce(cls, value):
+        """Article 原样返回，字典 {'title', 'content', 'images'} 转成 Article"""
+        if isinstance(value, cls):
+            return value
+        return cls(value.get("title", ""), value.get("content", ""), value.get("images") or ())
+
+    def to_dict(self):
+        return {"title": self.title, "content": self.content, "images": list(self.images)}
+
+    @property
+    def content_hash(self):
+        """标题、正文、图片路径的哈希，用于判断是否是同一篇文章"""
+        if self._hash is None:
+            digest = hashlib.sha1()
+            for part in (self.title, self.content, *self.images):
+                digest.update(part.encode("utf-8"))
+                digest.update(b"\0")
+            self._hash = digest.hexdigest()
+        return self._hash
+
+    def rendition(self, platform):
+        if self._renditions is None:
+            self._renditions = {}
+        rendition = self._renditions.get(platform)
+        if rendition is None:
+            rendition = self._renditions[platform] = Rendition(self, platform)
+        return rendition
+
+    @property
+    def cover(self):
+        """第一张图片，没有图片时为 None"""
+        return self.images[0] if self.images else None
+
+    def __eq__(self, other):
+        return isinstance(other, Article) and self.content_hash == other.content_hash
+
+    def __hash__(self):
+        return hash(self.content_hash)
+
+    def __repr__(self):
+        return f"Article({self.title[:20]!r}, {len(self.content)} chars, {len(self.images)} images)"
@@ -0,0 +1,92 @@
+"""
+调试截图与任务产物
+发布过程中的截图先以 JPEG（仅可视区域）存在内存环形缓冲区里，
+只有失败或显式要求时才写到按任务划分的目录 artifacts/<job_id>/<platform>/，
+旧的任务目录按数量和时间定期清理。
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+
+ARTIFACTS_DIR = os.environ.get("ARTIFACTS_DIR", "artifacts")
+
+# 截图模式：off 不截图；ring 截图只放内存，失败时落盘；all 每次都落盘
+CAPTURE_MODE = os.environ.get("CAPTURE_MODE", "ring")
+# 每个发布过程最多保留的截图数
+RING_SIZE = 12
+JPEG_QUALITY = 40
+
+# 清理策略：最多保留多少个任务目录、保留多少天
+MAX_JOB_DIRS = 100
+MAX_AGE_DAYS = 7
+# 两次清理之间至少间隔（秒）
+GC_INTERVAL = 600
+
+_gc_lock = threading.Lock()
+_last_gc = 0.0
+
+
+def new_job_id():
+    """生成按时间排序的任务 ID"""
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+def job_dir(job_id, *parts):
+    return os.path.join(ARTIFACTS_DIR, job_id, *parts)
+
+
+class FrameBuffer:
+    """内存中的截图环形缓冲区，满了自动丢弃最早的"""
+
+    def __init__(self, maxlen=RING_SIZE):
+        self.frames = deque(maxlen=maxlen)
+        self.seq = 0
+        self.encode_seconds = 0.0
+
+    def add(self, label, data, elapsed):
+        self.seq += 1
+        self.frames.append((self.seq, label, time.time(), data))
+        self.encode_seconds += elapsed
+
+    def flush(self, directory):
+        """把缓冲区的截图写到目录，返回写入的文件列表"""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for seq, label, _, data in self.frames:
+            path = os.path.join(directory, f"{seq:02d}_{label}.jpg")
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+        self.frames.clear()
+        return paths
+
+
+def cleanup_artifacts(base_dir=ARTIFACTS_DIR, max_jobs=MAX_JOB_DIRS, max_age_days=MAX_AGE_DAYS, force=False):
+    """删除过旧或超出数量的任务目录，返回删除的目录数"""
+    global _last_gc
+    with _gc_lock:
+        if not force and time.time() - _last_gc < GC_INTERVAL:
+            return 0
+        _last_gc = time.time()
+
+    if not os.path.isdir(base_dir):
+        return 0
+
+    entries = []
+    for name in os.listdir(base_dir):
+        path = os.path.join(base_dir, name)
+        if os.path.isdir(path):
+            entries.append((os.path.getmtime(path), path))
+    entries.sort(reverse=True)
+
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for index, (mtime, path) in enumerate(entries):
+        if index >= max_jobs or mtime < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
@@ -1,26 +1,153 @@
 import os
+import re
 import json
+import time
 from playwright.sync_api import BrowserContext
 
+# 各平台表示登录态的关键 cookie（有任意一个就认为有登录态）
+SESSION_COOKIES = {
+    "wechat": ["slave_sid", "data_ticket"],
+    "toutiao": ["sessionid", "sessionid_ss", "sid_tt"],
+    "xiaohongshu": ["galaxy_creator_session_id", "access-token-creator.xiaohongshu.com", "web_session"],
+}
+
+# 离过期不到这么久（秒）就算"即将过期"
+EXPIRING_WITHIN = 24 * 3600
+
+# 会话状态
+SESSION_MISSING = "missing"    # 没有保存的登录状态
+SESSION_EXPIRED = "expired"    # 关键 cookie 不存在或已过期
+SESSION_EXPIRING = "expiring"  # 仍然有效，但很快过期
+SESSION_VALID = "valid"
+SESSION_UNKNOWN = "unknown"    # 只有会话 cookie（没有过期时间），离线无法判断
+
+# 离线判断为可用的状态
+USABLE_SESSIONS = (SESSION_VALID, SESSION_EXPIRING)
+
+# 账号名直接用作文件名：字母、数字、中文和 _ - . @，不能以 . 开头
+ACCOUNT_NAME = re.compile(r"^[\w@-][\w.@-]{0,63}$")
+
+
+def target_label(platform_name, account=None):
+    """平台账号的显示名，默认账号（None）只显示平台名"""
+    return f"{platform_name}:{account}" if account else platform_name
+
+
+def parse_target(label):
+    """target_label 的逆操作，返回 (平台, 账号)"""
+    platform_name, _, account = label.partition(":")
+    return platform_name, account or None
+
+
 class AuthManager:
+    """
+    按 (平台, 账号) 保存登录状态
+    默认账号（account=None）存在 auth_states/<platform>.json，与只支持单账号时的位置相同；
+    其他账号存在 auth_states/<platform>/<account>.json
+    """
+
     def __init__(self, base_path="auth_states"):
         self.base_path = base_path
         if not os.path.exists(base_path):
             os.makedirs(base_path)
+        # {path: (mtime, state)}，避免重复解析同一个文件
+        self._parsed = {}
+
+    def get_state_path(self, platform_name, account=None):
+        if not account:
+            return os.path.join(self.base_path, f"{platform_name}.json")
+        if not ACCOUNT_NAME.match(account):
+            raise ValueError(f"无效的账号名: {account!r}")
+        return os.path.join(self.base_path, platform_name, f"{account}.json")
+
+    def list_accounts(self, platform_name):
+        """该平台保存过登录状态的账号，默认账号为 None 排在最前"""
+        accounts = []
+        if os.path.exists(self.get_state_path(platform_name)):
+            accounts.append(None)
+        directory = os.path.join(self.base_path, platform_name)
+        if os.path.isdir(directory):
+            accounts.extend(sorted(
+                name[:-len(".json")] for name in os.listdir(directory)
+                if name.endswith(".json") and ACCOUNT_NAME.match(name[:-len(".json")])
+            ))
+        return accounts
 
-    def get_state_path(self, platform_name):
-        return os.path.join(self.base_path, f"{platform_name}.json")
+    def save_state(self, context: BrowserContext, platform_name, account=None):
+        """Save storage state (cookies, local storage) to file, skip if cookies are unchanged."""
+        path = self.get_state_path(platform_name, account)
+        state = context.storage_state()
 
-    def save_state(self, context: BrowserContext, platform_name):
-        """Save storage state (cookies, local storage) to file."""
-        path = self.get_state_path(platform_name)
-        context.storage_state(path=path)
+        previous = self._read_state(path)
+        if previous is not None and _cookie_key(previous) == _cookie_key(state):
+            print(f"[{platform_name}] Session unchanged, not rewriting {path}")
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
         print(f"[{platform_name}] Session saved to {path}")
 
-    def load_state(self, platform_name):
+    def load_state(self, platform_name, account=None):
         """Return path to storage state if it exists, else None."""
-        path = self.get_state_path(platform_name)
+        path = self.get_state_path(platform_name, account)
         if os.path.exists(path):
             return path
         return None
 
+    def check_state(self, platform_name, account=None):
+        """
+        不打开浏览器，根据保存的 cookie 过期时间判断登录状态
+        返回 {"status": ..., "expires_at": 时间戳或 None, "cookie": 关键 cookie 名}
+        """
+        path = self.get_state_path(platform_name, account)
+        state = self._read_state(path)
+        if state is None:
+            return {"status": SESSION_MISSING, "expires_at": None, "cookie": None}
+
+        names = SESSION_COOKIES.get(platform_name, [])
+        cookies = [c for c in state.get("cookies", []) if c.get("name") in names]
+        if not cookies:
+            return {"status": SESSION_EXPIRED, "expires_at": None, "cookie": None}
+
+        # expires 为 -1 表示会话 cookie，没有过期时间
+        dated = [c for c in cookies if c.get("expires", -1) > 0]
+        if not dated:
+            return {"status": SESSION_UNKNOWN, "expires_at": None, "cookie": cookies[0]["name"]}
+
+        best = max(dated, key=lambda c: c["expires"])
+        now = time.time()
+        if best["expires"] <= now:
+            status = SESSION_EXPIRED
+        elif best["expires"] - now < EXPIRING_WITHIN:
+            status = SESSION_EXPIRING
+        else:
+            status = SESSION_VALID
+        return {"status": status, "expires_at": best["expires"], "cookie": best["name"]}
+
+    def _read_state(self, path):
+        """读取并缓存 storage state，文件不存在或损坏返回 None"""
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._parsed.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._parsed[path] = (mtime, state)
+        return state
+
+
+def _cookie_key(state):
+    """用于比较两份 storage state 的 cookie 是否相同"""
+    return sorted(
+        (c.get("domain", ""), c.get("path", ""), c.get("name", ""), c.get("value", ""), c.get("expires", -1))
+        for c in state.get("cookies", [])
+    )
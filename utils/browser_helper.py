@@ -134,7 +134,7 @@ def ensure_browser():
 
 
 def launch_browser(playwright, headless=False):
-    """启动浏览器（智能选择）"""
+    """启动浏览器（智能选择），发布时的无头策略见 utils.publish_runner.resolve_headless"""
     browser_config = ensure_browser()
     
     launch_options = {
@@ -0,0 +1,221 @@
+"""
+常驻浏览器池
+浏览器在进程内只启动一次并保持可用，每个任务借出一个全新的 BrowserContext。
+
+Playwright 同步 API 的对象只能在创建它的线程里使用，所以池由若干常驻线程（slot）组成：
+每个 slot 持有自己的 Playwright 实例和浏览器，从共享队列里取任务执行。
+浏览器启动失败不影响 slot（任务到来时再启动，失败的任务得到异常）；
+Playwright 本身起不来时 slot 退出，所有 slot 都退出后池不可用，排队的和新提交的任务立即失败。
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from playwright.sync_api import sync_playwright
+
+# 浏览器空闲多久后关闭（秒）
+MAX_IDLE_SECONDS = 300
+# 每个浏览器最多服务多少个任务后重启，避免内存泄漏越积越多
+MAX_JOBS_PER_BROWSER = 20
+# 空闲检查间隔（秒）
+IDLE_CHECK_INTERVAL = 5
+
+
+class _BrowserSlot:
+    """池中的一个常驻线程，按无头/可见各持有最多一个浏览器"""
+
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+        # {headless: browser}
+        self.browsers = {}
+        self.jobs_served = 0
+        self.last_used = time.time()
+        # warm() 请求提前启动的浏览器（headless），空闲检查时处理
+        self.warm_request = None
+        self.thread = threading.Thread(
+            target=self._run, name=f"browser-slot-{index}", daemon=True
+        )
+
+    def _run(self):
+        try:
+            playwright = sync_playwright().start()
+        except Exception as e:
+            print(f"[browser-pool] slot {self.index} Playwright 启动失败: {e}")
+            self.pool._slot_exited(e)
+            return
+        try:
+            self._serve(playwright)
+        finally:
+            self._close_browsers()
+            try:
+                playwright.stop()
+            except Exception:
+                pass
+
+    def _serve(self, p):
+        if self.pool.prewarm:
+            self.warm_request = self.pool.launch_options.get("headless", False)
+            self._warm_if_requested(p)
+
+        while True:
+            try:
+                task = self.pool._tasks.get(timeout=IDLE_CHECK_INTERVAL)
+            except queue.Empty:
+                self._warm_if_requested(p)
+                self._evict_if_idle()
+                continue
+
+            if task is None:  # 关闭信号
+                break
+
+            fn, headless, context_options, future = task
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                browser = self._ensure_browser(p, headless)
+                context = browser.new_context(**context_options)
+                try:
+                    future.set_result(fn(context))
+                finally:
+                    context.close()
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self.jobs_served += 1
+                self.last_used = time.time()
+                if self.jobs_served >= self.pool.max_jobs_per_browser:
+                    print(f"[browser-pool] slot {self.index} 已服务 {self.jobs_served} 个任务，重启浏览器")
+                    self._close_browsers()
+
+    def _ensure_browser(self, p, headless):
+        """返回健康的浏览器，断开或未启动时重新启动"""
+        browser = self.browsers.get(headless)
+        if browser is not None and not browser.is_connected():
+            print(f"[browser-pool] slot {self.index} 浏览器已断开，重新启动")
+            browser = None
+        if browser is None:
+            launch_options = dict(self.pool.launch_options, headless=headless)
+            browser = self.browsers[headless] = p.chromium.launch(**launch_options)
+            if len(self.browsers) == 1:
+                self.jobs_served = 0
+        return browser
+
+    def _warm_if_requested(self, p):
+        headless, self.warm_request = self.warm_request, None
+        if headless is None:
+            return
+        try:
+            self._ensure_browser(p, headless)
+            self.last_used = time.time()
+        except Exception as e:
+            # 预热失败不影响 slot，真正的任务到来时再启动
+            print(f"[browser-pool] slot {self.index} 预热浏览器失败: {e}")
+
+    def _evict_if_idle(self):
+        if self.browsers and time.time() - self.last_used > self.pool.max_idle_seconds:
+            print(f"[browser-pool] slot {self.index} 空闲超时，关闭浏览器")
+            self._close_browsers()
+
+    def _close_browsers(self):
+        for browser in self.browsers.values():
+            try:
+                browser.close()
+            except Exception:
+                pass
+        self.browsers = {}
+
+
+class BrowserPool:
+    """进程级浏览器池，size 决定同时运行的任务数"""
+
+    def __init__(self, size, launch_options=None, max_idle_seconds=MAX_IDLE_SECONDS,
+                 max_jobs_per_browser=MAX_JOBS_PER_BROWSER, prewarm=True):
+        self.size = max(1, size)
+        self.launch_options = launch_options or {"headless": False}
+        self.max_idle_seconds = max_idle_seconds
+        self.max_jobs_per_browser = max_jobs_per_browser
+        self.prewarm = prewarm
+        self._tasks = queue.Queue()
+        self._closed = False
+        # 所有 slot 都因 Playwright 起不来而退出时记录原因，之后 submit 直接失败
+        self.error = None
+        self._lock = threading.Lock()
+        self._exited = 0
+        self._slots = [_BrowserSlot(self, i) for i in range(self.size)]
+        for slot in self._slots:
+            slot.thread.start()
+
+    def submit(self, fn, headless=None, **context_options):
+        """
+        提交任务，返回 Future
+        fn(context) 在某个 slot 线程中执行，context 为新建的 BrowserContext，结束后自动关闭
+        headless 为 None 时使用池默认的启动参数
+        context_options 透传给 browser.new_context（例如 storage_state）
+        """
+        if self._closed:
+            raise RuntimeError("BrowserPool 已关闭")
+        if headless is None:
+            headless = self.launch_options.get("headless", False)
+        future = Future()
+        # 与 _slot_exited 互斥：池不可用之后不会再有任务进队列
+        with self._lock:
+            if self.error is not None:
+                raise RuntimeError(f"浏览器池不可用: {self.error}")
+            self._tasks.put((fn, bool(headless), context_options, future))
+        return future
+
+    def _slot_exited(self, error):
+        """slot 因 Playwright 起不来而退出；全部退出时池不可用，队列里的任务立即失败"""
+        with self._lock:
+            self._exited += 1
+            if self._exited < self.size:
+                return
+            self.error = error
+            pending = []
+            while True:
+                try:
+                    pending.append(self._tasks.get_nowait())
+                except queue.Empty:
+                    break
+        print(f"[browser-pool] 所有 slot 都无法启动 Playwright，浏览器池不可用: {error}")
+        for task in pending:
+            if task is not None:
+                future = task[3]
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(RuntimeError(f"浏览器池不可用: {error}"))
+
+    def warm(self, headless=None):
+        """
+        让空闲的 slot 提前启动好浏览器（例如定时发布前，浏览器可能已因空闲被关闭）
+        不经过任务队列：slot 在下一次空闲检查（IDLE_CHECK_INTERVAL 内）时启动，
+        正在执行任务或队列里还有任务的 slot 先处理任务，真正的发布不会排在预热后面
+        """
+        if headless is None:
+            headless = self.launch_options.get("headless", False)
+        for slot in self._slots:
+            slot.warm_request = bool(headless)
+
+    def stats(self):
+        """各 slot 的状态"""
+        return [
+            {
+                "slot": slot.index,
+                "browsers": sorted("headless" if h else "headful" for h in list(slot.browsers)),
+                "jobs_served": slot.jobs_served,
+                "idle_seconds": round(time.time() - slot.last_used, 1),
+            }
+            for slot in self._slots
+        ]
+
+    def shutdown(self, wait=True):
+        """关闭所有浏览器"""
+        self._closed = True
+        for _ in self._slots:
+            self._tasks.put(None)
+        if wait:
+            for slot in self._slots:
+                slot.thread.join()
@@ -1,27 +1,34 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import httpx
 import openai
-from typing import Tuple
+from typing import Iterator, List, Optional, Tuple
 
 # 通义千问配置
 API_KEY = "sk-eff2128169cc440db8a76dc084bcc8ab"
 BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
 MODEL = "qwen3-max"
+TEMPERATURE = 0.7
+MAX_TOKENS = 2000
 
+# HTTP 客户端配置：所有请求共用一个连接池
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 120
+MAX_RETRIES = 2
+MAX_CONNECTIONS = 20
 
-class ContentGenerator:
-    """使用通义千问生成文章"""
-    
-    def __init__(self):
-        self.client = openai.OpenAI(
-            api_key=API_KEY,
-            base_url=BASE_URL
-        )
-        
-    def generate(self, topic: str) -> Tuple[str, str]:
-        """根据主题生成文章标题和正文"""
-        print(f"[AI] 正在调用通义千问生成文章...")
-        print(f"[AI] 主题: {topic}")
-        
-        prompt = f"""请根据以下主题，生成一篇适合发布在微信公众号和头条的文章。先收集网上其他人的看法，再结合其他人的看法和观点，总结发表自己的看法，一定要有自己的观点。
+# 批量生成默认并发数
+BATCH_CONCURRENCY = 4
+
+SYSTEM_PROMPT = "你是一个专业的自媒体内容创作者，擅长撰写吸引人的文章。"
+
+PROMPT_TEMPLATE = """请根据以下主题，生成一篇适合发布在微信公众号和头条的文章。先收集网上其他人的看法，再结合其他人的看法和观点，总结发表自己的看法，一定要有自己的观点。
 
 主题：{topic}
 
@@ -38,53 +45,385 @@ class ContentGenerator:
 【正文】
 （这里写正文）
 """
+
+# 生成结果缓存配置
+CACHE_MAX_ENTRIES = 256
+CACHE_TTL_SECONDS = 24 * 3600
+# 设置后缓存同时写入磁盘，重启后仍然有效
+CACHE_DIR = os.environ.get("GENERATION_CACHE_DIR") or None
+
+
+class GenerationCache:
+    """
+    生成结果缓存
+    以（规范化主题、提示词模板、模型、温度）为键；内存 LRU + TTL，可选磁盘存储
+    """
+    
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, cache_dir=CACHE_DIR):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def normalize_topic(topic: str) -> str:
+        """去掉首尾空白、合并连续空白、统一大小写"""
+        return " ".join(topic.split()).casefold()
+    
+    def make_key(self, topic: str, template: str, model: str, temperature: float) -> str:
+        raw = json.dumps(
+            [self.normalize_topic(topic), template, model, temperature],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+    
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """命中返回 (标题, 正文)，未命中或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1], entry[2]
+                del self._entries[key]
+        
+        if self.cache_dir:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data["expires_at"] > now:
+                    self._remember(key, data["expires_at"], data["title"], data["content"])
+                    with self._lock:
+                        self.hits += 1
+                    return data["title"], data["content"]
+                os.remove(self._path(key))
+            except (OSError, ValueError, KeyError):
+                pass
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, key: str, title: str, content: str):
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, title, content)
+        if self.cache_dir:
+            # 先写临时文件再替换，避免并发读到半个文件
+            tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"expires_at": expires_at, "title": title, "content": content},
+                              f, ensure_ascii=False)
+                os.replace(tmp_path, self._path(key))
+            except OSError as e:
+                print(f"[AI] 缓存写入失败: {e}")
+    
+    def _remember(self, key, expires_at, title, content):
+        with self._lock:
+            self._entries[key] = (expires_at, title, content)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class ContentGenerator:
+    """使用通义千问生成文章"""
+    
+    def __init__(self, cache: Optional[GenerationCache] = None):
+        # OpenAI 客户端线程安全，批量生成时多个线程共用同一个连接池
+        self.client = openai.OpenAI(
+            api_key=API_KEY,
+            base_url=BASE_URL,
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            max_retries=MAX_RETRIES,
+            http_client=httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_CONNECTIONS
+                )
+            )
+        )
+        self.cache = cache if cache is not None else GenerationCache()
+        
+    def _build_messages(self, topic: str) -> List[dict]:
+        """构造对话消息"""
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": PROMPT_TEMPLATE.format(topic=topic)}
+        ]
+    
+    def _cache_key(self, topic: str) -> str:
+        return self.cache.make_key(topic, SYSTEM_PROMPT + PROMPT_TEMPLATE, MODEL, TEMPERATURE)
+        
+    def generate(self, topic: str, use_cache: bool = True) -> Tuple[str, str]:
+        """根据主题生成文章标题和正文，use_cache=False 时跳过缓存重新生成"""
+        key = self._cache_key(topic)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached:
+                print(f"[AI] 命中缓存: {topic}")
+                return cached
+        
+        print(f"[AI] 正在调用通义千问生成文章...")
+        print(f"[AI] 主题: {topic}")
         
         response = self.client.chat.completions.create(
             model=MODEL,
-            messages=[
-                {"role": "system", "content": "你是一个专业的自媒体内容创作者，擅长撰写吸引人的文章。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
+            messages=self._build_messages(topic),
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS
         )
         
         result = response.choices[0].message.content
         print(f"[AI] 生成完成!")
         
-        return self._parse_result(result)
+        title, content = self._parse_result(result)
+        self.cache.put(key, title, content)
+        return title, content
     
-    def _parse_result(self, result: str) -> Tuple[str, str]:
-        """解析返回结果"""
-        title = ""
-        content = ""
+    def generate_stream(self, topic: str, use_cache: bool = True) -> Iterator[dict]:
+        """
+        流式生成，边生成边产出事件：
+        - {"type": "title", "title": ...}   【标题】段落完整后立即产出一次
+        - {"type": "delta", "text": ...}    正文的增量文本
+        - {"type": "done", "title": ..., "content": ...}  最终结果，与 generate() 一致
+        """
+        key = self._cache_key(topic)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached:
+                print(f"[AI] 命中缓存: {topic}")
+                title, content = cached
+                yield {"type": "title", "title": title}
+                yield {"type": "delta", "text": content}
+                yield {"type": "done", "title": title, "content": content}
+                return
+        
+        print(f"[AI] 正在调用通义千问流式生成文章...")
+        print(f"[AI] 主题: {topic}")
         
-        if "【标题】" in result:
-            parts = result.split("【标题】")
-            if len(parts) > 1:
-                title_part = parts[1].split("【正文】")[0] if "【正文】" in parts[1] else parts[1]
-                title = title_part.strip().strip("：:").strip()
+        stream = self.client.chat.completions.create(
+            model=MODEL,
+            messages=self._build_messages(topic),
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            stream=True
+        )
         
-        if "【正文】" in result:
-            parts = result.split("【正文】")
-            if len(parts) > 1:
-                content = parts[1].strip()
+        parser = _IncrementalParser()
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                yield from parser.feed(text)
         
-        if not title:
-            lines = result.strip().split("\n")
-            title = lines[0].strip()[:30]
+        title, content = parser.result()
+        print(f"[AI] 生成完成!")
+        self.cache.put(key, title, content)
+        yield {"type": "done", "title": title, "content": content}
+    
+    def generate_many(self, topics: List[str], concurrency: int = BATCH_CONCURRENCY,
+                      use_cache: bool = True) -> Iterator[dict]:
+        """
+        批量生成，最多 concurrency 个请求同时进行，每完成一个就产出一个结果：
+        {"index", "topic", "success", "title", "content", "error", "elapsed"}
+        单个主题失败不影响其他主题；同一批里重复的主题（规范化后相同）只生成一次，每个位置各产出一个结果
+        """
+        # 先按缓存键去重，再查缓存、调用模型
+        groups = OrderedDict()
+        for index, topic in enumerate(topics):
+            groups.setdefault(self._cache_key(topic), []).append(index)
         
-        if not content:
-            lines = result.strip().split("\n")
-            content = "\n".join(lines[1:]).strip()
+        def run(indexes):
+            start = time.time()
+            item = {"success": False, "title": "", "content": "", "error": ""}
+            try:
+                item["title"], item["content"] = self.generate(topics[indexes[0]], use_cache=use_cache)
+                item["success"] = True
+            except Exception as e:
+                item["error"] = str(e)
+            item["elapsed"] = round(time.time() - start, 2)
+            return [dict(item, index=i, topic=topics[i]) for i in indexes]
         
-        return title, content
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="generate")
+        try:
+            futures = [executor.submit(run, indexes) for indexes in groups.values()]
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            # 调用方中途停止（例如客户端断开）时取消还没开始的请求
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _parse_result(self, result: str) -> Tuple[str, str]:
+        """解析返回结果"""
+        return _parse_output(result)
+
+
+def _parse_output(result: str) -> Tuple[str, str]:
+    """解析模型的完整输出：【标题】/【正文】标记可以出现在任何位置，没有标记时第一行是标题、其余是正文"""
+    title = ""
+    content = ""
+    
+    if "【标题】" in result:
+        parts = result.split("【标题】")
+        if len(parts) > 1:
+            title_part = parts[1].split("【正文】")[0] if "【正文】" in parts[1] else parts[1]
+            title = title_part.strip().strip("：:").strip()
+    
+    if "【正文】" in result:
+        parts = result.split("【正文】")
+        if len(parts) > 1:
+            content = parts[1].strip()
+    
+    if not title:
+        lines = result.strip().split("\n")
+        title = lines[0].strip()[:30]
+    
+    if not content:
+        lines = result.strip().split("\n")
+        content = "\n".join(lines[1:]).strip()
+    
+    return title, content
+
+
+class _IncrementalParser:
+    """
+    增量解析模型输出：标题完整时立即给出，正文边到边给出
+    最终结果 result() 总是按完整输出解析（_parse_output），与非流式一致；开头 MARKER_WINDOW 字只用来决定边生成边输出什么：
+    - 开头有【标题】/【正文】标记：按标记输出标题和正文
+    - 开头没有标记：按原文输出，第一行是标题，其余是正文
+    无论怎样分片喂入，title 事件都等于 result() 的标题，拼起来的 delta 都等于 result() 的正文；
+    只有按原文输出后又出现了标记时例外：此时停止输出（diverged 为 True），最终结果以 done 事件为准
+    """
+    
+    TITLE_MARK = "【标题】"
+    CONTENT_MARK = "【正文】"
+    # 在开头多少字内找格式标记，超过仍没有就按原文流式输出
+    MARKER_WINDOW = 200
+    
+    def __init__(self):
+        self.buffer = ""
+        # None 还不确定；False 按标记解析；True 按原文
+        self.raw = None
+        # 按原文输出后又出现了标记，已经输出的内容可能与最终结果不同
+        self.diverged = False
+        self.title_emitted = False
+        # 正文起始位置，以及已经产出到的位置
+        self.content_start = None
+        self.content_emitted = None
+        # 标记已经找过的位置
+        self._scanned = 0
+    
+    def _detect(self, final=False):
+        """判断是否按标记解析，只看开头 MARKER_WINDOW 字，与分片方式无关"""
+        head = self.buffer[:self.MARKER_WINDOW + len(self.CONTENT_MARK)]
+        if self.TITLE_MARK in head or self.CONTENT_MARK in head:
+            self.raw = False
+        elif final or len(self.buffer) >= self.MARKER_WINDOW + len(self.CONTENT_MARK):
+            self.raw = True
+    
+    def _find(self, marks):
+        """从上次找过的位置往后找标记（标记可能被切在两个分片之间），返回最早的位置，没有返回 -1"""
+        found = [i for i in (self.buffer.find(mark, self._scanned) for mark in marks) if i >= 0]
+        if found:
+            return min(found)
+        self._scanned = max(0, len(self.buffer) - max(len(mark) for mark in marks) + 1)
+        return -1
+    
+    def _locate(self):
+        """找正文起点，返回 (标题, 正文起点)，还不能确定时起点为 None"""
+        if self.raw:
+            # 第一行（去掉开头空白后）是标题
+            first = len(self.buffer) - len(self.buffer.lstrip())
+            newline = self.buffer.find("\n", first)
+            if newline < 0:
+                return "", None
+            return self.buffer[first:newline].strip()[:30], newline + 1
+        
+        idx = self._find((self.CONTENT_MARK,))
+        if idx < 0:
+            return "", None
+        title = ""
+        title_idx = self.buffer.find(self.TITLE_MARK)
+        if 0 <= title_idx < idx:
+            title = self.buffer[title_idx + len(self.TITLE_MARK):idx].split(self.TITLE_MARK)[0]
+            title = title.strip().strip("：:").strip()
+        return title, idx + len(self.CONTENT_MARK)
+    
+    def feed(self, text: str) -> Iterator[dict]:
+        """追加一段文本，产出新的 title / delta 事件"""
+        self.buffer += text
+        if self.raw is None:
+            self._detect()
+            if self.raw is None:
+                return
+        if self.diverged:
+            return
+        # 按原文输出时后面又出现了标记：最终按标记解析，不再输出
+        marks = (self.TITLE_MARK, self.CONTENT_MARK) if self.raw else (self.CONTENT_MARK,)
+        if self.raw and self._find(marks) >= 0:
+            self.diverged = True
+            return
+        
+        if self.content_start is None:
+            title, start = self._locate()
+            if start is None:
+                return
+            self.content_start = self.content_emitted = start
+            if title:
+                self.title_emitted = True
+                yield {"type": "title", "title": title}
+        
+        # 按标记解析时遇到第二个【正文】停止（与 result() 一致）
+        end = -1 if self.raw else self.buffer.find(self.CONTENT_MARK, self.content_start)
+        limit = end if end >= 0 else len(self.buffer)
+        # 末尾可能是半个标记，先留着不发
+        if end < 0:
+            for keep in range(max(len(mark) for mark in marks) - 1, 0, -1):
+                if any(mark.startswith(self.buffer[-keep:]) for mark in marks):
+                    limit -= keep
+                    break
+        # 正文首尾的空白不发（result() 会去掉），末尾的空白等后面有文字了再发
+        if self.content_emitted == self.content_start:
+            while self.content_emitted < limit and self.buffer[self.content_emitted].isspace():
+                self.content_emitted += 1
+                self.content_start += 1
+        while limit > self.content_emitted and self.buffer[limit - 1].isspace():
+            limit -= 1
+        if limit > self.content_emitted:
+            delta = self.buffer[self.content_emitted:limit]
+            self.content_emitted = limit
+            yield {"type": "delta", "text": delta}
+    
+    def result(self) -> Tuple[str, str]:
+        """根据完整输出得到最终的 (标题, 正文)"""
+        return _parse_output(self.buffer)
 
 
 # 创建全局实例
 generator = ContentGenerator()
 
 
-def generate_article(topic: str) -> Tuple[str, str]:
+def generate_article(topic: str, use_cache: bool = True) -> Tuple[str, str]:
     """生成文章的便捷函数"""
-    return generator.generate(topic)
+    return generator.generate(topic, use_cache=use_cache)
+
+
+def generate_article_stream(topic: str, use_cache: bool = True) -> Iterator[dict]:
+    """流式生成文章的便捷函数"""
+    return generator.generate_stream(topic, use_cache=use_cache)
@@ -0,0 +1,176 @@
+"""
+任务事件广播
+每个任务维护一份有序的事件日志（状态变化、日志行），监听者按事件 ID 读取，
+断线重连时通过 Last-Event-ID 从断点继续。
+
+监听者只是在共享的 Condition 上等待，不为每个监听者创建队列或额外的线程；
+但每个 SSE 连接本身仍占用一个 Web 服务线程，直到任务结束或客户端断开，
+所以同时保持的连接数限制为 MAX_SUBSCRIBERS，超过时由调用方让客户端改为轮询。
+发布任务线程中 print 的内容会被转发为该任务的 log 事件。
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+# 每个任务最多保留的事件数
+MAX_EVENTS_PER_JOB = 1000
+# 最多保留多少个任务的事件
+MAX_JOBS = 200
+# 心跳间隔（秒），防止代理断开空闲连接
+HEARTBEAT_SECONDS = 15
+# 同时保持的 SSE 连接数上限（每个连接占用一个 Web 服务线程）
+MAX_SUBSCRIBERS = int(os.environ.get("SSE_MAX_SUBSCRIBERS", "20"))
+
+
+class _JobChannel:
+    def __init__(self):
+        self.events = deque(maxlen=MAX_EVENTS_PER_JOB)
+        self.next_id = 1
+        self.closed = False
+
+
+class EventBroker:
+    """按任务划分的事件广播"""
+
+    def __init__(self, max_subscribers=MAX_SUBSCRIBERS):
+        self._channels = OrderedDict()
+        self._cond = threading.Condition()
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+
+    def _channel(self, job_id):
+        channel = self._channels.get(job_id)
+        if channel is None:
+            channel = self._channels[job_id] = _JobChannel()
+            while len(self._channels) > MAX_JOBS:
+                # 优先清掉已结束任务的事件，进行中的任务最后才清
+                oldest = next((key for key, c in self._channels.items() if c.closed), None)
+                if oldest is None:
+                    self._channels.popitem(last=False)
+                else:
+                    del self._channels[oldest]
+        return channel
+
+    def acquire(self):
+        """占用一个连接名额，已满返回 False；占用后连接结束时调用 release"""
+        with self._cond:
+            if self.subscribers >= self.max_subscribers:
+                return False
+            self.subscribers += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.subscribers = max(0, self.subscribers - 1)
+
+    def known(self, job_id):
+        """是否还保留着该任务的事件"""
+        with self._cond:
+            return job_id in self._channels
+
+    def publish(self, job_id, event_type, data):
+        """追加一个事件并唤醒所有监听者"""
+        with self._cond:
+            channel = self._channel(job_id)
+            channel.events.append((channel.next_id, event_type, data))
+            channel.next_id += 1
+            self._cond.notify_all()
+
+    def close(self, job_id):
+        """任务结束，监听者读完剩余事件后退出"""
+        with self._cond:
+            channel = self._channels.get(job_id)
+            if channel is not None:
+                channel.closed = True
+            self._cond.notify_all()
+
+    def subscribe(self, job_id, last_event_id=0, heartbeat=HEARTBEAT_SECONDS):
+        """
+        生成器，依次产出 (event_id, event_type, data)，任务结束后停止
+        长时间没有事件时产出 None 作为心跳；没有该任务的事件（未知任务或已被清掉）时直接结束
+        """
+        cursor = last_event_id
+        while True:
+            with self._cond:
+                channel = self._channels.get(job_id)
+                if channel is None:
+                    return
+                pending = [e for e in channel.events if e[0] > cursor]
+                if not pending and not channel.closed:
+                    self._cond.wait(timeout=heartbeat)
+                    pending = [e for e in channel.events if e[0] > cursor]
+                closed = channel.closed
+
+            if pending:
+                for event in pending:
+                    cursor = event[0]
+                    yield event
+            elif closed:
+                return
+            else:
+                yield None
+
+
+def format_sse(event):
+    """把事件格式化成 text/event-stream 的一条消息"""
+    if event is None:
+        return ": heartbeat\n\n"
+    event_id, event_type, data = event
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+# ========== 把发布线程中的 print 转发为 log 事件 ==========
+
+_local = threading.local()
+
+
+class _JobStdout:
+    """替换 sys.stdout：照常输出，同时把绑定了任务的线程的输出发给 broker"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        binding = getattr(_local, "binding", None)
+        if binding is not None and text.strip():
+            broker, job_id = binding
+            for line in text.splitlines():
+                if line.strip():
+                    broker.publish(job_id, "log", {"time": time.time(), "line": line})
+        return self._stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+_install_lock = threading.Lock()
+
+
+def _install_stdout():
+    with _install_lock:
+        if not isinstance(sys.stdout, _JobStdout):
+            sys.stdout = _JobStdout(sys.stdout)
+
+
+class capture_output:
+    """上下文管理器：当前线程的 print 输出作为 job_id 的 log 事件发布"""
+
+    def __init__(self, broker, job_id):
+        self.broker = broker
+        self.job_id = job_id
+        self._previous = None
+
+    def __enter__(self):
+        _install_stdout()
+        self._previous = getattr(_local, "binding", None)
+        _local.binding = (self.broker, self.job_id)
+        return self
+
+    def __exit__(self, *exc):
+        _local.binding = self._previous
+        return False
@@ -0,0 +1,87 @@
+"""
+编辑页字段解析
+一次 page.evaluate 找出标题、正文、封面、摘要、发布按钮等目标元素，
+给找到的元素打上 data-pt-field="<字段名>" 标记，之后的步骤直接用
+page.locator('[data-pt-field="title"]') 操作，不用再逐个 count() 试探。
+
+spec 格式：{字段名: [候选1, 候选2, ...]}，按顺序取第一个命中的候选。候选是字典，支持：
+- css:          CSS 选择器（默认 '*'）
+- placeholder:  placeholder / data-placeholder 包含的文字
+- text:         元素文字包含（exact=True 时为完全相等）
+- texts:        元素文字等于其中之一
+- exclude:      元素文字不能包含
+- within:       必须位于匹配该选择器的祖先元素内
+- min_height / min_width: 最小尺寸
+- max_length:   [最小, 最大]，textarea/input 的 maxlength 范围
+- pick:         first（默认）/ last / tallest / innermost
+- visible:      默认只要可见元素，False 时不检查
+"""
+
+FIELD_ATTR = "data-pt-field"
+
+RESOLVE_FIELDS_JS = """
+(spec) => {
+    const visible = el => {
+        const r = el.getBoundingClientRect();
+        if (r.width <= 0 || r.height <= 0) return false;
+        const style = window.getComputedStyle(el);
+        return style.display !== 'none' && style.visibility !== 'hidden';
+    };
+    const textOf = el => (el.textContent || '').trim();
+    const placeholderOf = el =>
+        (el.getAttribute('placeholder') || '') + ' ' + (el.getAttribute('data-placeholder') || '');
+
+    const out = {};
+    for (const [field, candidates] of Object.entries(spec)) {
+        document.querySelectorAll('[data-pt-field="' + field + '"]')
+            .forEach(el => el.removeAttribute('data-pt-field'));
+        out[field] = null;
+
+        for (let i = 0; i < candidates.length; i++) {
+            const c = candidates[i];
+            let els = Array.from(document.querySelectorAll(c.css || '*'));
+            if (c.within) els = els.filter(el => el.closest(c.within));
+            if (c.placeholder) els = els.filter(el => placeholderOf(el).includes(c.placeholder));
+            if (c.text) els = els.filter(el => c.exact ? textOf(el) === c.text : textOf(el).includes(c.text));
+            if (c.texts) els = els.filter(el => c.texts.includes(textOf(el)));
+            if (c.exclude) els = els.filter(el => !textOf(el).includes(c.exclude));
+            if (c.max_length) els = els.filter(el => {
+                const n = parseInt(el.getAttribute('maxlength') || '0');
+                return n >= c.max_length[0] && n <= c.max_length[1];
+            });
+            if (c.visible !== false) els = els.filter(visible);
+            if (c.min_height) els = els.filter(el => el.getBoundingClientRect().height >= c.min_height);
+            if (c.min_width) els = els.filter(el => el.getBoundingClientRect().width >= c.min_width);
+            if (!els.length) continue;
+
+            let el = els[0];
+            if (c.pick === 'last') {
+                el = els[els.length - 1];
+            } else if (c.pick === 'tallest') {
+                el = els.reduce((a, b) =>
+                    b.getBoundingClientRect().height > a.getBoundingClientRect().height ? b : a);
+            } else if (c.pick === 'innermost') {
+                el = els.find(e => !els.some(o => o !== e && e.contains(o))) || el;
+            }
+
+            el.setAttribute('data-pt-field', field);
+            const r = el.getBoundingClientRect();
+            out[field] = {
+                strategy: i,
+                tag: el.tagName,
+                editable: el.isContentEditable || el.tagName === 'INPUT' || el.tagName === 'TEXTAREA',
+                top: Math.round(r.top),
+                height: Math.round(r.height),
+                text: textOf(el).slice(0, 30)
+            };
+            break;
+        }
+    }
+    return out;
+}
+"""
+
+
+def field_selector(name):
+    """已解析字段的选择器"""
+    return f'[{FIELD_ATTR}="{name}"]'
@@ -0,0 +1,196 @@
+"""
+上传前的图片预处理
+手机原图动辄几 MB，上传慢，有时还会被平台拒绝。上传前按平台限制缩放、重新编码为 JPEG 并去掉 EXIF 等元数据，
+结果按 原图内容哈希 + 处理参数 缓存到磁盘，同一张图不会处理第二次。
+批量处理放到进程池里跑（打包后的可执行文件里改用线程池）。进程池总是用 spawn 启动子进程：
+主进程里已经有浏览器池、任务队列和调度线程，fork 一个多线程进程可能在子进程里死锁。
+
+依赖 Pillow；没有安装时原样使用原图。
+"""
+
+import glob
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 是可选依赖
+    Image = None
+
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", ".image_cache")
+# 预处理进程数
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# 会上传图片的平台的限制：最长边（像素）、JPEG 质量、单张最大字节数
+PLATFORM_IMAGE_LIMITS = {
+    "wechat": {"max_side": 1920, "quality": 85, "max_bytes": 2 * 1024 * 1024},
+    "xiaohongshu": {"max_side": 2160, "quality": 88, "max_bytes": 10 * 1024 * 1024},
+}
+DEFAULT_IMAGE_LIMITS = {"max_side": 1920, "quality": 85, "max_bytes": 5 * 1024 * 1024}
+
+# 超过 max_bytes 时每次降低的质量，最低不低于 MIN_QUALITY
+QUALITY_STEP = 10
+MIN_QUALITY = 55
+
+
+def file_hash(path):
+    """图片文件内容的哈希"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _process_image(src, dest, max_side, quality, max_bytes):
+    """
+    缩放、转 JPEG、去元数据，写到 dest，返回输出字节数
+    在工作进程中执行，只能用可 pickle 的参数
+    """
+    with Image.open(src) as img:
+        # 先按 EXIF 方向旋转，之后保存时不再带 EXIF
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            while True:
+                img.save(tmp_path, "JPEG", quality=quality, optimize=True, progressive=True)
+                size = os.path.getsize(tmp_path)
+                if size <= max_bytes or quality <= MIN_QUALITY:
+                    break
+                quality = max(MIN_QUALITY, quality - QUALITY_STEP)
+            os.replace(tmp_path, dest)
+        except BaseException:
+            # 写了一半的临时文件不留在缓存目录里
+            _remove(tmp_path)
+            raise
+    return size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ImagePreprocessor:
+    """按平台预处理图片，结果缓存在 cache_dir，处理中的同一张图只提交一次"""
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, workers=IMAGE_WORKERS):
+        self.cache_dir = cache_dir
+        self.workers = max(1, workers)
+        self._executor = None
+        # _submit 持锁时会调用 _get_executor
+        self._lock = threading.RLock()
+        # {输出路径: Future}，正在处理的任务
+        self._inflight = {}
+        self.stats = {"processed": 0, "cache_hits": 0, "bytes_in": 0, "bytes_out": 0}
+
+    @property
+    def available(self):
+        return Image is not None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 打包后的可执行文件不能安全地再启动自身作为子进程，改用线程（Pillow 编解码时会释放 GIL）
+                if getattr(sys, "frozen", False):
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _submit(self, path, platform):
+        """提交一张图，返回 (原路径, 输出路径, Future 或 None)；None 表示直接用缓存或原图"""
+        if not path or not os.path.isfile(path):
+            return path, path, None
+        limits = PLATFORM_IMAGE_LIMITS.get(platform, DEFAULT_IMAGE_LIMITS)
+        key = f"{file_hash(path)}-{limits['max_side']}-{limits['quality']}-{limits['max_bytes']}"
+        dest = os.path.join(self.cache_dir, key[:2], f"{key}.jpg")
+
+        with self._lock:
+            future = self._inflight.get(dest)
+            if future is not None:
+                return path, dest, future
+            if os.path.exists(dest):
+                self.stats["cache_hits"] += 1
+                return path, dest, None
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            future = self._get_executor().submit(
+                _process_image, path, dest, limits["max_side"], limits["quality"], limits["max_bytes"]
+            )
+            self._inflight[dest] = future
+        future.add_done_callback(lambda f, path=path, dest=dest: self._done(path, dest, f))
+        return path, dest, future
+
+    def _done(self, path, dest, future):
+        with self._lock:
+            if not future.cancelled() and future.exception() is None:
+                self.stats["processed"] += 1
+                self.stats["bytes_in"] += os.path.getsize(path)
+                self.stats["bytes_out"] += future.result()
+            else:
+                # 工作进程异常退出时来不及清理临时文件（dest 只在成功时原子替换，不会是半个文件）；
+                # 在移出 _inflight 之前清理，不会删到同一张图重新提交后的临时文件
+                for tmp_path in glob.glob(glob.escape(dest) + ".*.tmp"):
+                    _remove(tmp_path)
+            self._inflight.pop(dest, None)
+
+    def prefetch(self, paths, platforms):
+        """提前提交处理，不等待结果（例如任务排队时），之后 prepare 会直接拿到结果"""
+        if not self.available:
+            return
+        for platform in platforms:
+            if platform not in PLATFORM_IMAGE_LIMITS:
+                continue
+            for path in paths:
+                try:
+                    self._submit(path, platform)
+                except OSError as e:
+                    print(f"[image] 预处理提交失败 {path}: {e}")
+
+    def prepare(self, paths, platform):
+        """返回处理后的图片路径列表（与输入一一对应），处理失败的图片用原图"""
+        if not self.available:
+            return list(paths)
+        submitted = []
+        for path in paths:
+            try:
+                submitted.append(self._submit(path, platform))
+            except OSError as e:
+                print(f"[{platform}] 图片预处理失败，使用原图 {path}: {e}")
+                submitted.append((path, path, None))
+
+        results = []
+        for path, dest, future in submitted:
+            if future is not None:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"[{platform}] 图片预处理失败，使用原图 {path}: {e}")
+                    dest = path
+            results.append(dest)
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+preprocessor = ImagePreprocessor()
@@ -0,0 +1,212 @@
+"""
+发布任务的持久化存储
+任务、各平台账号的结果和已发布记录都存在 SQLite（WAL 模式）里，进程重启后不会丢失排队中和进行中的任务。
+
+WAL 模式下 synchronous=NORMAL 只在检查点时刷盘，每次写入只是追加到 WAL 文件，
+一次状态更新在毫秒以内；进程崩溃不会丢数据，只有整机断电可能丢最后几次写入。
+
+幂等：每次提交带一个幂等键（默认是文章内容的哈希，见 Article.content_hash），
+(幂等键, 平台账号) 在 publications 表里占用后才会真正发布，已发布成功的不会再发第二次。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+JOBS_DB = os.environ.get("JOBS_DB", "jobs.db")
+# 数据库里保留的任务数（已发布记录不清理，幂等检查一直有效）
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", "5000"))
+
+# 已发布记录的状态
+PUB_PUBLISHING = "publishing"
+PUB_DONE = "done"
+PUB_FAILED = "failed"
+# 发布中途进程退出，不确定是否已经发出去
+PUB_INTERRUPTED = "interrupted"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT NOT NULL,
+    label TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, label)
+);
+CREATE TABLE IF NOT EXISTS publications (
+    key TEXT NOT NULL,
+    label TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (key, label)
+);
+"""
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+class JobDatabase:
+    """
+    所有线程共用一个连接，读写都在锁内完成
+    任务行的 data 是任务字典（不含 results），results 按平台账号单独存一行，记录一个结果不用重写整个任务
+    """
+
+    def __init__(self, path=JOBS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        # isolation_level=None：自动提交，需要多条语句原子执行时显式 BEGIN
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ========== 任务 ==========
+
+    @staticmethod
+    def _row(job):
+        return {k: v for k, v in job.items() if k != "results"}
+
+    def insert_job(self, job, payload=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, created_at, data, payload) VALUES (?, ?, ?, ?, ?)",
+                (job["id"], job["status"], job["created_at"], _dumps(self._row(job)),
+                 _dumps(payload) if payload is not None else None),
+            )
+
+    def update_job(self, job):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = ?, data = ? WHERE id = ?",
+                               (job["status"], _dumps(self._row(job)), job["id"]))
+
+    def put_result(self, job, label):
+        """记录一个平台账号的结果，并更新任务（同一个事务）"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("INSERT OR REPLACE INTO results (job_id, label, data) VALUES (?, ?, ?)",
+                                   (job["id"], label, _dumps(job["results"][label])))
+                self._conn.execute("UPDATE jobs SET status = ?, data = ? WHERE id = ?",
+                                   (job["status"], _dumps(self._row(job)), job["id"]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _with_results(self, rows):
+        jobs = []
+        for (data,) in rows:
+            job = json.loads(data)
+            job["results"] = {}
+            jobs.append(job)
+        if jobs:
+            by_id = {job["id"]: job for job in jobs}
+            marks = ",".join("?" * len(by_id))
+            for job_id, label, data in self._conn.execute(
+                    f"SELECT job_id, label, data FROM results WHERE job_id IN ({marks})", list(by_id)):
+                by_id[job_id]["results"][label] = json.loads(data)
+        return jobs
+
+    def get_job(self, job_id):
+        """单个任务（含结果），不存在返回 None"""
+        with self._lock:
+            jobs = self._with_results(self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)))
+        return jobs[0] if jobs else None
+
+    def recent_jobs(self, limit):
+        """最近的 limit 个任务，按提交时间正序"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM (SELECT data, created_at FROM jobs ORDER BY created_at DESC LIMIT ?) "
+                "ORDER BY created_at", (limit,)).fetchall()
+            return self._with_results(rows)
+
+    def unfinished_jobs(self, statuses):
+        """状态在 statuses 中的任务 [(任务, payload)]，按提交时间正序"""
+        marks = ",".join("?" * len(statuses))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data, payload FROM jobs WHERE status IN ({marks}) ORDER BY created_at",
+                list(statuses)).fetchall()
+            jobs = self._with_results([(data,) for data, _ in rows])
+        return [(job, json.loads(payload) if payload else None) for job, (_, payload) in zip(jobs, rows)]
+
+    def prune(self, keep=JOB_HISTORY, statuses=()):
+        """只保留最近 keep 个任务（statuses 中的任务不删），返回删除的任务数"""
+        marks = ",".join("?" * len(statuses))
+        exclude = f"AND status NOT IN ({marks})" if statuses else ""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                old = [row[0] for row in self._conn.execute(
+                    f"SELECT id FROM jobs WHERE id NOT IN "
+                    f"(SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?) {exclude}",
+                    [keep, *statuses])]
+                for job_id in old:
+                    self._conn.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+                    self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(old)
+
+    # ========== 幂等 ==========
+
+    def claim(self, key, label, job_id):
+        """
+        占用 (幂等键, 平台账号)，返回 None 表示可以发布；不能发布时返回已有记录 {job_id, status}
+        没有记录、上次失败、或上次中断（由新提交的任务重新发布，用户已确认过）时可以占用；
+        已发布成功或其他任务正在发布时不能占用
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT job_id, status FROM publications WHERE key = ? AND label = ?",
+                                         (key, label)).fetchone()
+                if row is not None:
+                    owner, status = row
+                    if status in (PUB_DONE, PUB_PUBLISHING) or (status == PUB_INTERRUPTED and owner == job_id):
+                        self._conn.execute("COMMIT")
+                        return {"job_id": owner, "status": status}
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO publications (key, label, job_id, status, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)", (key, label, job_id, PUB_PUBLISHING, time.time()))
+                self._conn.execute("COMMIT")
+                return None
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def settle(self, key, label, job_id, success):
+        """发布结束：成功记为 done（以后不再发布），失败释放占用"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE publications SET status = ?, updated_at = ? WHERE key = ? AND label = ? AND job_id = ?",
+                (PUB_DONE if success else PUB_FAILED, time.time(), key, label, job_id))
+
+    def interrupt(self, job_id):
+        """把任务中仍在发布的记录标记为中断，返回这些平台账号"""
+        with self._lock:
+            labels = [row[0] for row in self._conn.execute(
+                "SELECT label FROM publications WHERE job_id = ? AND status = ?", (job_id, PUB_PUBLISHING))]
+            self._conn.execute("UPDATE publications SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                               (PUB_INTERRUPTED, time.time(), job_id, PUB_PUBLISHING))
+        return labels
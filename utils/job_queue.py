@@ -0,0 +1,212 @@
+"""
+发布任务队列
+每次提交生成一个任务 ID，由固定数量的工作线程从队列中取出执行；
+任务状态保存在线程安全的 JobStore 中，供 /api/jobs/<id> 查询；
+同时写入 SQLite（见 utils.job_db），重启后由 JobQueue.recover() 继续未完成的任务
+"""
+
+import copy
+import os
+import queue
+import threading
+import time
+import uuid
+
+from utils.auth_manager import parse_target
+from utils.job_db import JobDatabase, JOBS_DB
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+# 重启时未完成且没有继续执行的任务
+JOB_INTERRUPTED = "interrupted"
+
+# 重启时如何处理未完成的任务：resume 继续执行（默认），mark 只标记为 interrupted
+JOB_RECOVERY = os.environ.get("JOB_RECOVERY", "resume")
+
+
+class JobStore:
+    """
+    线程安全的任务状态存储，所有读写都在锁内完成
+    内存里保留最近 max_jobs 个任务供查询，每次变化同时写入数据库（db_path 为 ":memory:" 时不落盘）
+    """
+
+    def __init__(self, max_jobs=500, on_change=None, db_path=JOBS_DB):
+        self.max_jobs = max_jobs
+        # on_change(job) 在任务变化后调用（锁外），参数为任务快照
+        self.on_change = on_change
+        self.db = JobDatabase(db_path)
+        self._jobs = {}
+        self._order = []
+        self._lock = threading.Lock()
+        for job in self.db.recent_jobs(max_jobs):
+            self._jobs[job["id"]] = job
+            self._order.append(job["id"])
+
+    def _notify(self, job_id):
+        if self.on_change:
+            job = self.get(job_id)
+            if job is not None:
+                self.on_change(job)
+
+    def create(self, payload=None, **fields):
+        """新建任务，返回任务 ID；payload 一起存入数据库，重启后用于继续执行"""
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "status": JOB_QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "current_platform": "",
+            "message": "排队中...",
+            "completed": [],
+            "results": {},
+        }
+        job.update(fields)
+        with self._lock:
+            self.db.insert_job(job, payload)
+            self._jobs[job_id] = job
+            self._order.append(job_id)
+            # 只保留最近的任务，避免内存无限增长
+            while len(self._order) > self.max_jobs:
+                oldest = self._order[0]
+                if self._jobs[oldest]["status"] in (JOB_QUEUED, JOB_RUNNING):
+                    break
+                self._order.pop(0)
+                del self._jobs[oldest]
+        self._notify(job_id)
+        return job_id
+
+    def update(self, job_id, **fields):
+        """更新任务字段"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+                self.db.update_job(job)
+        self._notify(job_id)
+
+    def add_result(self, job_id, result):
+        """记录单个平台账号的发布结果，按 label（平台或 平台:账号）区分"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            platform_name = result.get("label", result["platform"])
+            job["results"][platform_name] = result
+            if result["success"]:
+                job["completed"].append(platform_name)
+            else:
+                job["message"] = f"{platform_name} 发布失败: {result['error']}"
+            self.db.put_result(job, platform_name)
+        self._notify(job_id)
+
+    def get(self, job_id):
+        """返回任务快照（副本），内存里已经清掉的旧任务从数据库读，不存在返回 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return copy.deepcopy(job)
+        return self.db.get_job(job_id)
+
+    def restore(self, job):
+        """把数据库里的任务放回内存（重启后继续执行的旧任务可能不在最近 max_jobs 个里）"""
+        with self._lock:
+            if job["id"] not in self._jobs:
+                self._jobs[job["id"]] = job
+                self._order.append(job["id"])
+
+    def claim(self, key, label, job_id):
+        """占用 (幂等键, 平台账号)，见 JobDatabase.claim"""
+        return self.db.claim(key, label, job_id)
+
+    def settle(self, key, label, job_id, success):
+        self.db.settle(key, label, job_id, success)
+
+    def latest(self):
+        """返回最近提交的任务快照"""
+        with self._lock:
+            if not self._order:
+                return None
+            return copy.deepcopy(self._jobs[self._order[-1]])
+
+    def list(self, limit=50):
+        """按提交时间倒序返回任务快照"""
+        with self._lock:
+            return [copy.deepcopy(self._jobs[job_id]) for job_id in reversed(self._order[-limit:])]
+
+
+class JobQueue:
+    """固定数量的工作线程从队列中取任务执行 handler(job_id, payload)"""
+
+    def __init__(self, store, handler, workers=2):
+        self.store = store
+        self.handler = handler
+        self._queue = queue.Queue()
+        self._workers = []
+        for i in range(max(1, workers)):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._workers.append(thread)
+
+    def submit(self, payload, **fields):
+        """提交任务，返回任务 ID"""
+        job_id = self.store.create(payload, **fields)
+        self._queue.put((job_id, payload))
+        return job_id
+
+    def recover(self, policy=JOB_RECOVERY):
+        """
+        处理上次退出时未完成的任务，启动时调用一次，返回 (继续执行数, 标记数)
+        已经有结果的平台账号不会重做；退出时正在发布的平台账号不确定是否已经发出，记为中断，不自动重发
+        """
+        resumed = marked = 0
+        for job, payload in self.store.db.unfinished_jobs((JOB_QUEUED, JOB_RUNNING)):
+            job_id = job["id"]
+            self.store.restore(job)
+            for label in self.store.db.interrupt(job_id):
+                platform_name, account = parse_target(label)
+                self.store.add_result(job_id, {
+                    "platform": platform_name, "account": account, "label": label,
+                    "success": False, "interrupted": True,
+                    "error": "发布过程中程序退出，无法确认是否已发布，请到后台确认后重新提交",
+                })
+            if policy == "resume" and payload is not None:
+                self.store.update(job_id, status=JOB_QUEUED, message="程序重启，继续发布...")
+                self._queue.put((job_id, payload))
+                resumed += 1
+            else:
+                self.store.update(job_id, status=JOB_INTERRUPTED, finished_at=time.time(),
+                                  current_platform="", message="程序重启，任务未完成")
+                marked += 1
+        if resumed or marked:
+            print(f"[jobs] 上次未完成的任务：继续 {resumed} 个，标记为中断 {marked} 个")
+        return resumed, marked
+
+    def pending(self):
+        """排队中的任务数"""
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            job_id, payload = self._queue.get()
+            self.store.update(job_id, status=JOB_RUNNING, started_at=time.time(), message="正在启动...")
+            try:
+                self.handler(job_id, payload)
+                job = self.store.get(job_id) or {}
+                failed = [name for name, r in job.get("results", {}).items() if not r["success"]]
+                self.store.update(
+                    job_id,
+                    status=JOB_FAILED if failed else JOB_DONE,
+                    finished_at=time.time(),
+                    current_platform="",
+                    message=f"发布完成，失败: {', '.join(failed)}" if failed else "发布完成"
+                )
+            except Exception as e:
+                self.store.update(job_id, status=JOB_FAILED, finished_at=time.time(),
+                                  message=f"发布出错: {str(e)}")
+            finally:
+                self._queue.task_done()
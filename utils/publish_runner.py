@@ -0,0 +1,316 @@
+"""
+多平台并发发布
+每个平台账号在独立线程中运行，拥有自己的 BrowserContext，总耗时约等于最慢的那个。
+浏览器可以由本模块按次启动，也可以从常驻的 BrowserPool 借用。
+
+多账号：发布目标可以是平台类，也可以是 (平台类, 账号)，账号为 None 表示默认账号（见 utils.auth_manager）。
+同一账号同时只会有一个发布在跑（包括其他任务里的，见 utils.account_locks），不同账号并行。
+
+无头模式：headless 可以是 True / False / "auto"，或按平台（或 平台:账号）指定的字典 {"wechat": "auto", ...}。
+"auto" 表示保存的登录状态离线检查未过期就无头运行；无头运行时发现需要扫码，会自动换成可见浏览器重试。
+"""
+
+import os
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+from playwright.sync_api import sync_playwright
+
+from platforms.base import LoginRequiredError
+from utils.auth_manager import SESSION_MISSING, SESSION_EXPIRED, target_label
+from utils.account_locks import account_locks
+from utils.artifacts import new_job_id
+from utils.article import Article
+from utils.tracing import tracer
+from utils.resource_blocker import install_blocker
+from utils.trace_capture import TraceCapture
+
+# 同时发布的最大平台数（可通过环境变量覆盖）
+MAX_PARALLEL_PLATFORMS = int(os.environ.get("MAX_PARALLEL_PLATFORMS", "3"))
+# 默认无头模式
+HEADLESS_MODE = os.environ.get("PUBLISH_HEADLESS", "auto")
+# 账号都被其他任务占用时，多久检查一次（秒）
+ACCOUNT_WAIT_INTERVAL = 1.0
+
+
+def resolve_headless(mode, platform_name, auth_manager, account=None):
+    """把 headless 配置解析成该平台账号本次是否无头运行"""
+    if isinstance(mode, dict):
+        mode = mode.get(target_label(platform_name, account), mode.get(platform_name, HEADLESS_MODE))
+    if isinstance(mode, str):
+        value = mode.strip().lower()
+        if value in ("true", "1", "yes", "headless"):
+            return True
+        if value in ("false", "0", "no", "headful"):
+            return False
+        # auto：保存的登录状态没有明显过期才无头运行
+        status = auth_manager.check_state(platform_name, account)["status"]
+        return status not in (SESSION_MISSING, SESSION_EXPIRED)
+    return bool(mode)
+
+
+def normalize_targets(platform_classes):
+    """[平台类 或 (平台类, 账号)] 转成去重后的 [(平台类, 账号)]"""
+    targets = []
+    for target in platform_classes:
+        target = target if isinstance(target, tuple) else (target, None)
+        if target not in targets:
+            targets.append(target)
+    return targets
+
+
+def _new_result(platform_name, account=None):
+    return {
+        "platform": platform_name,
+        "account": account,
+        "label": target_label(platform_name, account),
+        "success": False,
+        "error": "",
+        "duration": 0.0,
+        "timing": {},
+        "headless": False,
+    }
+
+
+def skipped_result(platform_name, account, reason, success=True):
+    """没有实际执行的平台账号的结果，reason 为原因（例如同一篇文章已经发布过）"""
+    result = _new_result(platform_name, account)
+    result["success"] = success
+    result["skipped"] = reason
+    if not success:
+        result["error"] = reason
+    return result
+
+
+def publish_in_context(PlatformClass, context, article, auth_manager, result, headless=False,
+                       job_id=None, account=None):
+    """在给定的 BrowserContext 中登录并发布，结果写入 result"""
+    platform_name = PlatformClass.PLATFORM_NAME
+    article = Article.coerce(article)
+    session = auth_manager.check_state(platform_name, account)
+    blocker = install_blocker(context, platform_name, headless=headless)
+    publisher = PlatformClass(context, headless=headless, session=session, job_id=job_id, account=account)
+    label = publisher.label
+    # 失败或超出耗时预算时才保留 Playwright trace
+    trace = TraceCapture(context, label, publisher.artifact_dir(), headless=headless).start()
+    result["headless"] = headless
+    result["session"] = session["status"]
+    failed = False
+    try:
+        with publisher.step("login", headless=headless, session=session["status"]):
+            publisher.login()
+        with publisher.step("save_state"):
+            auth_manager.save_state(context, platform_name, account)
+        with publisher.step("publish"):
+            publisher.publish(article)
+        result["success"] = True
+    except LoginRequiredError:
+        raise
+    except Exception:
+        failed = True
+        # 失败时才把内存中的截图写到任务目录
+        publisher.capture("failure")
+        result["artifacts"] = publisher.save_captures()
+        raise
+    finally:
+        kept = trace.finish(failed, tracer.spans(publisher.job_id))
+        if kept:
+            result["trace"] = kept
+        result["timing"] = publisher.timing_report()
+        # 各步骤的检查点和重试情况
+        result["steps"] = publisher.checkpoint_report()
+        if result["steps"]["retried"] or result["steps"]["restarts"]:
+            print(f"[{label}] 重试的步骤: {', '.join(result['steps']['retried']) or '-'}，"
+                  f"从头重来 {result['steps']['restarts']} 次")
+        print(f"[{label}] 耗时 {result['timing']['total']}s："
+              f"等待 {result['timing']['waiting']}s，操作 {result['timing']['acting']}s，"
+              f"协议往返 {result['timing']['rpc_calls']} 次")
+        if blocker:
+            result["blocked"] = blocker.report()
+            print(f"[{label}] 拦截 {result['blocked']['blocked']}/{result['blocked']['requests']} 个请求，"
+                  f"估算节省 {result['blocked']['estimated_bytes_saved'] // 1024} KB")
+    return result
+
+
+def publish_one(PlatformClass, article, auth_manager, launch_options=None, headless=HEADLESS_MODE,
+                job_id=None, account=None):
+    """
+    在当前线程中启动浏览器并发布到单个平台账号，返回结果字典
+    该账号正被其他发布占用时先等待
+    """
+    platform_name = PlatformClass.PLATFORM_NAME
+    result = _new_result(platform_name, account)
+    label = result["label"]
+    key = (platform_name, account)
+    if not account_locks.try_acquire(key, job_id):
+        print(f"[{label}] 账号正在发布其他任务，等待...")
+        account_locks.acquire(key, job_id)
+    start = time.time()
+
+    try:
+        # 无头运行失败于扫码登录时，再用可见浏览器试一次
+        attempts = [True, False] if resolve_headless(headless, platform_name, auth_manager, account) else [False]
+        # Playwright 同步 API 的对象不能跨线程使用，每个线程启动自己的实例
+        with sync_playwright() as p:
+            for attempt_headless in attempts:
+                with tracer.span("launch_browser", label, job_id, headless=attempt_headless):
+                    browser = p.chromium.launch(**dict(launch_options or {}, headless=attempt_headless))
+                try:
+                    state_path = auth_manager.load_state(platform_name, account)
+                    if state_path:
+                        context = browser.new_context(storage_state=state_path)
+                    else:
+                        context = browser.new_context()
+                    try:
+                        publish_in_context(PlatformClass, context, article, auth_manager, result,
+                                           headless=attempt_headless, job_id=job_id, account=account)
+                        break
+                    except LoginRequiredError as e:
+                        if not attempt_headless:
+                            raise
+                        print(f"[{label}] {e}，切换到可见浏览器")
+                    finally:
+                        context.close()
+                finally:
+                    browser.close()
+    except Exception as e:
+        print(f"[{label}] 发布失败: {e}")
+        result["error"] = str(e)
+    finally:
+        account_locks.release(key)
+
+    result["duration"] = round(time.time() - start, 2)
+    return result
+
+
+def publish_pooled(pool, PlatformClass, article, auth_manager, on_start=None, worker_context=None,
+                   headless=False, job_id=None, account=None):
+    """
+    提交到浏览器池发布单个平台账号，返回 Future，结果为结果字典
+    无头运行遇到扫码登录时结果中 login_required 为 True，由调用方换成可见浏览器重新提交
+    账号占用由调用方负责（见 publish_concurrently）
+    """
+    platform_name = PlatformClass.PLATFORM_NAME
+    result = _new_result(platform_name, account)
+    label = result["label"]
+    submitted_at = time.time()
+
+    def run(context):
+        with (worker_context() if worker_context else nullcontext()):
+            if on_start:
+                on_start(label)
+            start = time.time()
+            try:
+                publish_in_context(PlatformClass, context, article, auth_manager, result,
+                                   headless=headless, job_id=job_id, account=account)
+            except LoginRequiredError as e:
+                print(f"[{label}] {e}，切换到可见浏览器")
+                result["error"] = str(e)
+                result["login_required"] = True
+            except Exception as e:
+                print(f"[{label}] 发布失败: {e}")
+                result["error"] = str(e)
+            result["duration"] = round(time.time() - start, 2)
+            result["queued"] = round(start - submitted_at, 2)
+            tracer.record("queued", label, job_id, submitted_at, start)
+            return result
+
+    context_options = {}
+    state_path = auth_manager.load_state(platform_name, account)
+    if state_path:
+        context_options["storage_state"] = state_path
+    return pool.submit(run, headless=headless, **context_options)
+
+
+def publish_concurrently(platform_classes, article, auth_manager, launch_options=None,
+                         max_parallel=MAX_PARALLEL_PLATFORMS, on_start=None, on_result=None,
+                         pool=None, worker_context=None, headless=HEADLESS_MODE, job_id=None):
+    """
+    并发发布到多个平台账号，返回 {label: result} 字典（label 见 utils.auth_manager.target_label，
+    默认账号就是平台名）
+
+    platform_classes 的元素为平台类或 (平台类, 账号)
+    传入 pool 时从浏览器池借用浏览器（并发数同时受池大小限制），否则每个平台账号单独启动浏览器
+    on_start(label) 在某个平台账号开始时调用（工作线程中）
+    on_result(result) 在某个平台账号结束时调用（调用者线程中）
+    worker_context() 返回一个上下文管理器，在执行发布的线程中包裹整个发布过程（例如捕获日志）
+    headless 见模块说明，可按平台指定
+    job_id 用于失败截图等产物的目录名，不传时自动生成
+    """
+    results = {}
+    targets = normalize_targets(platform_classes)
+    if not targets:
+        return results
+
+    job_id = job_id or new_job_id()
+    # 所有平台共用一个 Article，各平台的版本只计算一次
+    article = Article.coerce(article)
+
+    max_parallel = max(1, min(max_parallel or 1, len(targets)))
+
+    if pool is not None:
+        def submit(target, target_headless):
+            PlatformClass, account = target
+            return publish_pooled(pool, PlatformClass, article, auth_manager, on_start, worker_context,
+                                  headless=target_headless, job_id=job_id, account=account)
+
+        # 同时在池中的任务不超过 max_parallel；被其他任务占用的账号先跳过，发下一个空闲的账号
+        pending = list(targets)
+        running = {}
+        held = set()
+        try:
+            while pending or running:
+                for target in list(pending):
+                    if len(running) >= max_parallel:
+                        break
+                    PlatformClass, account = target
+                    key = (PlatformClass.PLATFORM_NAME, account)
+                    if not account_locks.try_acquire(key, job_id):
+                        continue
+                    held.add(key)
+                    pending.remove(target)
+                    running[submit(target, resolve_headless(headless, PlatformClass.PLATFORM_NAME,
+                                                            auth_manager, account))] = target
+                if not running:
+                    # 剩下的账号都在其他任务里发布，等有账号释放
+                    account_locks.wait(ACCOUNT_WAIT_INTERVAL)
+                    continue
+
+                done, _ = wait(running, timeout=ACCOUNT_WAIT_INTERVAL if pending else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    target = running.pop(future)
+                    result = future.result()
+                    if result.get("login_required"):
+                        # 需要扫码：换成可见浏览器重新提交（继续占用账号），结果等重试完成再报告
+                        running[submit(target, False)] = target
+                        continue
+                    key = (result["platform"], result["account"])
+                    account_locks.release(key)
+                    held.discard(key)
+                    results[result["label"]] = result
+                    if on_result:
+                        on_result(result)
+        finally:
+            for key in held:
+                account_locks.release(key)
+        return results
+
+    def run(target):
+        PlatformClass, account = target
+        with (worker_context() if worker_context else nullcontext()):
+            if on_start:
+                on_start(target_label(PlatformClass.PLATFORM_NAME, account))
+            return publish_one(PlatformClass, article, auth_manager, launch_options, headless, job_id,
+                               account=account)
+
+    with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="publish") as executor:
+        futures = [executor.submit(run, target) for target in targets]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result["label"]] = result
+            if on_result:
+                on_result(result)
+
+    return results
@@ -0,0 +1,158 @@
+"""
+拦截创作者后台用不到的重资源
+登录检查和编辑器加载时，页面会拉大量图片、字体、视频和统计上报，自动化流程都用不到。
+只在无头运行时安装：字体、视频直接中止，统计上报返回空响应，图片换成 1x1 占位图。
+上传接口和编辑器资源在白名单里，始终放行。
+
+context.route 只注册这几类资源的地址规则，不用 "**/*"：其余请求不经过 Python，也照常使用浏览器的 HTTP 缓存。
+同步 API 里路由回调只在发布线程进入 Playwright 调用时才执行，拦截范围越小，线程在别处等待时被卡住的请求越少；
+可见浏览器里可能要停下来等人工操作，因此完全不拦截。
+"""
+
+import os
+import re
+import threading
+
+# 设为 0 关闭拦截
+BLOCK_RESOURCES = os.environ.get("BLOCK_RESOURCES", "1") != "0"
+
+# 被拦截资源的典型大小（字节）：被拦截的请求不会下载，拿不到真实大小，节省的流量按 次数 × 典型大小 估算
+ESTIMATED_BYTES = {
+    "image": 40 * 1024,
+    "font": 60 * 1024,
+    "media": 500 * 1024,
+    "beacon": 1024,
+}
+
+# 1x1 透明 GIF
+_PIXEL_GIF = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00"
+    b",\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+)
+
+# 各平台共用的统计上报地址
+COMMON_BEACONS = [
+    r"hm\.baidu\.com",
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"/sendBeacon",
+]
+
+# 各平台共用的白名单：上传、二维码
+COMMON_ALLOW = [
+    r"upload",
+    r"qrcode",
+    r"qr_code",
+]
+
+# 平台策略：allow 始终放行；beacons 为统计上报，返回空响应
+POLICIES = {
+    "wechat": {
+        "allow": [r"/cgi-bin/filetransfer", r"/cgi-bin/scanloginqrcode", r"mmbiz\.qpic\.cn"],
+        "beacons": [r"/mp/jsmonitor", r"/cgi-bin/webreport", r"badjs"],
+    },
+    "toutiao": {
+        "allow": [r"/mp/agw/article_material", r"/spice/image", r"image_upload"],
+        "beacons": [r"mcs\.snssdk\.com", r"mon\.snssdk\.com", r"/monitor_browser/collect", r"/slardar/"],
+    },
+    "xiaohongshu": {
+        "allow": [r"ros-upload", r"/api/media/v1/upload"],
+        "beacons": [r"t2\.xiaohongshu\.com", r"apm-fe\.xiaohongshu\.com", r"/api/v2/collect"],
+    },
+}
+
+# 按地址后缀识别的资源类型
+RESOURCE_PATTERNS = {
+    "font": r"\.(woff2?|ttf|otf|eot)([?#]|$)",
+    "media": r"\.(mp4|webm|m4v|mov|flv|m3u8|mp3|m4a|aac|ogg|wav)([?#]|$)",
+    "image": r"\.(png|jpe?g|gif|webp|svg|ico|bmp|avif)([?#]|$)",
+}
+
+# 按资源类型拦截：abort 中止；stub 返回占位内容
+TYPE_ACTIONS = {
+    "font": "abort",
+    "media": "abort",
+    "image": "stub",
+}
+
+
+class ResourceBlocker:
+    """一个 BrowserContext 的拦截器，记录命中规则的请求数和拦截情况"""
+
+    def __init__(self, platform, policy=None):
+        self.platform = platform
+        policy = policy if policy is not None else POLICIES.get(platform, {})
+        self.allow = re.compile("|".join(COMMON_ALLOW + policy.get("allow", [])))
+        self.beacons = re.compile("|".join(COMMON_BEACONS + policy.get("beacons", [])))
+        self.type_actions = dict(TYPE_ACTIONS)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.blocked = {}
+
+    def install(self, context):
+        """只为要拦截的几类地址注册路由"""
+        for kind in self.type_actions:
+            context.route(re.compile(RESOURCE_PATTERNS[kind], re.IGNORECASE),
+                          lambda route, kind=kind: self._handle(route, kind))
+        context.route(self.beacons, lambda route: self._handle(route, "beacon"))
+        return self
+
+    def decide(self, url, kind):
+        """命中 kind 规则的地址怎么处理，返回动作，None 表示放行（白名单）"""
+        if self.allow.search(url):
+            return None
+        if kind == "beacon":
+            return "beacon"
+        return self.type_actions.get(kind)
+
+    def _handle(self, route, kind):
+        action = self.decide(route.request.url, kind)
+        with self._lock:
+            self.requests += 1
+            if action:
+                self.blocked[kind] = self.blocked.get(kind, 0) + 1
+        try:
+            if action is None:
+                route.continue_()
+            elif action == "abort":
+                route.abort("blockedbyclient")
+            elif action == "beacon":
+                route.fulfill(status=204, body="")
+            else:
+                route.fulfill(status=200, content_type="image/gif", body=_PIXEL_GIF)
+        except Exception:
+            # 页面已关闭等情况，请求本身也不再需要
+            pass
+
+    def report(self):
+        """拦截统计：命中规则的请求数、拦截数（按类别）、估算节省的字节数（见 ESTIMATED_BYTES，不是实测值）"""
+        with self._lock:
+            blocked = dict(self.blocked)
+            requests = self.requests
+        return {
+            "requests": requests,
+            "blocked": sum(blocked.values()),
+            "by_type": blocked,
+            "estimated_bytes_saved": sum(ESTIMATED_BYTES.get(k, 0) * n for k, n in blocked.items()),
+        }
+
+
+def install_blocker(context, platform, headless=False):
+    """按配置给 context 安装拦截器，关闭或可见浏览器时返回 None"""
+    if not BLOCK_RESOURCES or not headless:
+        return None
+    return ResourceBlocker(platform).install(context)
+
+
+def merge_reports(reports):
+    """把多个平台的拦截统计合并成一个任务的统计"""
+    total = {"requests": 0, "blocked": 0, "by_type": {}, "estimated_bytes_saved": 0}
+    for report in reports:
+        if not report:
+            continue
+        total["requests"] += report["requests"]
+        total["blocked"] += report["blocked"]
+        total["estimated_bytes_saved"] += report["estimated_bytes_saved"]
+        for kind, count in report["by_type"].items():
+            total["by_type"][kind] = total["by_type"].get(kind, 0) + count
+    return total
@@ -0,0 +1,78 @@
+"""
+统计 Playwright 协议往返次数
+把 BrowserContext 包一层代理，由它创建的 Page / Locator / Keyboard 等对象也会被代理，
+每调用一次会发消息给浏览器的方法计一次数。只在本地构造对象的方法（locator、get_by_*、nth 等）不计数。
+"""
+
+# 只在 Python 端构造对象、不与浏览器通信的方法
+LOCAL_METHODS = {
+    "locator", "get_by_text", "get_by_role", "get_by_placeholder", "get_by_label",
+    "get_by_test_id", "get_by_title", "get_by_alt_text", "frame_locator",
+    "nth", "filter", "and_", "or_",
+    "on", "once", "remove_listener", "is_closed",
+}
+
+
+class RpcCounter:
+    """往返次数计数器"""
+
+    def __init__(self):
+        self.calls = 0
+        self.by_method = {}
+
+    def record(self, name):
+        self.calls += 1
+        self.by_method[name] = self.by_method.get(name, 0) + 1
+
+
+def _is_playwright_object(value):
+    return type(value).__module__.startswith("playwright.")
+
+
+def _unwrap(value):
+    return value._target if isinstance(value, CountingProxy) else value
+
+
+class CountingProxy:
+    """透明代理：转发所有属性访问，方法调用计数，返回的 Playwright 对象继续代理"""
+
+    __slots__ = ("_target", "_counter")
+
+    def __init__(self, target, counter):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_counter", counter)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if callable(value) and not _is_playwright_object(value):
+            counter = self._counter
+
+            def call(*args, **kwargs):
+                if name not in LOCAL_METHODS:
+                    counter.record(name)
+                args = [_unwrap(a) for a in args]
+                kwargs = {k: _unwrap(v) for k, v in kwargs.items()}
+                return wrap(value(*args, **kwargs), counter)
+
+            return call
+        return wrap(value, self._counter)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    # with page.expect_file_chooser() as info: ... 需要代理上下文管理器协议
+    def __enter__(self):
+        return wrap(self._target.__enter__(), self._counter)
+
+    def __exit__(self, *exc):
+        return self._target.__exit__(*exc)
+
+    def __repr__(self):
+        return f"CountingProxy({self._target!r})"
+
+
+def wrap(value, counter):
+    """Playwright 对象用代理包起来，其他值原样返回"""
+    if isinstance(value, CountingProxy) or not _is_playwright_object(value):
+        return value
+    return CountingProxy(value, counter)
@@ -0,0 +1,335 @@
+"""
+定时发布
+定时任务保存在追加写的日志文件 schedules.jsonl 里（每次新增、状态变化各写一行，写入成本与任务总数无关），
+启动时重放日志恢复。内存里只保留每个任务的元数据和一个按时间排序的小顶堆，
+文章内容留在文件里（记录所在行的偏移），用到时再读，几千个待发任务也只占很少内存。
+
+到点前 PREWARM_SECONDS 先做预热（由调用方提供：启动浏览器、离线检查登录状态、预处理图片），
+到点时直接提交发布任务。进程停机期间错过的任务按补发策略处理：
+- run：启动后立即补发
+- skip：不再发布，标记为 missed
+- window（默认）：错过不超过 CATCHUP_WINDOW 秒的补发，更早的标记为 missed
+"""
+
+import heapq
+import json
+import os
+import threading
+import time
+import uuid
+
+SCHEDULES_FILE = os.environ.get("SCHEDULES_FILE", "schedules.jsonl")
+# 提前多久预热（秒），应小于浏览器池的空闲关闭时间
+PREWARM_SECONDS = int(os.environ.get("SCHEDULE_PREWARM_SECONDS", "180"))
+# 默认补发策略和补发窗口（秒）
+CATCHUP_POLICY = os.environ.get("SCHEDULE_CATCHUP", "window")
+CATCHUP_WINDOW = int(os.environ.get("SCHEDULE_CATCHUP_WINDOW", "3600"))
+CATCHUP_POLICIES = ("run", "skip", "window")
+# 日志行数超过 待发任务数 * 2 + COMPACT_SLACK 时压缩；压缩时保留最近的已结束任务数
+COMPACT_SLACK = 1000
+KEEP_FINISHED = 200
+# 调度线程最长睡眠（秒），系统时间被调整后也能及时醒来
+MAX_SLEEP = 30
+
+# 定时任务状态
+SCHEDULE_PENDING = "pending"
+SCHEDULE_FIRED = "fired"
+SCHEDULE_MISSED = "missed"
+SCHEDULE_CANCELLED = "cancelled"
+SCHEDULE_FAILED = "failed"
+
+# 堆中的事件
+_PREWARM = "prewarm"
+_FIRE = "fire"
+
+
+class ScheduleStore:
+    """
+    追加写的定时任务日志
+    {"op": "add", "schedule": {...元数据}, "payload": {...}} 新增；{"op": "update", "id": ..., "fields": {...}} 更新
+    """
+
+    def __init__(self, path=SCHEDULES_FILE):
+        self.path = path
+        self.lines = 0
+
+    def load(self):
+        """重放日志，返回 {id: 元数据}；元数据里的 _offset 为 add 行的位置"""
+        schedules = {}
+        self.lines = 0
+        if not os.path.exists(self.path):
+            return schedules
+        with open(self.path, "rb") as f:
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 写到一半时停机留下的残行
+                    print(f"[scheduler] 跳过损坏的记录（偏移 {offset}）")
+                    continue
+                self.lines += 1
+                if record.get("op") == "add":
+                    meta = dict(record["schedule"], _offset=offset)
+                    schedules[meta["id"]] = meta
+                elif record.get("op") == "update" and record.get("id") in schedules:
+                    schedules[record["id"]].update(record["fields"])
+        return schedules
+
+    def _append(self, record):
+        """追加一行并刷到磁盘，返回该行的偏移"""
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.lines += 1
+        return offset
+
+    def add(self, meta, payload):
+        offset = self._append({"op": "add", "schedule": meta, "payload": payload})
+        meta["_offset"] = offset
+
+    def update(self, schedule_id, **fields):
+        self._append({"op": "update", "id": schedule_id, "fields": fields})
+
+    def payload(self, meta):
+        """从文件读出任务的发布内容"""
+        with open(self.path, "rb") as f:
+            f.seek(meta["_offset"])
+            return json.loads(f.readline())["payload"]
+
+    def compact(self, schedules):
+        """只保留 schedules 中的任务重写日志（原子替换），并更新它们的偏移"""
+        tmp_path = f"{self.path}.tmp"
+        offsets = {}
+        with open(tmp_path, "wb") as out:
+            for meta in schedules:
+                record = {
+                    "op": "add",
+                    "schedule": {k: v for k, v in meta.items() if k != "_offset"},
+                    "payload": self.payload(meta),
+                }
+                offsets[meta["id"]] = out.tell()
+                out.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, self.path)
+        for meta in schedules:
+            meta["_offset"] = offsets[meta["id"]]
+        self.lines = len(schedules)
+
+
+def _public(meta):
+    """对外展示的任务元数据"""
+    item = {k: v for k, v in meta.items() if not k.startswith("_")}
+    item["due"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(meta["due_at"]))
+    return item
+
+
+class Scheduler:
+    """
+    定时任务调度
+    on_prewarm(schedule, payload) 在到点前 PREWARM_SECONDS 调用，返回值（可 JSON 序列化）记录在任务的 prewarm 字段
+    on_fire(schedule, payload) 到点时调用，返回提交的任务 ID
+    回调都在调度线程中执行，应尽快返回（发布本身交给任务队列）
+    """
+
+    def __init__(self, on_fire, on_prewarm=None, store=None, prewarm_seconds=PREWARM_SECONDS,
+                 catchup_policy=CATCHUP_POLICY, catchup_window=CATCHUP_WINDOW):
+        self.on_fire = on_fire
+        self.on_prewarm = on_prewarm
+        self.store = store or ScheduleStore()
+        self.prewarm_seconds = prewarm_seconds
+        self.catchup_policy = catchup_policy
+        self.catchup_window = catchup_window
+        self._cond = threading.Condition()
+        self._schedules = {}
+        # [(时间, 序号, 任务 ID, 事件)]，取消的任务不从堆里删，出堆时跳过
+        self._heap = []
+        self._seq = 0
+        self._thread = None
+        self._stopped = False
+
+    # ========== 对外接口 ==========
+
+    def start(self):
+        """恢复日志中的任务，处理停机期间错过的任务，启动调度线程"""
+        with self._cond:
+            self._schedules = self.store.load()
+            now = time.time()
+            for meta in self._schedules.values():
+                if meta["status"] != SCHEDULE_PENDING:
+                    continue
+                if meta["due_at"] < now:
+                    self._catch_up(meta, now)
+                else:
+                    self._push(meta)
+            pending = sum(1 for m in self._schedules.values() if m["status"] == SCHEDULE_PENDING)
+            print(f"[scheduler] 已恢复 {pending} 个待发布的定时任务")
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def add(self, due_at, payload, catch_up=None, **fields):
+        """新增定时任务，返回任务元数据；catch_up 为该任务的补发策略（默认用全局策略）"""
+        if catch_up is not None and catch_up not in CATCHUP_POLICIES:
+            raise ValueError(f"无效的补发策略: {catch_up}")
+        meta = {
+            "id": uuid.uuid4().hex[:12],
+            "due_at": float(due_at),
+            "created_at": time.time(),
+            "status": SCHEDULE_PENDING,
+            "catch_up": catch_up,
+            "job_id": None,
+            "prewarm": None,
+        }
+        meta.update(fields)
+        with self._cond:
+            self.store.add(meta, payload)
+            self._schedules[meta["id"]] = meta
+            self._push(meta)
+            self._cond.notify_all()
+        return _public(meta)
+
+    def cancel(self, schedule_id):
+        """取消待发布的任务，返回是否取消成功"""
+        with self._cond:
+            meta = self._schedules.get(schedule_id)
+            if meta is None or meta["status"] != SCHEDULE_PENDING:
+                return False
+            self._set(meta, status=SCHEDULE_CANCELLED)
+            self._maybe_compact()
+            return True
+
+    def get(self, schedule_id):
+        with self._cond:
+            meta = self._schedules.get(schedule_id)
+            return _public(meta) if meta else None
+
+    def list(self, status=None, limit=200):
+        """按执行时间排序的任务列表"""
+        with self._cond:
+            items = [m for m in self._schedules.values() if status is None or m["status"] == status]
+        items.sort(key=lambda m: m["due_at"])
+        return [_public(m) for m in items[:limit]]
+
+    # ========== 内部 ==========
+
+    def _push(self, meta):
+        """把任务的预热和执行事件放进堆（调用方持锁）"""
+        prewarm_at = meta["due_at"] - self.prewarm_seconds
+        if self.on_prewarm and meta["prewarm"] is None:
+            self._seq += 1
+            heapq.heappush(self._heap, (prewarm_at, self._seq, meta["id"], _PREWARM))
+        self._seq += 1
+        heapq.heappush(self._heap, (meta["due_at"], self._seq, meta["id"], _FIRE))
+
+    def _set(self, meta, **fields):
+        """更新任务状态并写日志（调用方持锁）"""
+        meta.update(fields)
+        self.store.update(meta["id"], **fields)
+
+    def _catch_up(self, meta, now):
+        """处理停机期间错过的任务（调用方持锁）"""
+        policy = meta.get("catch_up") or self.catchup_policy
+        late = now - meta["due_at"]
+        if policy == "run" or (policy == "window" and late <= self.catchup_window):
+            print(f"[scheduler] 定时任务 {meta['id']} 已错过 {late:.0f}s，立即补发")
+            self._seq += 1
+            heapq.heappush(self._heap, (now, self._seq, meta["id"], _FIRE))
+        else:
+            print(f"[scheduler] 定时任务 {meta['id']} 已错过 {late:.0f}s，不再发布")
+            self._set(meta, status=SCHEDULE_MISSED)
+
+    def _next_event(self):
+        """等到下一个到期的事件并出堆，返回 (事件, 元数据)；停止时返回 None"""
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                at, _, schedule_id, kind = self._heap[0]
+                delay = at - time.time()
+                if delay > 0:
+                    self._cond.wait(min(delay, MAX_SLEEP))
+                    continue
+                heapq.heappop(self._heap)
+                meta = self._schedules.get(schedule_id)
+                if meta is not None and meta["status"] == SCHEDULE_PENDING:
+                    return kind, meta
+            return None
+
+    def _run(self):
+        while True:
+            event = self._next_event()
+            if event is None:
+                return
+            kind, meta = event
+            try:
+                # 压缩日志会改变偏移，读取时持锁
+                with self._cond:
+                    payload = self.store.payload(meta)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[scheduler] 读取定时任务 {meta['id']} 失败: {e}")
+                with self._cond:
+                    self._set(meta, status=SCHEDULE_FAILED, error=str(e))
+                continue
+            if kind == _PREWARM:
+                self._prewarm(meta, payload)
+            else:
+                self._fire(meta, payload)
+
+    def _prewarm(self, meta, payload):
+        start = time.time()
+        try:
+            result = self.on_prewarm(_public(meta), payload)
+        except Exception as e:
+            result = {"error": str(e)}
+        print(f"[scheduler] 定时任务 {meta['id']} 预热完成（{time.time() - start:.1f}s）: {result}")
+        with self._cond:
+            if meta["status"] == SCHEDULE_PENDING:
+                self._set(meta, prewarm=result if result is not None else {})
+
+    def _fire(self, meta, payload):
+        with self._cond:
+            # 调度线程之外可能刚刚取消
+            if meta["status"] != SCHEDULE_PENDING:
+                return
+        try:
+            job_id = self.on_fire(_public(meta), payload)
+        except Exception as e:
+            print(f"[scheduler] 定时任务 {meta['id']} 提交失败: {e}")
+            with self._cond:
+                self._set(meta, status=SCHEDULE_FAILED, error=str(e), fired_at=time.time())
+            return
+        late = time.time() - meta["due_at"]
+        print(f"[scheduler] 定时任务 {meta['id']} 已提交为任务 {job_id}（延迟 {late:.2f}s）")
+        with self._cond:
+            self._set(meta, status=SCHEDULE_FIRED, job_id=job_id, fired_at=time.time())
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        """日志里的过期记录太多时压缩（调用方持锁）"""
+        metas = list(self._schedules.values())
+        pending = [m for m in metas if m["status"] == SCHEDULE_PENDING]
+        if self.store.lines <= len(pending) * 2 + COMPACT_SLACK:
+            return
+        finished = sorted((m for m in metas if m["status"] != SCHEDULE_PENDING),
+                          key=lambda m: m.get("fired_at") or m["due_at"])[-KEEP_FINISHED:]
+        keep = pending + finished
+        try:
+            self.store.compact(keep)
+        except (OSError, ValueError) as e:
+            print(f"[scheduler] 压缩定时任务日志失败: {e}")
+            return
+        self._schedules = {m["id"]: m for m in keep}
+        print(f"[scheduler] 定时任务日志已压缩，保留 {len(keep)} 条")
@@ -0,0 +1,93 @@
+"""
+发布步骤的检查点与重试策略
+发布流程拆成命名的步骤（见 BasePublisher.run_steps），每完成一步记一个检查点。
+某一步出错时按该步骤的策略重试：页面还能用就在同一个页面上从出错的这一步接着做，
+已完成的步骤（上传的图片、填好的标题正文）不再重做；页面已经不能用（被关闭、跳到了登录页）时才从第一步重来。
+
+可能真正发出文章的步骤（commit=True）开始之后不再从头重来，避免重复发布；
+这类步骤只有写成可以重复执行（先检查页面状态再点击）时才配置多次尝试。
+
+环境变量 STEP_RETRY 覆盖策略，格式为 "步骤=次数[:间隔秒],平台.步骤=次数[:间隔秒]"，
+例如 STEP_RETRY="upload_images=4:3,wechat.confirm=2"
+"""
+
+import os
+
+
+class RetryPolicy:
+    """
+    attempts 为总尝试次数（1 表示不重试）；第 n 次重试前等待 backoff * factor ** (n - 1) 秒，最多 max_delay 秒
+    commit 表示这一步可能已经把文章发出去，开始之后整个流程不再从头重来
+    """
+
+    def __init__(self, attempts=2, backoff=1.0, factor=2.0, max_delay=30.0, commit=False):
+        self.attempts = max(1, int(attempts))
+        self.backoff = float(backoff)
+        self.factor = factor
+        self.max_delay = max_delay
+        self.commit = commit
+
+    def delay(self, retry):
+        """第 retry 次重试（从 1 开始）前等待的秒数"""
+        return min(self.backoff * self.factor ** (retry - 1), self.max_delay)
+
+    def to_dict(self):
+        return {"attempts": self.attempts, "backoff": self.backoff, "factor": self.factor,
+                "max_delay": self.max_delay, "commit": self.commit}
+
+
+DEFAULT_POLICY = RetryPolicy(attempts=2, backoff=1.0)
+
+# 各步骤的策略，"平台.步骤" 优先于 "步骤"；没有列出的用 DEFAULT_POLICY
+STEP_POLICIES = {
+    # 打开页面、切换选项卡：网络抖动最常见，多试几次
+    "open_editor": RetryPolicy(attempts=3, backoff=2.0),
+    "open_publish_page": RetryPolicy(attempts=3, backoff=2.0),
+    "switch_tab": RetryPolicy(attempts=3, backoff=1.0),
+    "close_popup": RetryPolicy(attempts=2, backoff=0.5),
+    # 写入会覆盖原有内容，重试没有副作用
+    "fill_title": RetryPolicy(attempts=3, backoff=0.5),
+    "fill_content": RetryPolicy(attempts=3, backoff=0.5),
+    "cover": RetryPolicy(attempts=2, backoff=1.0),
+    "upload_images": RetryPolicy(attempts=3, backoff=2.0),
+    "click_publish": RetryPolicy(attempts=2, backoff=1.0),
+    "publish_dialog": RetryPolicy(attempts=3, backoff=1.0),
+    # 公众号的 confirm 每次先看弹窗还在不在再点，可以重试
+    "wechat.confirm": RetryPolicy(attempts=3, backoff=1.0, commit=True),
+    # 点了发布按钮就不再重试：没法确认第一次有没有发出去
+    "confirm": RetryPolicy(attempts=1, commit=True),
+    "submit": RetryPolicy(attempts=1, commit=True),
+}
+
+# 页面不能用时，整个流程最多从头重来几次
+FLOW_RESTARTS = int(os.environ.get("FLOW_RESTARTS", "1"))
+
+
+def parse_overrides(text):
+    """解析 STEP_RETRY，返回 {键: (次数, 间隔或 None)}，格式错误的项跳过"""
+    overrides = {}
+    for item in (text or "").split(","):
+        key, _, value = item.strip().partition("=")
+        if not key or not value:
+            continue
+        attempts, _, backoff = value.partition(":")
+        try:
+            overrides[key.strip()] = (int(attempts), float(backoff) if backoff else None)
+        except ValueError:
+            print(f"[step_retry] 忽略无效的重试配置: {item}")
+    return overrides
+
+
+def _apply_overrides(policies, overrides):
+    for key, (attempts, backoff) in overrides.items():
+        base = policies.get(key) or policies.get(key.rpartition(".")[2]) or DEFAULT_POLICY
+        policies[key] = RetryPolicy(attempts, base.backoff if backoff is None else backoff,
+                                    base.factor, base.max_delay, base.commit)
+
+
+_apply_overrides(STEP_POLICIES, parse_overrides(os.environ.get("STEP_RETRY")))
+
+
+def policy_for(platform_name, step):
+    """某个平台某一步的重试策略"""
+    return STEP_POLICIES.get(f"{platform_name}.{step}") or STEP_POLICIES.get(step) or DEFAULT_POLICY
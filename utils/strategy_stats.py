@@ -0,0 +1,108 @@
+"""
+备选策略的成功记录
+发布步骤里常有"方法1 / 方法2 / 方法3"的兜底链，失败的方法要等满超时才会轮到下一个。
+这里按 平台/步骤 记录每个策略的成功、失败次数和耗时，下次按"上次成功的优先"重新排序，
+平台改版导致原来的方法失效后，会自动换成新的成功者。
+"""
+
+import json
+import os
+import threading
+import time
+
+STATS_FILE = os.environ.get("STRATEGY_STATS_FILE", "strategy_stats.json")
+
+# 连续失败这么多次的策略排到最后
+DEMOTE_AFTER_FAILURES = 2
+# 单个策略累计次数超过这个值后减半，让旧记录逐渐失去影响
+MAX_HISTORY = 20
+
+
+class StrategyStats:
+    """
+    {"平台/步骤": {"winner": 策略名, "strategies": {策略名: {ok, fail, streak, seconds, last_ok}}}}
+    多个发布线程共用，读写加锁，每次记录后原子写回文件
+    """
+
+    def __init__(self, path=STATS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def order(self, platform, step, names):
+        """
+        返回本次尝试的顺序：上次成功的排第一，连续失败的排最后，
+        其余按成功率和平均耗时排序，没有记录的保持原顺序
+        """
+        with self._lock:
+            entry = self._data.get(f"{platform}/{step}", {})
+            stats = entry.get("strategies", {})
+            winner = entry.get("winner")
+
+        def rank(item):
+            index, name = item
+            s = stats.get(name)
+            if name == winner:
+                return (0, 0, 0, index)
+            if not s:
+                return (1, 0, 0, index)
+            demoted = 1 if s["streak"] >= DEMOTE_AFTER_FAILURES else 0
+            tries = s["ok"] + s["fail"]
+            rate = s["ok"] / tries if tries else 0
+            avg = s["seconds"] / s["ok"] if s["ok"] else 0
+            return (1 + demoted, -rate, avg, index)
+
+        return [name for _, name in sorted(enumerate(names), key=rank)]
+
+    def record(self, platform, step, name, ok, seconds):
+        """记录一次尝试的结果"""
+        key = f"{platform}/{step}"
+        with self._lock:
+            entry = self._data.setdefault(key, {"winner": None, "strategies": {}})
+            s = entry["strategies"].setdefault(
+                name, {"ok": 0, "fail": 0, "streak": 0, "seconds": 0.0, "last_ok": None}
+            )
+            if s["ok"] + s["fail"] >= MAX_HISTORY:
+                s["seconds"] = s["seconds"] / s["ok"] * (s["ok"] // 2) if s["ok"] else 0.0
+                s["ok"] //= 2
+                s["fail"] //= 2
+
+            if ok:
+                s["ok"] += 1
+                s["streak"] = 0
+                s["seconds"] += seconds
+                s["last_ok"] = time.time()
+                if entry["winner"] != name:
+                    print(f"[{platform}] {step}: 改用策略 '{name}'（上次为 {entry['winner'] or '-'}）")
+                entry["winner"] = name
+            else:
+                s["fail"] += 1
+                s["streak"] += 1
+                if entry["winner"] == name and s["streak"] >= DEMOTE_AFTER_FAILURES:
+                    entry["winner"] = None
+
+            try:
+                self._save()
+            except OSError as e:
+                print(f"[{platform}] 策略记录写入失败: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._data))
+
+
+strategy_stats = StrategyStats()
@@ -0,0 +1,77 @@
+"""
+一次性写入标题和正文
+keyboard.type 每个字符发一次按键事件，长文章要好几分钟；直接改 innerText 又会丢掉段落，
+编辑器自己的状态也感知不到。这里在页面内一次完成写入：
+- input / textarea：用原生 value setter 赋值，再触发 input / change（React 等框架能感知）
+- contenteditable：选中原有内容，派发带 text/plain 和 text/html 的 paste 事件，交给编辑器自己的粘贴逻辑；
+  编辑器没有处理时改用 execCommand('insertHTML')，仍不行才直接写 innerHTML
+正文按行拆成 <p> 段落，耗时与文字长度无关。
+"""
+
+import html
+
+INSERT_TEXT_JS = """
+(el, args) => {
+    const { text, html } = args;
+    const normalize = s => (s || '').replace(/\\s+/g, '');
+    const probe = normalize(text).slice(0, 20);
+    const isField = el.tagName === 'INPUT' || el.tagName === 'TEXTAREA';
+    const current = () => isField ? el.value : el.innerText;
+    const landed = () => normalize(current()).includes(probe);
+    const done = method => ({ method, length: current().length, text: current().slice(0, 50) });
+
+    el.focus();
+
+    if (isField) {
+        const proto = el.tagName === 'INPUT' ? HTMLInputElement.prototype : HTMLTextAreaElement.prototype;
+        Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, text);
+        el.dispatchEvent(new Event('input', { bubbles: true }));
+        el.dispatchEvent(new Event('change', { bubbles: true }));
+        return done('value');
+    }
+
+    // 选中原有内容，粘贴时整体替换
+    const selectAll = () => {
+        const range = document.createRange();
+        range.selectNodeContents(el);
+        const selection = window.getSelection();
+        selection.removeAllRanges();
+        selection.addRange(range);
+    };
+
+    selectAll();
+    const data = new DataTransfer();
+    data.setData('text/plain', text);
+    data.setData('text/html', html);
+    const paste = new ClipboardEvent('paste', { clipboardData: data, bubbles: true, cancelable: true });
+    el.dispatchEvent(paste);
+    if (paste.defaultPrevented && landed()) return done('paste');
+
+    selectAll();
+    if (document.execCommand('insertHTML', false, html) && landed()) return done('insertHTML');
+
+    el.innerHTML = html;
+    el.dispatchEvent(new InputEvent('input', { bubbles: true, inputType: 'insertFromPaste' }));
+    return done('innerHTML');
+}
+"""
+
+# 写入当前获得焦点的元素（手动模式：用户先点击目标区域）
+INSERT_AT_FOCUS_JS = f"""
+(args) => {{
+    const el = document.activeElement;
+    if (!el || el === document.body) return null;
+    return ({INSERT_TEXT_JS.strip()})(el, args);
+}}
+"""
+
+
+def text_to_html(text):
+    """纯文本转成段落 HTML：每个非空行一个 <p>"""
+    lines = [line.strip() for line in text.splitlines()]
+    return "".join(f"<p>{html.escape(line)}</p>" for line in lines if line)
+
+
+def insert_args(text, html=None):
+    """INSERT_TEXT_JS / INSERT_AT_FOCUS_JS 的参数"""
+    return {"text": text, "html": html if html is not None else text_to_html(text)}
@@ -0,0 +1,154 @@
+"""
+按需保留的 Playwright trace
+每个平台发布时在 BrowserContext 上开启 Playwright tracing（只记 DOM 快照和操作，默认不录屏，开销小）。
+只有发布失败、或某个步骤超出耗时预算时，才把 trace 写到任务产物目录 artifacts/<job_id>/<platform>/trace.zip，
+用 `playwright show-trace` 打开就能看到每一步前后的页面和网络请求，不用开着逐步截图重跑；其余情况直接丢弃。
+单个 trace 和所有 trace 的总大小都有上限。
+"""
+
+import os
+import time
+
+from utils.artifacts import ARTIFACTS_DIR
+
+# off 关闭；failure（默认）失败或超出预算时保留；all 每次都保留
+TRACE_MODE = os.environ.get("PLAYWRIGHT_TRACE", "failure")
+# 是否在 trace 里录屏（体积和开销都会明显增加）
+TRACE_SCREENSHOTS = os.environ.get("TRACE_SCREENSHOTS", "0") == "1"
+# 单个 trace 超过这个大小就不保留
+MAX_TRACE_BYTES = int(os.environ.get("TRACE_MAX_MB", "25")) * 1024 * 1024
+# artifacts/ 下所有 trace 的总大小上限，超出时删除最早的
+MAX_TOTAL_TRACE_BYTES = int(os.environ.get("TRACE_TOTAL_MB", "500")) * 1024 * 1024
+
+TRACE_FILE = "trace.zip"
+
+# 各步骤的耗时预算（秒），超出时保留 trace；没有列出的步骤用 DEFAULT_STEP_BUDGET
+STEP_BUDGETS = {
+    "login": 15,
+    "save_state": 3,
+    "publish": 120,
+    "open_editor": 20,
+    "open_publish_page": 20,
+    "close_popup": 5,
+    "switch_tab": 10,
+    "fill_title": 5,
+    "fill_content": 10,
+    "cover": 10,
+    "upload_images": 60,
+    "click_publish": 5,
+    "publish_dialog": 45,
+    "confirm": 10,
+    "submit": 15,
+}
+DEFAULT_STEP_BUDGET = float(os.environ.get("STEP_BUDGET_SECONDS", "30"))
+
+
+def over_budget(spans, budgets=None):
+    """返回超出预算的步骤 [(步骤, 耗时, 预算)]"""
+    budgets = STEP_BUDGETS if budgets is None else budgets
+    slow = []
+    for span in spans:
+        budget = budgets.get(span["name"], DEFAULT_STEP_BUDGET)
+        if span["duration"] is not None and span["duration"] > budget:
+            slow.append((span["name"], span["duration"], budget))
+    return slow
+
+
+def prune_traces(base_dir=ARTIFACTS_DIR, max_total=MAX_TOTAL_TRACE_BYTES, keep=None):
+    """trace 总大小超出上限时从最早的开始删除（不删 keep），返回删除的文件数"""
+    traces = []
+    for root, _, files in os.walk(base_dir):
+        if TRACE_FILE in files:
+            path = os.path.join(root, TRACE_FILE)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            traces.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in traces)
+    removed = 0
+    for _, size, path in sorted(traces):
+        if total <= max_total:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+class TraceCapture:
+    """
+    一个平台账号一次发布的 trace，保存在 directory（发布器的产物目录）
+    label 为平台账号的显示名（见 utils.auth_manager.target_label），与 span 的 platform 字段一致
+    start() 在发布前开启，finish() 在关闭 context 前调用，决定保留还是丢弃
+    可见浏览器里有扫码等人工操作，耗时没有意义，只在失败时保留
+    """
+
+    def __init__(self, context, label, directory, headless=True):
+        self.context = context
+        self.label = label
+        self.directory = directory
+        self.headless = headless
+        self.active = False
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.time()
+        if TRACE_MODE == "off":
+            return self
+        try:
+            self.context.tracing.start(
+                name=self.label,
+                screenshots=TRACE_SCREENSHOTS, snapshots=True, sources=False,
+            )
+            self.active = True
+        except Exception as e:
+            print(f"[{self.label}] 无法开启 Playwright trace: {e}")
+        return self
+
+    def reason(self, failed, spans):
+        """保留的原因，不需要保留时返回 None"""
+        if failed:
+            return "failure"
+        if self.headless:
+            mine = [s for s in spans if s["platform"] == self.label and s["start"] >= self.started_at]
+            slow = over_budget(mine)
+            if slow:
+                return "slow: " + ", ".join(f"{name} {seconds:.1f}s > {budget}s" for name, seconds, budget in slow)
+        if TRACE_MODE == "all":
+            return "all"
+        return None
+
+    def finish(self, failed, spans=()):
+        """
+        结束 tracing：需要保留时写到任务目录，返回 {path, reason, bytes}；丢弃时返回 None
+        超过 MAX_TRACE_BYTES 的 trace 不保留，path 为 None
+        """
+        if not self.active:
+            return None
+        self.active = False
+        reason = self.reason(failed, spans or ())
+        try:
+            if reason is None:
+                self.context.tracing.stop()
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, TRACE_FILE)
+            self.context.tracing.stop(path=path)
+        except Exception as e:
+            print(f"[{self.label}] 结束 Playwright trace 失败: {e}")
+            return None
+
+        size = os.path.getsize(path)
+        if size > MAX_TRACE_BYTES:
+            os.remove(path)
+            print(f"[{self.label}] trace 过大（{size // 1024} KB），未保留")
+            return {"path": None, "reason": reason, "bytes": size}
+        prune_traces(keep=path)
+        print(f"[{self.label}] 已保留 trace（{reason}）: {path}，用 playwright show-trace 查看")
+        return {"path": path, "reason": reason, "bytes": size}
@@ -0,0 +1,173 @@
+"""
+发布步骤的耗时追踪
+每个步骤（登录、打开编辑器、填写、上传、发布……）是一个 span，记录平台、任务 ID、结果、
+耗时以及期间的 Playwright 调用次数。span 按任务保存在内存里，可以导出为 JSON，
+或导出为 Chrome trace 格式（在 chrome://tracing 或 Perfetto 中打开）。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# 最多保留多少个任务的 span
+MAX_TRACED_JOBS = 200
+# 单个任务最多记录的 span 数
+MAX_SPANS_PER_JOB = 2000
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+
+
+class Tracer:
+    """按任务收集 span，多个发布线程共用"""
+
+    def __init__(self, max_jobs=MAX_TRACED_JOBS):
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        # {job_id: [span, ...]}，按加入顺序淘汰最早的任务
+        self._jobs = OrderedDict()
+        self._local = threading.local()
+
+    def start(self, name, platform="", job_id="", rpc=None, **attrs):
+        """
+        开始一个 span，需要与 finish 成对调用（后开始的先结束）
+        rpc 为 RpcCounter 时记录期间的 Playwright 调用次数；嵌套的 span 记录父 span 名
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        span = {
+            "name": name,
+            "platform": platform,
+            "job_id": job_id,
+            "parent": stack[-1]["name"] if stack else None,
+            "thread": threading.current_thread().name,
+            "start": time.time(),
+            "end": None,
+            "duration": None,
+            "outcome": OUTCOME_OK,
+            "error": None,
+            "rpc_calls": None,
+            "attrs": attrs,
+            "_rpc": (rpc, rpc.calls) if rpc is not None else None,
+        }
+        stack.append(span)
+        return span
+
+    def finish(self, span, error=None):
+        """结束 span，error 为异常时记为失败"""
+        stack = getattr(self._local, "stack", [])
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index] is span:
+                del stack[index]
+                break
+        span["end"] = time.time()
+        span["duration"] = round(span["end"] - span["start"], 3)
+        rpc = span.pop("_rpc", None)
+        if rpc is not None:
+            span["rpc_calls"] = rpc[0].calls - rpc[1]
+        if error is not None:
+            span["outcome"] = OUTCOME_ERROR
+            span["error"] = f"{type(error).__name__}: {error}"
+        self._add(span)
+
+    @contextmanager
+    def span(self, name, platform="", job_id="", rpc=None, **attrs):
+        """with tracer.span("fill", platform, job_id, rpc=counter): ..."""
+        span = self.start(name, platform, job_id, rpc=rpc, **attrs)
+        try:
+            yield span
+        except BaseException as e:
+            self.finish(span, e)
+            raise
+        self.finish(span)
+
+    def record(self, name, platform, job_id, start, end, **attrs):
+        """补记一个已经结束的 span（例如排队等待）"""
+        self._add({
+            "name": name, "platform": platform, "job_id": job_id, "parent": None,
+            "thread": threading.current_thread().name,
+            "start": start, "end": end, "duration": round(end - start, 3),
+            "outcome": OUTCOME_OK, "error": None, "rpc_calls": None, "attrs": attrs,
+        })
+
+    def _add(self, span):
+        job_id = span["job_id"] or "-"
+        with self._lock:
+            spans = self._jobs.get(job_id)
+            if spans is None:
+                spans = self._jobs[job_id] = []
+                while len(self._jobs) > self.max_jobs:
+                    self._jobs.popitem(last=False)
+            if len(spans) < MAX_SPANS_PER_JOB:
+                spans.append(span)
+
+    def spans(self, job_id):
+        """任务的 span 列表（按开始时间排序），没有记录返回 None"""
+        with self._lock:
+            spans = self._jobs.get(job_id)
+            if spans is None:
+                return None
+            spans = [dict(s) for s in spans]
+        return sorted(spans, key=lambda s: s["start"])
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs)
+
+
+def summarize(spans):
+    """按 平台/步骤 汇总总耗时和调用次数，按耗时从大到小排列"""
+    totals = {}
+    for span in spans:
+        key = (span["platform"], span["name"])
+        item = totals.setdefault(key, {
+            "platform": span["platform"], "name": span["name"],
+            "count": 0, "seconds": 0.0, "rpc_calls": 0, "errors": 0,
+        })
+        item["count"] += 1
+        item["seconds"] = round(item["seconds"] + span["duration"], 3)
+        item["rpc_calls"] += span["rpc_calls"] or 0
+        if span["outcome"] != OUTCOME_OK:
+            item["errors"] += 1
+    return sorted(totals.values(), key=lambda item: item["seconds"], reverse=True)
+
+
+def to_chrome_trace(spans):
+    """转成 Chrome trace event 格式：每个平台一条轨道，span 为完整事件（ph=X）"""
+    events = []
+    tids = {}
+    for span in spans:
+        track = span["platform"] or span["thread"]
+        if track not in tids:
+            tids[track] = len(tids) + 1
+            events.append({
+                "name": "thread_name", "ph": "M", "pid": 1, "tid": tids[track],
+                "args": {"name": track},
+            })
+        events.append({
+            "name": span["name"],
+            "cat": span["platform"] or "job",
+            "ph": "X",
+            "pid": 1,
+            "tid": tids[track],
+            "ts": int(span["start"] * 1_000_000),
+            "dur": int(span["duration"] * 1_000_000),
+            "args": {
+                "job_id": span["job_id"],
+                "outcome": span["outcome"],
+                "error": span["error"],
+                "rpc_calls": span["rpc_calls"],
+                **span["attrs"],
+            },
+        })
+    if spans:
+        events.insert(0, {
+            "name": "process_name", "ph": "M", "pid": 1,
+            "args": {"name": f"job {spans[0]['job_id']}"},
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+tracer = Tracer()